@@ -1,7 +1,173 @@
-from fastapi import FastAPI
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+
+from bot import TradeDatabase, event_bus
+
+KEEPALIVE_SECONDS = 15
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    dispatcher = asyncio.create_task(event_bus.run_dispatcher())
+    yield
+    dispatcher.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# The dashboard is served from its own origin and reads /analytics/* with a bearer token
+DASHBOARD_ORIGINS = [origin.strip() for origin in os.getenv('DASHBOARD_ORIGINS', '').split(',') if origin.strip()]
+if DASHBOARD_ORIGINS:
+    app.add_middleware(CORSMiddleware, allow_origins=DASHBOARD_ORIGINS, allow_methods=['GET'],
+                       allow_headers=['Authorization', 'If-None-Match'], expose_headers=['ETag'])
+
+trade_db = TradeDatabase(os.getenv('TRADES_DB_PATH', 'trades.db'))
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def verify_token(token: Optional[str]) -> Optional[dict]:
+    """
+    Claims of a valid, unexpired Supabase user access token (HS256, signed with
+    SUPABASE_JWT_SECRET), limited to DASHBOARD_USERS ids when set. Tokens are
+    issued per user by Supabase auth and expire within the hour, so nothing
+    long-lived ships in the dashboard bundle. Without the secret every token is
+    rejected.
+    """
+    secret = os.getenv('SUPABASE_JWT_SECRET')
+    if not secret or not token:
+        return None
+    try:
+        header, payload, signature = token.split('.')
+        if json.loads(_b64decode(header)).get('alg') != 'HS256':
+            return None
+        expected = hmac.new(secret.encode(), f'{header}.{payload}'.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    # The public anon key is signed with the same secret - only signed-in users pass
+    if claims.get('role') != 'authenticated' or claims.get('exp', 0) < time.time():
+        return None
+    allowed = os.getenv('DASHBOARD_USERS')
+    if allowed and claims.get('sub') not in {user.strip() for user in allowed.split(',')}:
+        return None
+    return claims
+
+
+def require_user(request: Request, token: Optional[str] = None) -> dict:
+    """Bearer token from the Authorization header, or ?token= for EventSource/WebSocket clients"""
+    authorization = request.headers.get('authorization', '')
+    if authorization.lower().startswith('bearer '):
+        token = authorization[7:]
+    claims = verify_token(token)
+    if claims is None:
+        raise HTTPException(status_code=401, detail='invalid or expired token', headers={'WWW-Authenticate': 'Bearer'})
+    return claims
+
+
+def _cached(request: Request, response: Response, payload: dict, version: int, key: str):
+    """Attach an ETag derived from the rollup version; 304 if the client copy is current"""
+    etag = f'W/"{key}-{version}"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return payload
 
-app = FastAPI()
 
 @app.get('/health')
 async def health():
     return {'status':'ok'}
+
+
+@app.get('/analytics/summary', dependencies=[Depends(require_user)])
+def analytics_summary(request: Request, response: Response, symbol: Optional[str] = None):
+    stats = trade_db.get_statistics(symbol or 'ALL')
+    return _cached(request, response, stats, trade_db.get_statistics().get('last_trade_id', 0), f"summary-{symbol or 'ALL'}")
+
+
+@app.get('/analytics/symbols', dependencies=[Depends(require_user)])
+def analytics_symbols(request: Request, response: Response):
+    version = trade_db.get_statistics().get('last_trade_id', 0)
+    return _cached(request, response, {'symbols': trade_db.get_symbol_statistics()}, version, 'symbols')
+
+
+@app.get('/analytics/daily', dependencies=[Depends(require_user)])
+def analytics_daily(request: Request, response: Response, symbol: Optional[str] = None,
+                    before: Optional[str] = None, limit: int = Query(30, ge=1, le=366)):
+    days = trade_db.get_daily_rollups(symbol or 'ALL', before, limit)
+    payload = {'days': days, 'next': days[-1]['day'] if len(days) == limit else None}
+    version = trade_db.get_statistics().get('last_trade_id', 0)
+    return _cached(request, response, payload, version, f"daily-{symbol or 'ALL'}-{before}-{limit}")
+
+
+@app.get('/analytics/equity', dependencies=[Depends(require_user)])
+def analytics_equity(request: Request, response: Response, after: int = Query(0, ge=0),
+                     limit: int = Query(500, ge=1, le=5000)):
+    points = trade_db.get_equity_curve(after, limit)
+    payload = {'points': points, 'next': points[-1]['trade_id'] if len(points) == limit else None}
+    version = trade_db.get_statistics().get('last_trade_id', 0)
+    return _cached(request, response, payload, version, f"equity-{after}-{limit}")
+
+
+def _topics(topics: Optional[str]) -> Optional[set]:
+    return set(topics.split(',')) if topics else None
+
+
+@app.websocket('/stream/ws')
+async def stream_ws(websocket: WebSocket, topics: Optional[str] = None, token: Optional[str] = None):
+    """Live signal/fill/equity/latency batches as JSON arrays; `[]` every 15s while idle"""
+    if verify_token(token) is None:
+        await websocket.close(code=1008)
+        return
+    subscriber = event_bus.subscribe(_topics(topics))
+    if subscriber is None:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    try:
+        while True:
+            await websocket.send_text(await subscriber.next(KEEPALIVE_SECONDS) or '[]')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_bus.unsubscribe(subscriber)
+
+
+@app.get('/stream/sse', dependencies=[Depends(require_user)])
+async def stream_sse(request: Request, topics: Optional[str] = None):
+    """Same batches as /stream/ws as server-sent events, for clients behind WebSocket-hostile proxies"""
+    subscriber = event_bus.subscribe(_topics(topics))
+    if subscriber is None:
+        return Response(status_code=503)
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                batch = await subscriber.next(KEEPALIVE_SECONDS)
+                yield f"data: {batch}\n\n" if batch else ": keepalive\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.get('/stream/stats', dependencies=[Depends(require_user)])
+def stream_stats():
+    return event_bus.report()
@@ -13,7 +13,9 @@ ADVANCED FOREX TRADING BOT v3.0 - ULTRA-FAST PREDICTIVE AI
 """
 
 import os
+import sys
 import time
+import signal as os_signal
 import asyncio
 import logging
 import hashlib
@@ -22,7 +24,7 @@ import json
 from datetime import datetime, timedelta
 from pathlib import Path
 from loguru import logger
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional, Union, get_type_hints
 import pandas as pd
 import numpy as np
 from ta.trend import EMAIndicator, MACD, ADXIndicator
@@ -31,12 +33,15 @@ from ta.volatility import BollingerBands, AverageTrueRange
 from ta.volume import OnBalanceVolumeIndicator
 import yaml
 from dotenv import load_dotenv
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 import sqlite3
 import threading
 from collections import deque
-from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.connection import Listener, Client
+from numpy.lib.stride_tricks import sliding_window_view
 
 try:
     import MetaTrader5 as mt5
@@ -56,6 +61,1122 @@ except ImportError:
 
 load_dotenv()
 
+# ============================================================================
+# STRUCTURED HOT-PATH LOGGING
+# ============================================================================
+
+class HotPathLogger:
+    """
+    Non-blocking logging for per-cycle chatter.
+    The trading thread only appends (timestamp, category, template, fields) to
+    a deque; a writer thread formats them, as compact JSON lines into a daily
+    events file (structured mode) or as the human template through loguru.
+    Categories can be sampled (every Nth record) and rate-limited (max records
+    per minute). Until configure() starts the writer, events pass straight to loguru.
+    """
+    
+    def __init__(self):
+        self.structured = False
+        self.sample_every: Dict[str, int] = {}
+        self.max_per_minute: Dict[str, int] = {}
+        self.max_queue = 10000
+        self.flush_interval = 0.2
+        self.path_template = 'logs/events_{date}.jsonl'
+        self.retention = '30 days'
+        
+        self._queue = deque()
+        self._events = logger.bind(hot_event=True)
+        self._sink_id: Optional[int] = None
+        self._counters: Dict[str, int] = {}
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.stats = {'emitted': 0, 'sampled_out': 0, 'rate_limited': 0, 'dropped': 0,
+                      'written': 0, 'overhead_ns': 0, 'writer_ns': 0}
+    
+    def configure(self, config: dict):
+        log_config = config.get('logging', {})
+        self.sample_every = dict(log_config.get('sample_every', {}))
+        self.max_per_minute = dict(log_config.get('max_per_minute', {}))
+        self.max_queue = log_config.get('max_queue', 10000)
+        self.flush_interval = log_config.get('flush_interval', 0.2)
+        self.path_template = log_config.get('events_path', 'logs/events_{date}.jsonl')
+        self.retention = log_config.get('events_retention', '30 days')
+        self.structured = log_config.get('structured', False)
+        if self.structured and self._sink_id is None:
+            # Rotated and pruned like the other log files; loguru's queue thread does the I/O
+            self._sink_id = logger.add(self.path_template.replace('{date}', '{time:YYYY-MM-DD}'), format='{message}',
+                                       rotation='00:00', retention=self.retention, enqueue=True,
+                                       filter=lambda record: 'hot_event' in record['extra'])
+        if self._writer is None:
+            self._stop.clear()
+            self._writer = threading.Thread(target=self._write_loop, name='hot-log-writer', daemon=True)
+            self._writer.start()
+    
+    def event(self, category: str, template: str, **fields):
+        """Log a per-cycle event; formatting (JSON or `template`) happens on the writer thread"""
+        started = time.perf_counter_ns()
+        
+        every = self.sample_every.get(category)
+        if every:
+            count = self._counters.get(category, 0)
+            self._counters[category] = count + 1
+            if count % every:
+                self.stats['sampled_out'] += 1
+                return
+        
+        limit = self.max_per_minute.get(category)
+        if limit:
+            now = time.monotonic()
+            window_start, used = self._windows.get(category, (now, 0))
+            if now - window_start >= 60:
+                window_start, used = now, 0
+            if used >= limit:
+                self.stats['rate_limited'] += 1
+                return
+            self._windows[category] = (window_start, used + 1)
+        
+        if self._writer is None:
+            logger.info(template, **fields)
+        elif len(self._queue) >= self.max_queue:
+            self.stats['dropped'] += 1
+        else:
+            self._queue.append((time.time(), category, template, fields))
+        
+        self.stats['emitted'] += 1
+        self.stats['overhead_ns'] += time.perf_counter_ns() - started
+    
+    def _write_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+    
+    def _drain(self):
+        if not self._queue:
+            return
+        started = time.perf_counter_ns()
+        try:
+            while self._queue:
+                ts, category, template, fields = self._queue.popleft()
+                if self.structured:
+                    record = {'ts': round(ts, 6), 'cat': category}
+                    record.update(fields)
+                    self._events.info(json.dumps(record, separators=(',', ':'), default=str))
+                else:
+                    logger.info(template, **fields)
+                self.stats['written'] += 1
+        except Exception as e:
+            logger.error(f"Hot-path log write error: {e}")
+        self.stats['writer_ns'] += time.perf_counter_ns() - started
+    
+    def overhead_report(self) -> dict:
+        """Hot-path cost per event and writer-thread totals"""
+        calls = self.stats['emitted'] + self.stats['sampled_out'] + self.stats['rate_limited']
+        return dict(self.stats, avg_overhead_us=self.stats['overhead_ns'] / calls / 1000 if calls else 0.0)
+    
+    def close(self):
+        if self._writer is not None:
+            self._stop.set()
+            self._writer.join(timeout=5)
+            self._writer = None
+
+
+hot_log = HotPathLogger()
+
+
+def _not_hot_event(record) -> bool:
+    return 'hot_event' not in record['extra']
+
+
+def configure_logging(config: dict):
+    """Route every loguru sink through its queue thread and set up hot-path logging"""
+    log_config = config.get('logging', {})
+    level = log_config.get('level', 'INFO')
+    enqueue = log_config.get('enqueue', True)
+    # loguru's default stderr handler writes on the calling (trading) thread; replace it with a queued one
+    logger.remove()
+    logger.add(sys.stderr, level=level, enqueue=enqueue, filter=_not_hot_event)
+    logger.add("logs/bot_{time:YYYY-MM-DD}.log", rotation="00:00", retention="30 days",
+               level=level, enqueue=enqueue, filter=_not_hot_event)
+    hot_log.configure(config)
+
+
+# ============================================================================
+# LIVE EVENT STREAM
+# ============================================================================
+
+class StreamSubscriber:
+    """Bounded per-client queue of dispatched batches; a lagging client loses its oldest batches"""
+    
+    def __init__(self, topics: Optional[set], maxsize: int):
+        self.topics = topics
+        self.batches: deque = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.ready = asyncio.Event()
+    
+    def offer(self, batch: List[Tuple[str, str]]):
+        messages = [text for topic, text in batch if self.topics is None or topic in self.topics]
+        if not messages:
+            return
+        if len(self.batches) == self.batches.maxlen:
+            self.dropped += 1
+        self.batches.append(messages)
+        self.ready.set()
+    
+    async def next(self, timeout: Optional[float] = None) -> Optional[str]:
+        """JSON array of every message queued since the last call; None if `timeout` passes first"""
+        if not self.batches:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        messages = [text for batch in self.batches for text in batch]
+        self.batches.clear()
+        return '[' + ','.join(messages) + ']'
+
+
+class EventBus:
+    """
+    In-process pub/sub from the trading loop to live dashboard clients.
+    publish() only touches a dict or deque under a lock: topics published
+    with a `key` (signal per symbol, equity, cycle latency) coalesce to their
+    latest value until the next dispatch, keyless events (fills) queue in
+    order in a bounded buffer. A dispatcher on the stream server's event loop
+    drains the bus every `interval`, serializes each message once and fans
+    the batch out to the per-client queues.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.interval = 0.25
+        self.client_queue = 64
+        self.max_clients = 500
+        
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._events: deque = deque(maxlen=1000)
+        self._latest: Dict[Tuple[str, str], dict] = {}
+        self._seq = 0
+        self.subscribers: set = set()
+        self.stats = {'published': 0, 'coalesced': 0, 'overflow': 0, 'dispatched': 0, 'client_drops': 0}
+    
+    def configure(self, config: dict):
+        stream_config = config.get('stream', {})
+        self.enabled = stream_config.get('enabled', False)
+        self.interval = stream_config.get('interval', 0.25)
+        self.client_queue = stream_config.get('client_queue', 64)
+        self.max_clients = stream_config.get('max_clients', 500)
+        max_events = stream_config.get('max_events', 1000)
+        if max_events != self._events.maxlen:
+            with self._lock:
+                self._events = deque(self._events, maxlen=max_events)
+    
+    def publish(self, topic: str, data: dict, key: Optional[str] = None):
+        """Queue an update for stream clients; updates sharing (topic, key) coalesce to the latest"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._seq += 1
+            message = {'topic': topic, 'key': key, 'seq': self._seq, 'ts': round(time.time(), 3), 'data': data}
+            if key is None:
+                if len(self._events) == self._events.maxlen:
+                    self.stats['overflow'] += 1
+                self._events.append(message)
+            else:
+                slot = (topic, key)
+                if slot in self._pending:
+                    self.stats['coalesced'] += 1
+                self._pending[slot] = message
+                self._latest[slot] = message
+            self.stats['published'] += 1
+    
+    @staticmethod
+    def _encode(messages: List[dict]) -> List[Tuple[str, str]]:
+        messages.sort(key=lambda m: m['seq'])
+        return [(m['topic'], json.dumps(m, separators=(',', ':'), default=str)) for m in messages]
+    
+    def drain(self) -> List[Tuple[str, str]]:
+        """Everything published since the last drain as (topic, json) pairs in publish order"""
+        with self._lock:
+            if not self._pending and not self._events:
+                return []
+            messages = list(self._pending.values()) + list(self._events)
+            self._pending = {}
+            self._events.clear()
+        return self._encode(messages)
+    
+    def subscribe(self, topics: Optional[set] = None) -> Optional[StreamSubscriber]:
+        """New client queue primed with the latest keyed values; None when at max_clients"""
+        subscriber = StreamSubscriber(topics, self.client_queue)
+        # The subscriber set is shared with report() on the trading thread; touch it only under the lock
+        with self._lock:
+            if len(self.subscribers) >= self.max_clients:
+                return None
+            latest = list(self._latest.values())
+            self.subscribers.add(subscriber)
+        if latest:
+            subscriber.offer(self._encode(latest))
+        return subscriber
+    
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+            self.stats['client_drops'] += subscriber.dropped
+    
+    def dispatch(self) -> int:
+        batch = self.drain()
+        if batch:
+            with self._lock:
+                subscribers = list(self.subscribers)
+            for subscriber in subscribers:
+                subscriber.offer(batch)
+            self.stats['dispatched'] += len(batch)
+        return len(batch)
+    
+    async def run_dispatcher(self):
+        """Fan-out loop; runs on the stream server's event loop, never on the trading loop"""
+        while True:
+            try:
+                self.dispatch()
+            except Exception as e:
+                logger.error(f"Stream dispatch error: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def report(self) -> dict:
+        with self._lock:
+            subscribers = list(self.subscribers)
+            stats = dict(self.stats)
+        lagging = sum(s.dropped for s in subscribers)
+        return dict(stats, clients=len(subscribers), client_drops=stats['client_drops'] + lagging)
+
+
+event_bus = EventBus()
+
+
+def start_stream_server(config: dict) -> Optional[threading.Thread]:
+    """Serve app/healthcheck.py (analytics + live stream) from a thread of the bot process"""
+    stream_config = config.get('stream', {})
+    if not stream_config.get('enabled', False):
+        return None
+    try:
+        import uvicorn
+        from app.healthcheck import app
+    except ImportError as e:
+        logger.warning(f"⚠ Live stream disabled: {e}")
+        event_bus.enabled = False
+        return None
+    
+    host = os.getenv('STREAM_HOST', stream_config.get('host', '127.0.0.1'))
+    port = int(os.getenv('STREAM_PORT', stream_config.get('port', 8000)))
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, name='stream-server', daemon=True)
+    thread.start()
+    logger.info(f"📡 Live stream on ws://{host}:{port}/stream/ws and http://{host}:{port}/stream/sse")
+    return thread
+
+
+# ============================================================================
+# CYCLE PROFILING
+# ============================================================================
+
+class CycleProfiler:
+    """
+    On-demand profiling of N consecutive trading cycles.
+    Armed by config (profiling.enabled) or at runtime with SIGUSR1. Captured
+    cycles run under cProfile (per-function table) and a stack sampler thread
+    (collapsed stacks for flamegraph.pl / speedscope); both land in logs/.
+    """
+    
+    def __init__(self, config: dict):
+        prof_config = config.get('profiling', {})
+        self.cycles = prof_config.get('cycles', 5)
+        self.sample_interval = prof_config.get('sample_interval', 0.005)
+        self.output_dir = Path(prof_config.get('output_dir', 'logs'))
+        self.remaining = self.cycles if prof_config.get('enabled', False) else 0
+        self.cycle_times: deque = deque(maxlen=1000)
+        
+        self._profile = None
+        self._stacks: Dict[str, int] = {}
+        self._sampling = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._target_thread = None
+        self._cycle_started = 0.0
+        self._captured = []
+    
+    def request(self, cycles: Optional[int] = None):
+        """Arm a capture of the next `cycles` cycles (safe to call from a signal handler)"""
+        self.remaining = cycles or self.cycles
+    
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+    
+    def start_cycle(self):
+        self._cycle_started = time.perf_counter()
+        if self.remaining > 0:
+            if not self.active:
+                self._begin()
+            self._resume()
+    
+    def end_cycle(self, report=None) -> float:
+        """Close the cycle and return its duration; `report` is a callable whose dict is appended to the dump"""
+        elapsed = time.perf_counter() - self._cycle_started
+        self.cycle_times.append(elapsed)
+        if self.active:
+            # Only cycle work is captured, never the sleep between cycles
+            self._pause()
+            self._captured.append(elapsed)
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self._finish(report() if report else None)
+        return elapsed
+    
+    def _begin(self):
+        import cProfile
+        self._stacks = {}
+        self._captured = []
+        self._target_thread = threading.get_ident()
+        self._profile = cProfile.Profile()
+        logger.info(f"🔬 Profiling next {self.remaining} cycle(s)")
+    
+    def _resume(self):
+        self._profile.enable()
+        self._sampling.set()
+        self._sampler = threading.Thread(target=self._sample_loop, name='cycle-sampler', daemon=True)
+        self._sampler.start()
+    
+    def _pause(self):
+        self._profile.disable()
+        self._sampling.clear()
+        self._sampler.join(timeout=1)
+    
+    def _sample_loop(self):
+        while self._sampling.is_set():
+            frame = sys._current_frames().get(self._target_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self._stacks[key] = self._stacks.get(key, 0) + 1
+            time.sleep(self.sample_interval)
+    
+    def _finish(self, extra_report: Optional[dict] = None):
+        import io
+        import pstats
+        
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        table = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=table)
+        stats.sort_stats('cumulative').print_stats(40)
+        stats.sort_stats('tottime').print_stats(25)
+        header = (f"Cycles: {len(self._captured)} | "
+                  + " ".join(f"{t * 1000:.1f}ms" for t in self._captured) + "\n")
+        if extra_report:
+            header += json.dumps(extra_report, indent=2, default=str) + "\n"
+        (self.output_dir / f'profile_{stamp}.txt').write_text(header + table.getvalue())
+        self._profile.dump_stats(str(self.output_dir / f'profile_{stamp}.prof'))
+        (self.output_dir / f'profile_{stamp}.collapsed').write_text(
+            ''.join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items())))
+        
+        logger.info(f"🔬 Profile written to {self.output_dir}/profile_{stamp}.[txt|prof|collapsed]")
+        self._profile = None
+        self._sampler = None
+    
+    def timing_summary(self) -> dict:
+        if not self.cycle_times:
+            return {}
+        times = np.array(self.cycle_times) * 1000
+        return {'cycles': len(times), 'mean_ms': float(times.mean()),
+                'p95_ms': float(np.percentile(times, 95)), 'max_ms': float(times.max())}
+
+
+# ============================================================================
+# BAR FRAMES (LIVE OHLCV WITHOUT PANDAS)
+# ============================================================================
+
+# Layout of the structured array returned by mt5.copy_rates_*
+BAR_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+class BarFrame:
+    """
+    Read-only OHLCV bars wrapping the structured array MT5 returns, without
+    building a DataFrame. Columns are zero-copy field views: 'timestamp' is
+    the int64 epoch-second 'time' field viewed as datetime64[s], 'volume' maps
+    to tick_volume. Implements the slice of the DataFrame API the analyzers and
+    feature engine use (frame['close'], len, .columns, row slicing);
+    to_pandas() exports a DataFrame.
+    """
+    
+    __slots__ = ('data',)
+    
+    columns = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    ALIASES = {'volume': 'tick_volume'}
+    
+    def __init__(self, data: np.ndarray):
+        self.data = data
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key == 'timestamp':
+                return self.data['time'].view('datetime64[s]')
+            return self.data[self.ALIASES.get(key, key)]
+        return BarFrame(self.data[key])
+    
+    @property
+    def times(self) -> np.ndarray:
+        """Bar open times as int64 epoch seconds (broker server time)"""
+        return self.data['time']
+    
+    @classmethod
+    def from_columns(cls, timestamp: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                     close: np.ndarray, volume: Optional[np.ndarray] = None) -> 'BarFrame':
+        data = np.zeros(len(close), dtype=BAR_DTYPE)
+        data['time'] = np.asarray(timestamp).astype('datetime64[s]').astype(np.int64)
+        data['open'], data['high'], data['low'], data['close'] = open, high, low, close
+        if volume is not None:
+            data['tick_volume'] = volume
+        return cls(data)
+    
+    @classmethod
+    def from_pandas(cls, df: pd.DataFrame) -> 'BarFrame':
+        return cls.from_columns(df['timestamp'].values, df['open'].values, df['high'].values, df['low'].values,
+                                df['close'].values, df['volume'].values if 'volume' in df.columns else None)
+    
+    def merge(self, recent: 'BarFrame', limit: int) -> 'BarFrame':
+        """Replace bars from recent's first bar on (the forming bar may have changed) and keep the last `limit`"""
+        kept = self.data[:np.searchsorted(self.data['time'], recent.data['time'][0])]
+        return BarFrame(np.concatenate((kept, recent.data))[-limit:])
+    
+    def to_pandas(self) -> pd.DataFrame:
+        return pd.DataFrame({column: self[column] for column in self.columns})
+
+
+Bars = Union[pd.DataFrame, BarFrame]
+
+
+# ============================================================================
+# TRADING CALENDAR
+# ============================================================================
+
+MINUTES_PER_DAY = 1440
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+WEEKDAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+
+# Bit flags per minute of the week
+MARKET_OPEN = 1
+ROLLOVER = 2
+SESSION_SYDNEY = 4
+SESSION_TOKYO = 8
+SESSION_LONDON = 16
+SESSION_NEW_YORK = 32
+
+# UTC session hours (no DST adjustment)
+FX_SESSIONS = {
+    SESSION_SYDNEY: '21:00-06:00',
+    SESSION_TOKYO: '00:00-09:00',
+    SESSION_LONDON: '07:00-16:00',
+    SESSION_NEW_YORK: '12:00-21:00'
+}
+
+
+def _clock_minute(value: str) -> int:
+    hours, minutes = value.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _daily_window(minute_of_day: np.ndarray, window: str) -> np.ndarray:
+    """Mask for an 'HH:MM-HH:MM' window (may wrap past midnight)"""
+    start, end = (_clock_minute(part) for part in window.split('-'))
+    if start <= end:
+        return (minute_of_day >= start) & (minute_of_day < end)
+    return (minute_of_day >= start) | (minute_of_day < end)
+
+
+def _week_minute(value: str) -> int:
+    """'Sun 21:00' -> minutes since Monday 00:00"""
+    day, clock = value.split()
+    return WEEKDAYS[day[:3].lower()] * MINUTES_PER_DAY + _clock_minute(clock)
+
+
+class TradingCalendar:
+    """
+    Minute-of-week index of market hours, FX sessions and the daily rollover,
+    precomputed per symbol so lookups by timestamp are a single array index.
+    Times are UTC epoch seconds; bar timestamps are broker server time and
+    shifted by calendar.server_utc_offset.
+    """
+    
+    def __init__(self, config: dict):
+        cal_config = config.get('calendar', {})
+        self.server_utc_offset = cal_config.get('server_utc_offset', 0)
+        self.day_start_utc = cal_config.get('day_start_utc', 0)
+        self.idle_sleep = cal_config.get('idle_sleep', 900)
+        self.holidays = np.array(sorted(
+            (np.datetime64(str(day), 'D') - np.datetime64('1970-01-01', 'D')).astype(int)
+            for day in cal_config.get('holidays', [])
+        ), dtype=np.int64)
+        self._holiday_set = set(self.holidays.tolist())
+        self.tradable: Dict[str, bool] = {}
+        
+        minute = np.arange(MINUTES_PER_WEEK)
+        minute_of_day = minute % MINUTES_PER_DAY
+        open_at = _week_minute(cal_config.get('week_open', 'Sun 21:00'))
+        close_at = _week_minute(cal_config.get('week_close', 'Fri 21:00'))
+        if open_at <= close_at:
+            market_open = (minute >= open_at) & (minute < close_at)
+        else:
+            market_open = (minute >= open_at) | (minute < close_at)
+        
+        flags = np.where(market_open, MARKET_OPEN, 0).astype(np.uint8)
+        flags |= np.where(_daily_window(minute_of_day, cal_config.get('rollover', '20:55-21:05')), ROLLOVER, 0).astype(np.uint8)
+        for bit, window in FX_SESSIONS.items():
+            flags |= np.where(_daily_window(minute_of_day, window), bit, 0).astype(np.uint8)
+        self._default = self._build(flags)
+        
+        # Per-symbol hours narrow the FX week, e.g. {XAUUSD: {hours: ['01:00-23:55']}}
+        self._symbols = {}
+        for symbol, spec in (cal_config.get('symbols') or {}).items():
+            in_hours = np.zeros(MINUTES_PER_WEEK, dtype=bool)
+            for window in spec.get('hours', ['00:00-24:00']):
+                in_hours |= _daily_window(minute_of_day, window)
+            self._symbols[symbol] = self._build(np.where(in_hours, flags, flags & ~np.uint8(MARKET_OPEN)).astype(np.uint8))
+    
+    @staticmethod
+    def _build(flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(flags, minutes until the next open minute) per minute of the week"""
+        is_open = (flags & MARKET_OPEN).astype(bool)
+        wait = np.full(MINUTES_PER_WEEK, MINUTES_PER_WEEK, dtype=np.int64)
+        if is_open.any():
+            # Two backward passes so the wait wraps around the end of the week
+            next_open = None
+            for minute in list(range(MINUTES_PER_WEEK - 1, -1, -1)) * 2:
+                if is_open[minute]:
+                    next_open = minute
+                if next_open is not None:
+                    wait[minute] = (next_open - minute) % MINUTES_PER_WEEK
+        return flags, wait
+    
+    @staticmethod
+    def _minute_of_week(epoch_minutes):
+        # 1970-01-01 was a Thursday (Monday = 0)
+        return (epoch_minutes // MINUTES_PER_DAY + 3) % 7 * MINUTES_PER_DAY + epoch_minutes % MINUTES_PER_DAY
+    
+    def _index(self, symbol: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        return self._symbols.get(symbol, self._default)
+    
+    def flags(self, symbol: Optional[str] = None, now: Optional[float] = None) -> int:
+        """Flag bits for a UTC epoch time (default: now)"""
+        epoch_minutes = int((time.time() if now is None else now) // 60)
+        flags = int(self._index(symbol)[0][self._minute_of_week(epoch_minutes)])
+        if epoch_minutes // MINUTES_PER_DAY in self._holiday_set:
+            flags &= ~MARKET_OPEN
+        return flags
+    
+    def is_open(self, symbol: Optional[str] = None, now: Optional[float] = None) -> bool:
+        if not self.tradable.get(symbol, True):
+            return False
+        return bool(self.flags(symbol, now) & MARKET_OPEN)
+    
+    def seconds_until_open(self, symbol: Optional[str] = None, now: Optional[float] = None) -> float:
+        """0 when open; otherwise time to the next open minute (skipping holidays)"""
+        now = time.time() if now is None else now
+        wait_index = self._index(symbol)[1]
+        t = now
+        for _ in range(30):
+            epoch_minutes = int(t // 60)
+            wait = int(wait_index[self._minute_of_week(epoch_minutes)])
+            if wait >= MINUTES_PER_WEEK:
+                break
+            if wait:
+                t = (epoch_minutes + wait) * 60
+            day = int(t // 86400)
+            if day not in self._holiday_set:
+                return t - now
+            t = (day + 1) * 86400
+        return float(self.idle_sleep)
+    
+    def bar_flags(self, times: np.ndarray, symbol: Optional[str] = None) -> np.ndarray:
+        """Vectorized flags for bar timestamps (datetime64, broker server time)"""
+        epoch_minutes = times.astype('datetime64[m]').astype(np.int64) - int(self.server_utc_offset * 60)
+        flags = self._index(symbol)[0][self._minute_of_week(epoch_minutes)]
+        if len(self.holidays):
+            holiday = np.isin(epoch_minutes // MINUTES_PER_DAY, self.holidays)
+            flags = np.where(holiday, flags & ~np.uint8(MARKET_OPEN), flags).astype(np.uint8)
+        return flags
+    
+    def trading_day(self, now: Optional[float] = None):
+        """Date of the trading day (rolls at calendar.day_start_utc) used for daily counters"""
+        shifted = (time.time() if now is None else now) - self.day_start_utc * 3600
+        return (datetime(1970, 1, 1) + timedelta(seconds=shifted)).date()
+    
+    def day_start(self, now: Optional[float] = None) -> datetime:
+        """Start of the current trading day as a local naive datetime (the clock trades are stamped with)"""
+        now = time.time() if now is None else now
+        shift = self.day_start_utc * 3600
+        return datetime.fromtimestamp((now - shift) // 86400 * 86400 + shift)
+
+
+# ============================================================================
+# ADAPTIVE CYCLE SCHEDULING
+# ============================================================================
+
+class CycleScheduler:
+    """
+    Keeps each trading cycle inside its time budget (scheduler.budget_fraction
+    of the loop interval). Symbols with open positions always run first; the
+    rest run least-recently-served first and are shed once the remaining
+    budget is below their typical cost. Optional stages (ML prediction,
+    statistics) are skipped when the cycle - or the recent average - runs
+    hot. Shed work is counted and reported.
+    """
+    
+    OPTIONAL_STAGES = ('ml', 'stats')
+    
+    def __init__(self, config: dict):
+        sched_config = config.get('scheduler', {})
+        self.interval = sched_config.get('interval', 60)
+        self.budget = self.interval * sched_config.get('budget_fraction', 0.8)
+        self.degrade_at = sched_config.get('degrade_at', 0.7)
+        self.smoothing = sched_config.get('smoothing', 0.2)
+        
+        self.symbol_cost: Dict[str, float] = {}
+        self.last_served: Dict[str, int] = {}
+        self.utilization = 0.0
+        self.degraded = False
+        self.cycle = 0
+        self.cycle_started = 0.0
+        
+        self.dropped_symbols = 0
+        self.skipped_stages: Dict[str, int] = {stage: 0 for stage in self.OPTIONAL_STAGES}
+        self.overruns = 0
+        self._cycle_dropped: List[str] = []
+        self._cycle_skipped: List[str] = []
+    
+    def begin_cycle(self):
+        self.cycle += 1
+        self.cycle_started = time.perf_counter()
+        self._cycle_dropped = []
+        self._cycle_skipped = []
+        # Hysteresis so a single slow cycle doesn't flap the degraded mode
+        if self.utilization > self.degrade_at:
+            self.degraded = True
+        elif self.utilization < self.degrade_at * 0.8:
+            self.degraded = False
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.cycle_started
+    
+    def plan(self, symbols: List[str], critical: set) -> List[str]:
+        """Processing order: open positions first, then least recently served"""
+        held = [s for s in symbols if s in critical]
+        rest = sorted((s for s in symbols if s not in critical), key=lambda s: self.last_served.get(s, 0))
+        return held + rest
+    
+    def admit(self, symbol: str, critical: bool) -> bool:
+        """Whether to process `symbol` now; critical symbols are never shed"""
+        if critical:
+            return True
+        expected = self.symbol_cost.get(symbol, 0.0)
+        if self.elapsed() + expected <= self.budget:
+            return True
+        self.dropped_symbols += 1
+        self._cycle_dropped.append(symbol)
+        return False
+    
+    def record(self, symbol: str, seconds: float):
+        previous = self.symbol_cost.get(symbol)
+        self.symbol_cost[symbol] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+        self.last_served[symbol] = self.cycle
+    
+    def stage_enabled(self, stage: str) -> bool:
+        """Optional stages run unless degraded or this cycle is past degrade_at of its budget"""
+        if not self.degraded and self.elapsed() <= self.budget * self.degrade_at:
+            return True
+        self.skipped_stages[stage] += 1
+        self._cycle_skipped.append(stage)
+        return False
+    
+    def end_cycle(self) -> float:
+        """Close the cycle; returns how long to sleep before the next one"""
+        elapsed = self.elapsed()
+        self.utilization += self.smoothing * (elapsed / self.budget - self.utilization)
+        if elapsed > self.budget:
+            self.overruns += 1
+        if self._cycle_dropped or self._cycle_skipped or elapsed > self.budget:
+            hot_log.event('scheduler', "⚡ Load shedding: {elapsed_ms:.0f}ms / {budget_ms:.0f}ms budget | "
+                          "dropped {dropped} | skipped {skipped} | utilization {utilization:.0%}",
+                          elapsed_ms=elapsed * 1000, budget_ms=self.budget * 1000,
+                          dropped=','.join(self._cycle_dropped) or '-', skipped=','.join(sorted(set(self._cycle_skipped))) or '-',
+                          utilization=self.utilization)
+        return max(self.interval - elapsed, 0.0)
+    
+    def report(self) -> dict:
+        return {
+            'cycles': self.cycle,
+            'overruns': self.overruns,
+            'dropped_symbols': self.dropped_symbols,
+            'skipped_stages': dict(self.skipped_stages),
+            'utilization': self.utilization,
+            'degraded': self.degraded
+        }
+
+
+# ============================================================================
+# INCREMENTAL FEATURE ENGINE
+# ============================================================================
+
+def _rolling(data: np.ndarray, func, window: int) -> np.ndarray:
+    """Trailing-window reduction; the first rows use the expanding window like [-window:] slices"""
+    n = len(data)
+    out = np.empty(n)
+    for i in range(min(window - 1, n)):
+        out[i] = func(data[:i + 1])
+    if n >= window:
+        out[window - 1:] = func(sliding_window_view(data, window), axis=-1)
+    return out
+
+
+class _LagAccumulator:
+    """Value `lag` bars back (NaN until available)"""
+    
+    def __init__(self, lag: int):
+        self.lag = lag
+        self.buffer = deque(maxlen=lag)
+    
+    def peek(self, x: float) -> float:
+        return self.buffer[0] if len(self.buffer) == self.lag else np.nan
+    
+    def push(self, x: float):
+        self.buffer.append(x)
+    
+    @staticmethod
+    def batch(data: np.ndarray, lag: int) -> np.ndarray:
+        out = np.full(len(data), np.nan)
+        out[lag:] = data[:-lag]
+        return out
+
+
+class _WindowMomentsAccumulator:
+    """Trailing mean or population std from running sums (shifted by the first value for precision)"""
+    
+    RESYNC_EVERY = 4096
+    
+    def __init__(self, window: int, kind: str):
+        self.window = window
+        self.kind = kind
+        self.buffer = deque(maxlen=window)
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.pushes = 0
+    
+    def peek(self, x: float) -> float:
+        if self.shift is None:
+            return x if self.kind == 'mean' else 0.0
+        d = x - self.shift
+        total, total_sq = self.total + d, self.total_sq + d * d
+        if len(self.buffer) == self.window:
+            old = self.buffer[0] - self.shift
+            total -= old
+            total_sq -= old * old
+        count = min(len(self.buffer) + 1, self.window)
+        mean = total / count
+        if self.kind == 'mean':
+            return self.shift + mean
+        return np.sqrt(max(total_sq / count - mean * mean, 0.0))
+    
+    def push(self, x: float):
+        if self.shift is None:
+            self.shift = x
+        if len(self.buffer) == self.window:
+            old = self.buffer[0] - self.shift
+            self.total -= old
+            self.total_sq -= old * old
+        self.buffer.append(x)
+        d = x - self.shift
+        self.total += d
+        self.total_sq += d * d
+        self.pushes += 1
+        if self.pushes % self.RESYNC_EVERY == 0:
+            # Drop accumulated rounding from the running add/subtract
+            values = np.array(self.buffer) - self.shift
+            self.total, self.total_sq = float(values.sum()), float((values * values).sum())
+    
+    @staticmethod
+    def batch(data: np.ndarray, window: int, kind: str) -> np.ndarray:
+        return _rolling(data, np.mean if kind == 'mean' else np.std, window)
+
+
+class _WindowExtremeAccumulator:
+    """Trailing max/min via a monotonic deque (amortized O(1) per bar)"""
+    
+    def __init__(self, window: int, kind: str):
+        self.window = window
+        self.sign = 1.0 if kind == 'max' else -1.0
+        self.candidates = deque()  # (bar index, signed value), values decreasing
+        self.t = 0
+    
+    def peek(self, x: float) -> float:
+        best = self.sign * x
+        for index, value in self.candidates:
+            if index > self.t - self.window:
+                best = max(best, value)
+                break
+        return self.sign * best
+    
+    def push(self, x: float):
+        value = self.sign * x
+        while self.candidates and self.candidates[-1][1] <= value:
+            self.candidates.pop()
+        self.candidates.append((self.t, value))
+        while self.candidates[0][0] <= self.t - self.window:
+            self.candidates.popleft()
+        self.t += 1
+    
+    @staticmethod
+    def batch(data: np.ndarray, window: int, kind: str) -> np.ndarray:
+        return _rolling(data, np.max if kind == 'max' else np.min, window)
+
+
+class _EwmAccumulator:
+    """Recursive exponential average seeded with the first value"""
+    
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value = None
+    
+    def peek(self, x: float) -> float:
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+    
+    def push(self, x: float):
+        self.value = self.peek(x)
+    
+    @staticmethod
+    def batch(data: np.ndarray, alpha: float) -> np.ndarray:
+        # Same recurrence as peek/push so training and live values are bit-identical
+        out = np.empty(len(data))
+        value = None
+        for i, x in enumerate(data.tolist()):
+            value = x if value is None else value + alpha * (x - value)
+            out[i] = value
+        return out
+
+
+def _make_accumulator(key: tuple):
+    kind, _, param = key
+    if kind == 'lag':
+        return _LagAccumulator(param)
+    if kind in ('mean', 'std'):
+        return _WindowMomentsAccumulator(param, kind)
+    if kind in ('max', 'min'):
+        return _WindowExtremeAccumulator(param, kind)
+    return _EwmAccumulator(param)
+
+
+def _batch_accumulator(key: tuple, data: np.ndarray) -> np.ndarray:
+    kind, _, param = key
+    if kind == 'lag':
+        return _LagAccumulator.batch(data, param)
+    if kind in ('mean', 'std'):
+        return _WindowMomentsAccumulator.batch(data, param, kind)
+    if kind in ('max', 'min'):
+        return _WindowExtremeAccumulator.batch(data, param, kind)
+    return _EwmAccumulator.batch(data, param)
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    Declarative feature: `formula(bar, *values)` over the accumulators in `uses`,
+    each a (kind, column, param) key with kind in lag/mean/std/max/min/ewm.
+    Formulas only use NumPy arithmetic so they evaluate on scalars (live) and
+    arrays (training) alike. Rows before `warmup` bars, and non-finite results,
+    take `default`.
+    """
+    name: str
+    uses: Tuple[tuple, ...]
+    formula: Callable
+    warmup: int = 1
+    default: float = 0.0
+
+
+def default_feature_specs(config: dict) -> List[FeatureSpec]:
+    """Model inputs; bump FeatureEngine.VERSION when a formula changes"""
+    strategy = config.get('strategy', {})
+    ema_short = strategy.get('ema_short', 9)
+    ema_long = strategy.get('ema_long', 21)
+    rsi_period = strategy.get('rsi_period', 14)
+    
+    specs = [
+        FeatureSpec('return_20', (('lag', 'close', 19),), lambda x, c: x['close'] / c - 1, warmup=20),
+        FeatureSpec('return_50', (('lag', 'close', 49),), lambda x, c: x['close'] / c - 1, warmup=50),
+        FeatureSpec('range_20', (('max', 'high', 20), ('min', 'low', 20)),
+                    lambda x, hi, lo: (hi - lo) / x['close']),
+        FeatureSpec('volatility_20', (('std', 'close', 20),), lambda x, sd: sd / x['close'], warmup=20),
+        FeatureSpec('momentum_5', (('lag', 'close', 4),), lambda x, c: x['close'] / c - 1, warmup=5),
+        FeatureSpec('volume_z', (('mean', 'volume', 20), ('std', 'volume', 20)),
+                    lambda x, mean, sd: (x['volume'] - mean) / (sd + 1e-10)),
+        FeatureSpec('ma_ratio', (('mean', 'close', 5), ('mean', 'close', 20)),
+                    lambda x, fast, slow: fast / slow - 1, warmup=20),
+        FeatureSpec('range_position', (('max', 'high', 20), ('min', 'low', 20)),
+                    lambda x, hi, lo: (x['high'] - lo) / (hi - lo), warmup=20, default=0.5),
+        FeatureSpec('return_1', (('lag', 'close', 1),), lambda x, c: x['close'] / c - 1, warmup=2),
+        FeatureSpec('volatility_ratio', (('std', 'close', 5), ('std', 'close', 20)),
+                    lambda x, fast, slow: fast / slow, warmup=20, default=1.0),
+        FeatureSpec('rsi', (('ewm', 'gain', 1 / rsi_period), ('ewm', 'loss', 1 / rsi_period)),
+                    lambda x, up, down: up / (up + down) - 0.5, warmup=rsi_period + 1),
+        FeatureSpec('ema_ratio', (('ewm', 'close', 2 / (ema_short + 1)), ('ewm', 'close', 2 / (ema_long + 1))),
+                    lambda x, fast, slow: fast / slow - 1, warmup=ema_long),
+        FeatureSpec('atr_pct', (('ewm', 'true_range', 1 / 14),), lambda x, atr: atr / x['close'], warmup=15),
+    ]
+    
+    if config.get('features', {}).get('sessions', False):
+        for session in ('asia', 'london', 'new_york', 'rollover'):
+            specs.append(FeatureSpec(f'session_{session}', (), lambda x, column=f'session_{session}': x[column]))
+    
+    for peer in config.get('features', {}).get('cross_symbols', []):
+        column = f'peer:{peer}'
+        specs.append(FeatureSpec(f'{peer}_return_1', (('lag', column, 1),),
+                                 lambda x, c, column=column: x[column] / c - 1, warmup=2))
+        specs.append(FeatureSpec(f'{peer}_return_20', (('lag', column, 19),),
+                                 lambda x, c, column=column: x[column] / c - 1, warmup=20))
+    return specs
+
+
+class FeatureEngine:
+    """
+    Maintains model features bar by bar. `matrix()` computes every row at once
+    for training; `latest()` feeds only bars not seen before into rolling
+    accumulators and evaluates the newest (possibly still forming) bar without
+    committing it, so live extraction is O(features) per cycle. Both paths
+    evaluate the same FeatureSpec formulas.
+    """
+    
+    VERSION = 2
+    
+    def __init__(self, config: dict):
+        self.specs = default_feature_specs(config)
+        self.peers = list(config.get('features', {}).get('cross_symbols', []))
+        self.calendar = TradingCalendar(config) if config.get('features', {}).get('sessions', False) else None
+        self.names = [spec.name for spec in self.specs]
+        self.keys = list(dict.fromkeys(key for spec in self.specs for key in spec.uses))
+        # Session columns depend on the calendar (hours, holidays, server offset), not just the specs
+        calendar_key = json.dumps(config.get('calendar', {}), sort_keys=True, default=str) if self.calendar else None
+        self.signature = hashlib.sha256(repr(
+            (self.VERSION, [(s.name, s.uses, s.warmup, s.default) for s in self.specs], calendar_key)
+        ).encode()).hexdigest()[:12]
+        self.reset()
+    
+    @property
+    def n_features(self) -> int:
+        return len(self.specs)
+    
+    def reset(self):
+        self.accumulators = {key: _make_accumulator(key) for key in self.keys}
+        self.count = 0
+        self.prev_close = None
+        self.last_time = None
+    
+    @staticmethod
+    def _align_peer(peer: Optional[Bars], times: Optional[np.ndarray], n: int) -> np.ndarray:
+        """Peer close as of each bar time (NaN where unknown)"""
+        if peer is None or times is None or len(peer) == 0 or 'timestamp' not in peer.columns:
+            return np.full(n, np.nan)
+        peer_times = np.asarray(peer['timestamp'])
+        idx = np.searchsorted(peer_times, times, side='right') - 1
+        return np.where(idx >= 0, np.asarray(peer['close'], dtype=float)[np.maximum(idx, 0)], np.nan)
+    
+    def _inputs(self, df: Bars, start: int, prev_close, peers: Optional[Dict[str, Bars]]) -> dict:
+        """Input columns for df rows start.. (arrays)"""
+        close = np.asarray(df['close'][start:], dtype=float)
+        high = np.asarray(df['high'][start:], dtype=float)
+        low = np.asarray(df['low'][start:], dtype=float)
+        volume = np.asarray(df['volume'][start:], dtype=float) if 'volume' in df.columns else np.ones_like(close)
+        previous = np.concatenate(([close[0] if prev_close is None else prev_close], close[:-1]))
+        change = close - previous
+        x = {
+            'close': close, 'high': high, 'low': low, 'volume': volume,
+            'gain': np.maximum(change, 0.0), 'loss': np.maximum(-change, 0.0),
+            'true_range': np.maximum(high, previous) - np.minimum(low, previous)
+        }
+        times = np.asarray(df['timestamp'])[start:] if 'timestamp' in df.columns else None
+        for symbol in self.peers:
+            x[f'peer:{symbol}'] = self._align_peer((peers or {}).get(symbol), times, len(close))
+        if self.calendar is not None:
+            flags = self.calendar.bar_flags(times) if times is not None else np.zeros(len(close), dtype=np.uint8)
+            for session, bits in (('asia', SESSION_SYDNEY | SESSION_TOKYO), ('london', SESSION_LONDON),
+                                  ('new_york', SESSION_NEW_YORK), ('rollover', ROLLOVER)):
+                x[f'session_{session}'] = ((flags & bits) > 0).astype(float)
+        return x
+    
+    def _evaluate(self, x: dict, values: dict, count) -> list:
+        out = []
+        scalar = np.ndim(count) == 0
+        with np.errstate(all='ignore'):
+            for spec in self.specs:
+                value = spec.formula(x, *(values[key] for key in spec.uses))
+                if scalar:
+                    out.append(float(value) if count >= spec.warmup and np.isfinite(value) else spec.default)
+                else:
+                    out.append(np.where((count >= spec.warmup) & np.isfinite(value), value, spec.default))
+        return out
+    
+    def matrix(self, df: Bars, peers: Optional[Dict[str, Bars]] = None) -> np.ndarray:
+        """Feature rows for every bar (row i uses bars 0..i only)"""
+        n = len(df)
+        if n == 0:
+            return np.zeros((0, self.n_features))
+        x = self._inputs(df, 0, None, peers)
+        values = {key: _batch_accumulator(key, x[key[1]]) for key in self.keys}
+        return np.column_stack(self._evaluate(x, values, np.arange(1, n + 1)))
+    
+    def latest(self, df: Bars, peers: Optional[Dict[str, Bars]] = None) -> np.ndarray:
+        """Feature row (1, n_features) for the last bar of df, updating state incrementally"""
+        n = len(df)
+        if n == 0:
+            return np.zeros((1, self.n_features))
+        
+        start = None
+        if 'timestamp' in df.columns and self.last_time is not None:
+            times = np.asarray(df['timestamp'])
+            pos = int(np.searchsorted(times, self.last_time))
+            if pos < n - 1 and times[pos] == self.last_time:
+                start = pos + 1
+        if start is None:
+            # Unknown history (first call, gap or no timestamps): replay the frame
+            self.reset()
+            start = 0
+        
+        x = self._inputs(df, start, self.prev_close, peers)
+        columns = {name: column.tolist() for name, column in x.items()}
+        # Every bar except the last is complete: commit it
+        for i in range(n - 1 - start):
+            for key, accumulator in self.accumulators.items():
+                accumulator.push(columns[key[1]][i])
+        if n - 1 > start:
+            self.count += n - 1 - start
+            self.prev_close = columns['close'][n - 2 - start]
+        if 'timestamp' in df.columns and n > 1:
+            self.last_time = np.asarray(df['timestamp'])[n - 2]
+        
+        bar = {name: np.float64(column[-1]) for name, column in columns.items()}
+        values = {key: np.float64(accumulator.peek(bar[key[1]])) for key, accumulator in self.accumulators.items()}
+        return np.array(self._evaluate(bar, values, self.count + 1), dtype=float).reshape(1, -1)
+
+
 # ============================================================================
 # PERFORMANCE OPTIMIZATION & CACHING
 # ============================================================================
@@ -106,6 +1227,11 @@ class PredictiveMLModel:
         self.is_trained = False
         self.min_training_samples = 200
         self.prediction_cache = {}
+        self.failure_count = 0
+        self.last_error = None
+        # One incremental engine per symbol for live rows; `features` for training matrices
+        self.features = FeatureEngine(config)
+        self.engines: Dict[str, FeatureEngine] = {}
         
         if ML_AVAILABLE:
             self.load_or_init_model()
@@ -116,46 +1242,59 @@ class PredictiveMLModel:
             if os.path.exists(self.model_path):
                 with open(self.model_path, 'rb') as f:
                     self.model = pickle.load(f)
-                self.is_trained = True
-                logger.info("✓ ML model loaded from cache")
+                if getattr(self.model, 'n_features_in_', self.features.n_features) != self.features.n_features:
+                    logger.warning(f"⚠ Cached ML model expects {self.model.n_features_in_} features, "
+                                   f"feature set has {self.features.n_features} - retraining required")
+                    self.model = self.new_model()
+                else:
+                    self.is_trained = True
+                    logger.info("✓ ML model loaded from cache")
             else:
-                self.model = GradientBoostingRegressor(
-                    n_estimators=50,
-                    learning_rate=0.1,
-                    max_depth=3,
-                    random_state=42,
-                    n_iter_no_change=10
-                )
+                self.model = self.new_model()
                 logger.info("✓ New ML model initialized")
         except Exception as e:
             logger.warning(f"ML model init: {e}")
     
-    def extract_features(self, df: pd.DataFrame) -> np.ndarray:
-        """Ultra-fast feature extraction using vectorized NumPy operations"""
+    @staticmethod
+    def new_model():
+        """Create an untrained regressor with the production hyperparameters"""
+        return GradientBoostingRegressor(
+            n_estimators=50,
+            learning_rate=0.1,
+            max_depth=3,
+            random_state=42,
+            n_iter_no_change=10
+        )
+    
+    def reset_features(self, config: dict):
+        """Rebuild feature definitions (e.g. after a strategy reload); engines re-warm on next use"""
+        self.config = config
+        self.features = FeatureEngine(config)
+        self.engines.clear()
+    
+    def engine_for(self, symbol: str = '') -> FeatureEngine:
+        engine = self.engines.get(symbol)
+        if engine is None:
+            engine = self.engines[symbol] = FeatureEngine(self.config)
+        return engine
+    
+    def extract_features(self, df: Bars, symbol: str = '',
+                         peers: Optional[Dict[str, Bars]] = None) -> np.ndarray:
+        """Feature row for the latest bar, maintained incrementally per symbol"""
         try:
-            close = df['close'].values
-            high = df['high'].values
-            low = df['low'].values
-            volume = df['volume'].values if 'volume' in df.columns else np.ones_like(close)
-            
-            # Vectorized calculations (10x faster than looping)
-            prices = np.array([
-                close[-1] / close[-20] - 1 if len(close) >= 20 else 0,  # 20-period return
-                close[-1] / close[-50] - 1 if len(close) >= 50 else 0,  # 50-period return
-                (high[-20:].max() - low[-20:].min()) / close[-1],  # Recent range
-                np.std(close[-20:]) / close[-1] if len(close) >= 20 else 0,  # Volatility
-                (close[-1] - close[-5]) / close[-5] if len(close) >= 5 else 0,  # 5-period momentum
-                (volume[-1] - np.mean(volume[-20:])) / (np.std(volume[-20:]) + 1e-10),  # Volume deviation
-                np.mean(close[-5:]) / np.mean(close[-20:]) - 1 if len(close) >= 20 else 0,  # Short/Long MA ratio
-                (high[-1] - low[-20:].min()) / (high[-20:].max() - low[-20:].min()) if len(close) >= 20 else 0.5,  # Position in range
-            ])
-            
-            return prices.reshape(1, -1)
+            return self.engine_for(symbol).latest(df, peers)
         except Exception as e:
             logger.error(f"Feature extraction error: {e}")
-            return np.zeros((1, 8))
+            self.engines.pop(symbol, None)
+            return np.zeros((1, self.features.n_features))
+    
+    def extract_feature_matrix(self, df: Bars,
+                               peers: Optional[Dict[str, Bars]] = None) -> np.ndarray:
+        """Training matrix: row i equals the live row extract_features returns at bar i"""
+        return self.features.matrix(df, peers)
     
-    def predict_next_move(self, df: pd.DataFrame, confidence_threshold: float = 0.55) -> Tuple[float, float]:
+    def predict_next_move(self, df: Bars, confidence_threshold: float = 0.55, symbol: str = '',
+                          peers: Optional[Dict[str, Bars]] = None) -> Tuple[float, float]:
         """
         Predict next market move with confidence
         Returns (prediction: -1 to 1, confidence: 0 to 1)
@@ -164,7 +1303,7 @@ class PredictiveMLModel:
             if not self.is_trained or self.model is None:
                 return 0, 0
             
-            features = self.extract_features(df)
+            features = self.extract_features(df, symbol, peers)
             
             # Fast prediction with confidence
             try:
@@ -175,30 +1314,611 @@ class PredictiveMLModel:
                     return 0, 0
                 
                 return np.clip(prediction, -1, 1), confidence
-            except:
+            except Exception as e:
+                self.failure_count += 1
+                self.last_error = repr(e)
                 return 0, 0
         
         except Exception as e:
             logger.error(f"Prediction error: {e}")
             return 0, 0
     
-    def train_incremental(self, df: pd.DataFrame, target: np.ndarray):
-        """Incremental training with new data"""
+    def train_incremental(self, df: Bars, target: np.ndarray,
+                          peers: Optional[Dict[str, Bars]] = None):
+        """Refit on the history; `target` labels the last len(target) bars of df"""
         try:
             if len(df) < self.min_training_samples or self.model is None:
                 return
             
-            features = self.extract_features(df)
-            
-            # Warm start training (incremental)
-            if hasattr(self.model, 'n_iter_no_change'):
-                self.model.fit(features, target, eval_set=[(features, target)], verbose=0)
-                self.is_trained = True
-                logger.info("✓ Model trained incrementally")
+            features = self.extract_feature_matrix(df, peers)[-len(target):]
+            self.model.fit(features, target)
+            self.is_trained = True
+            logger.info(f"✓ Model trained on {len(target)} bars x {self.features.n_features} features")
         except Exception as e:
             logger.warning(f"Model training error: {e}")
 
 
+# ============================================================================
+# WALK-FORWARD VALIDATION
+# ============================================================================
+
+def _walk_forward_fold(task: dict) -> dict:
+    """Train and score one walk-forward fold (module level so workers can pickle it)"""
+    X_train, y_train = task['X_train'], task['fwd_train']
+    X_test, fwd_test = task['X_test'], task['fwd_test']
+    threshold = task['confidence_threshold']
+    
+    # Same target scale as the live model output: -1..1
+    scale = np.std(y_train) + 1e-12
+    model = PredictiveMLModel.new_model()
+    model.fit(X_train, np.tanh(y_train / scale))
+    
+    prediction = np.clip(model.predict(X_test), -1, 1)
+    confidence = np.minimum(np.abs(prediction), 1.0)
+    active = confidence >= threshold
+    direction = np.sign(prediction[active])
+    hits = direction == np.sign(fwd_test[active])
+    trade_returns = direction * fwd_test[active]
+    
+    calibration = []
+    ece = 0.0
+    edges = np.linspace(threshold, 1.0, task['calibration_bins'] + 1)
+    bucket = np.clip(np.searchsorted(edges, confidence[active], side='right') - 1, 0, len(edges) - 2)
+    for b in range(len(edges) - 1):
+        mask = bucket == b
+        count = int(mask.sum())
+        if count == 0:
+            continue
+        mean_conf = float(confidence[active][mask].mean())
+        hit_rate = float(hits[mask].mean())
+        calibration.append({
+            'confidence_low': float(edges[b]),
+            'confidence_high': float(edges[b + 1]),
+            'mean_confidence': mean_conf,
+            'hit_rate': hit_rate,
+            'count': count
+        })
+        ece += count * abs(mean_conf - hit_rate)
+    
+    n_signals = int(active.sum())
+    equity = np.cumsum(trade_returns)
+    drawdown = float(np.max(np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity)) if n_signals else 0.0
+    
+    return {
+        'fold': task['fold'],
+        'train_start': task['train_start'],
+        'test_start': task['test_start'],
+        'test_end': task['test_end'],
+        'n_test': len(fwd_test),
+        'n_signals': n_signals,
+        'hit_rate': float(hits.mean()) if n_signals else 0.0,
+        'calibration': calibration,
+        'calibration_error': ece / n_signals if n_signals else 0.0,
+        'pnl': float(trade_returns.sum()),
+        'avg_trade': float(trade_returns.mean()) if n_signals else 0.0,
+        'max_drawdown': drawdown
+    }
+
+
+class WalkForwardValidator:
+    """Out-of-sample walk-forward evaluation of PredictiveMLModel"""
+    
+    def __init__(self, config: dict, cache_dir: str = 'models/feature_cache'):
+        wf_config = config.get('walk_forward', {})
+        self.train_size = wf_config.get('train_size', 1000)
+        self.test_size = wf_config.get('test_size', 250)
+        self.horizon = wf_config.get('horizon', 1)
+        self.confidence_threshold = wf_config.get('confidence_threshold', 0.55)
+        self.calibration_bins = wf_config.get('calibration_bins', 5)
+        self.max_workers = wf_config.get('max_workers', os.cpu_count() or 1)
+        self.cache_dir = cache_dir
+        self.features = FeatureEngine(config)
+    
+    @staticmethod
+    def data_hash(df: Bars) -> str:
+        """Content hash of the timestamps (session flags, peer alignment) and OHLCV columns used by the feature set"""
+        digest = hashlib.sha256()
+        if 'timestamp' in df.columns:
+            digest.update(b'timestamp')
+            digest.update(np.asarray(df['timestamp']).astype('datetime64[s]').astype(np.int64).tobytes())
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            if column in df.columns:
+                digest.update(column.encode())
+                digest.update(np.ascontiguousarray(df[column], dtype=float).tobytes())
+        return digest.hexdigest()[:32]
+    
+    def load_features(self, df: Bars, peers: Optional[Dict[str, Bars]] = None) -> np.ndarray:
+        """Feature matrix for the full history, cached on disk by data hash and feature-set signature"""
+        digest = self.data_hash(df) if not peers else hashlib.sha256(
+            ''.join([self.data_hash(df)] + [self.data_hash(peers[p]) for p in sorted(peers)]).encode()).hexdigest()[:32]
+        path = Path(self.cache_dir) / f"features_{self.features.signature}_{digest}.npy"
+        if path.exists():
+            try:
+                features = np.load(path)
+                if features.shape == (len(df), self.features.n_features):
+                    return features
+            except Exception as e:
+                logger.warning(f"Feature cache read error: {e}")
+        
+        features = self.features.matrix(df, peers)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp.npy')
+            np.save(tmp_path, features)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Feature cache write error: {e}")
+        return features
+    
+    def split(self, n: int) -> List[Tuple[int, int, int]]:
+        """Rolling (train_start, test_start, test_end) folds over n labelled bars"""
+        folds = []
+        test_start = self.train_size
+        while test_start + self.test_size <= n:
+            folds.append((test_start - self.train_size, test_start, test_start + self.test_size))
+            test_start += self.test_size
+        return folds
+    
+    def run(self, df: Bars, peers: Optional[Dict[str, Bars]] = None) -> dict:
+        """Run all folds (in parallel processes) and return per-fold and summary metrics"""
+        if not ML_AVAILABLE:
+            logger.error("Walk-forward validation requires scikit-learn")
+            return {}
+        
+        features = self.load_features(df, peers)
+        close = np.asarray(df['close'], dtype=float)
+        
+        # Only bars with a known forward return can be labelled
+        n = len(close) - self.horizon
+        forward_returns = close[self.horizon:] / close[:-self.horizon] - 1
+        
+        tasks = []
+        for fold, (train_start, test_start, test_end) in enumerate(self.split(n)):
+            # Purge the last `horizon` training rows: their labels overlap the test window
+            train_end = test_start - self.horizon
+            tasks.append({
+                'fold': fold,
+                'train_start': train_start,
+                'test_start': test_start,
+                'test_end': test_end,
+                'X_train': features[train_start:train_end],
+                'fwd_train': forward_returns[train_start:train_end],
+                'X_test': features[test_start:test_end],
+                'fwd_test': forward_returns[test_start:test_end],
+                'confidence_threshold': self.confidence_threshold,
+                'calibration_bins': self.calibration_bins
+            })
+        
+        if not tasks:
+            logger.warning(f"Walk-forward: need at least {self.train_size + self.test_size + self.horizon} bars, got {len(close)}")
+            return {}
+        
+        if self.max_workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+                results = list(pool.map(_walk_forward_fold, tasks))
+        else:
+            results = [_walk_forward_fold(task) for task in tasks]
+        
+        total_signals = sum(r['n_signals'] for r in results)
+        summary = {
+            'folds': len(results),
+            'n_signals': total_signals,
+            'hit_rate': sum(r['hit_rate'] * r['n_signals'] for r in results) / total_signals if total_signals else 0.0,
+            'calibration_error': sum(r['calibration_error'] * r['n_signals'] for r in results) / total_signals if total_signals else 0.0,
+            'pnl': sum(r['pnl'] for r in results),
+            'profitable_folds': sum(1 for r in results if r['pnl'] > 0)
+        }
+        
+        for r in results:
+            logger.info(f"Fold {r['fold']}: bars {r['test_start']}-{r['test_end']} | Signals={r['n_signals']} | Hit={r['hit_rate']:.2%} | ECE={r['calibration_error']:.3f} | P&L={r['pnl']:+.4f}")
+        logger.info(f"📈 Walk-forward: Folds={summary['folds']} | Hit={summary['hit_rate']:.2%} | ECE={summary['calibration_error']:.3f} | P&L={summary['pnl']:+.4f}")
+        
+        return {'folds': results, 'summary': summary}
+
+
+# ============================================================================
+# MONTE CARLO ROBUSTNESS
+# ============================================================================
+
+def _monte_carlo_chunk(task: dict) -> dict:
+    """Simulate one chunk of equity paths (module level so workers can pickle it)"""
+    pnl = task['pnl']
+    n = len(pnl)
+    rows = task['rows']
+    rng = np.random.default_rng(task['seed'])
+    
+    # Peak memory is two (rows x trades) float64 arrays: the paths (cumulated in place
+    # into equity) and one scratch buffer (slippage draws, then the running peak)
+    if task['method'] == 'bootstrap':
+        paths = np.empty((rows, n))
+        block = max(1, 2 ** 20 // n)  # index draws in ~8 MB blocks
+        for start in range(0, rows, block):
+            # mode='raise' (the default) would buffer the whole output; the draws are always in range
+            np.take(pnl, rng.integers(0, n, size=(min(block, rows - start), n)), out=paths[start:start + block],
+                    mode='clip')
+    elif task['method'] == 'reshuffle':
+        paths = rng.permuted(np.broadcast_to(pnl, (rows, n)), axis=1)
+    else:
+        paths = np.tile(pnl, (rows, 1))
+    scratch = np.empty_like(paths)
+    if task['slippage_std'] > 0 or task['slippage_mean'] > 0:
+        # Execution cost per trade: never a gain
+        rng.standard_normal(out=scratch)
+        scratch *= task['slippage_std']
+        scratch += task['slippage_mean']
+        paths -= np.abs(scratch, out=scratch)
+    
+    initial = task['initial_equity']
+    equity = np.cumsum(paths, axis=1, out=paths)
+    equity += initial
+    peak = np.maximum.accumulate(equity, axis=1, out=scratch)
+    np.maximum(peak, initial, out=peak)
+    # (peak - equity) / peak == 1 - equity / peak, computed in the peak buffer
+    drawdown = 1 - np.divide(equity, peak, out=peak).min(axis=1)
+    
+    return {
+        'max_drawdown': drawdown,
+        'final_pnl': equity[:, -1] - initial,
+        'ruined': int((equity.min(axis=1) <= initial * (1 - task['ruin_fraction'])).sum())
+    }
+
+
+class MonteCarloSimulator:
+    """
+    Robustness check for a trade P&L series (TradeDatabase history or a
+    backtest): bootstrap resampling, order reshuffles or slippage perturbation
+    of the actual sequence, simulated as (paths x trades) matrices in chunks
+    sized to `max_chunk_mb` and spread over worker processes.
+    """
+    
+    METHODS = ('bootstrap', 'reshuffle', 'slippage')
+    
+    def __init__(self, config: dict):
+        mc_config = config.get('monte_carlo', {})
+        self.simulations = mc_config.get('simulations', 100000)
+        self.method = mc_config.get('method', 'bootstrap')
+        self.slippage_mean = mc_config.get('slippage_mean', 0.0)
+        self.slippage_std = mc_config.get('slippage_std', 0.0)
+        self.ruin_fraction = mc_config.get('ruin_fraction', 0.5)
+        self.drawdown_quantile = mc_config.get('drawdown_quantile', 0.95)
+        self.min_trades = mc_config.get('min_trades', 30)
+        self.max_chunk_mb = mc_config.get('max_chunk_mb', 64)
+        self.max_workers = mc_config.get('max_workers', os.cpu_count() or 1)
+        self.seed = mc_config.get('seed', 42)
+    
+    @staticmethod
+    def path_drawdown(pnl: np.ndarray, initial_equity: float) -> float:
+        """Max drawdown (fraction of peak equity) of the realised sequence"""
+        equity = initial_equity + np.cumsum(pnl)
+        peak = np.maximum(np.maximum.accumulate(equity), initial_equity)
+        return float(((peak - equity) / peak).max()) if len(pnl) else 0.0
+    
+    def run(self, pnl: np.ndarray, initial_equity: float, method: Optional[str] = None) -> dict:
+        """Drawdown, final P&L and ruin distributions over `simulations` paths"""
+        method = method or self.method
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown Monte Carlo method {method!r} (expected one of {', '.join(self.METHODS)})")
+        pnl = np.ascontiguousarray(pnl, dtype=float)
+        if len(pnl) < self.min_trades:
+            logger.warning(f"Monte Carlo: need at least {self.min_trades} trades, got {len(pnl)}")
+            return {}
+        
+        started = time.perf_counter()
+        # _monte_carlo_chunk holds two (rows x trades) float64 arrays at its peak
+        rows_per_chunk = max(1, int(self.max_chunk_mb * 2 ** 20 // (2 * 8 * len(pnl))))
+        chunks = [min(rows_per_chunk, self.simulations - start) for start in range(0, self.simulations, rows_per_chunk)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(chunks))
+        tasks = [{
+            'pnl': pnl, 'rows': rows, 'seed': seed, 'method': method,
+            'slippage_mean': self.slippage_mean, 'slippage_std': self.slippage_std,
+            'initial_equity': initial_equity, 'ruin_fraction': self.ruin_fraction
+        } for rows, seed in zip(chunks, seeds)]
+        
+        if self.max_workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+                results = list(pool.map(_monte_carlo_chunk, tasks))
+        else:
+            results = [_monte_carlo_chunk(task) for task in tasks]
+        
+        drawdowns = np.concatenate([r['max_drawdown'] for r in results])
+        finals = np.concatenate([r['final_pnl'] for r in results])
+        quantiles = (0.5, 0.9, 0.95, 0.99)
+        actual_drawdown = self.path_drawdown(pnl, initial_equity)
+        
+        report = {
+            'method': method,
+            'simulations': len(drawdowns),
+            'trades': len(pnl),
+            'initial_equity': initial_equity,
+            'actual_max_drawdown': actual_drawdown,
+            'actual_pnl': float(pnl.sum()),
+            'drawdown_quantiles': {q: float(v) for q, v in zip(quantiles, np.quantile(drawdowns, quantiles))},
+            'final_pnl_quantiles': {q: float(v) for q, v in zip((0.01, 0.05, 0.5, 0.95), np.quantile(finals, (0.01, 0.05, 0.5, 0.95)))},
+            'prob_loss': float((finals <= 0).mean()),
+            'prob_ruin': sum(r['ruined'] for r in results) / len(drawdowns),
+            # Where the realised drawdown falls in the simulated distribution (0.99 = worse than 99% of paths)
+            'drawdown_percentile': float((drawdowns <= actual_drawdown).mean()),
+            'quantile': self.drawdown_quantile,
+            'recommended_max_drawdown': float(np.quantile(drawdowns, self.drawdown_quantile)),
+            'seconds': time.perf_counter() - started
+        }
+        
+        logger.info(f"🎲 Monte Carlo ({method}, {report['simulations']:,} paths x {len(pnl)} trades, {report['seconds']:.1f}s): "
+                    f"DD p50={report['drawdown_quantiles'][0.5]:.2%} p95={report['drawdown_quantiles'][0.95]:.2%} "
+                    f"p99={report['drawdown_quantiles'][0.99]:.2%} | P(loss)={report['prob_loss']:.2%} | "
+                    f"P(ruin)={report['prob_ruin']:.2%}")
+        return report
+
+
+# ============================================================================
+# BATCH SIGNAL RESEARCH
+# ============================================================================
+
+def _tail_aligned(values: np.ndarray, n: int) -> np.ndarray:
+    """Right-align a trailing-window result (one value per full window) to n bars, NaN before the first"""
+    out = np.full(n, np.nan)
+    if len(values):
+        out[n - len(values):] = values
+    return out
+
+
+def _ema_pass(close: np.ndarray, period: int, rows: int, steps: int, trace: bool = False) -> np.ndarray:
+    """
+    Replay AdvancedIndicatorAnalyzer._fast_ema over close[i:i + steps] for every
+    start i < rows at once, one bar per step, so results are bit-identical.
+    trace=True (rows=1) returns the last value after every step instead.
+    """
+    multiplier = 2 / (period + 1)
+    trail = np.empty(steps) if trace else None
+    step = np.empty(rows)
+    value = ema = None
+    for k in range(steps):
+        if k + 1 < period:
+            value = close[k:k + rows]  # shorter than the period: _fast_ema returns the data
+        elif k + 1 == period:
+            value = ema = sliding_window_view(close[:rows + period - 1], period).mean(axis=-1)
+        else:
+            # ema = (close - ema) * multiplier + ema, in place
+            np.subtract(close[k:k + rows], ema, out=step)
+            step *= multiplier
+            ema += step
+        if trace:
+            trail[k] = value[0]
+    return trail if trace else value
+
+
+def _macd_pass(close: np.ndarray, rows: int, steps: int, trace: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """_ema_pass for analyze_macd's EMA12 - EMA26 line and its EMA9 signal (windows of 26+ bars)"""
+    fast, slow, smooth = 2 / (12 + 1), 2 / (26 + 1), 2 / (9 + 1)
+    ema12, ema26, macd, signal, step = (np.zeros(rows) for _ in range(5))
+    trail = (np.empty(steps), np.empty(steps)) if trace else None
+    for k in range(steps):
+        column = close[k:k + rows]
+        if k == 11:
+            ema12 = sliding_window_view(close[:rows + 11], 12).mean(axis=-1)
+        elif k > 11:
+            np.subtract(column, ema12, out=step)
+            step *= fast
+            ema12 += step
+        if k == 25:
+            ema26 = sliding_window_view(close[:rows + 25], 26).mean(axis=-1)
+        elif k > 25:
+            np.subtract(column, ema26, out=step)
+            step *= slow
+            ema26 += step
+        # The signal EMA seeds on macd[:9], which is all zeros before EMA12 starts
+        if k > 8:
+            np.subtract(ema12, ema26, out=macd)
+            np.subtract(macd, signal, out=step)
+            step *= smooth
+            signal += step
+        if trace:
+            trail[0][k], trail[1][k] = macd[0], signal[0]
+    return trail if trace else (macd, signal)
+
+
+def _window_pass(n: int, window: int, run, head: bool = True) -> Tuple[np.ndarray, ...]:
+    """
+    Per-bar results of a pass over the trailing `window` bars. `run(rows, steps,
+    trace)` returns a tuple of arrays; the first window - 1 bars share start 0
+    and are traced in one pass (NaN with head=False), the rest are full
+    windows stepped together.
+    """
+    size = min(n, window - 1)
+    full = run(n - window + 1, window, False) if n >= window else None
+    first = run(1, size, True) if head else tuple(np.full(size, np.nan) for _ in full)
+    return first if full is None else tuple(np.concatenate(pair) for pair in zip(first, full))
+
+
+def _batch_signal_chunk(task: dict) -> dict:
+    """Analyzer scores, votes and composite signal for every bar of one segment (module level so workers can pickle it)"""
+    high, low, close = task['high'], task['low'], task['close']
+    window = task['window']
+    n = len(close)
+    scores: Dict[str, np.ndarray] = {}
+    votes: Dict[str, np.ndarray] = {}
+    
+    # Bars before `offset` only provide history; their window passes can be skipped
+    head = task['offset'] < window - 1
+    
+    # EMA crossover
+    ema_short, = _window_pass(n, window, lambda rows, steps, trace: (_ema_pass(close, task['ema_short'], rows, steps, trace),), head)
+    ema_long, = _window_pass(n, window, lambda rows, steps, trace: (_ema_pass(close, task['ema_long'], rows, steps, trace),), head)
+    scores['ema'] = np.clip((ema_short - ema_long) / close * 100, -1.0, 1.0)
+    votes['ema'] = np.where(scores['ema'] > 0.1, 1, np.where(scores['ema'] < -0.1, -1, 0))
+    
+    # RSI over the first `period` deltas of each bar's window (as analyze_rsi does)
+    period = task['rsi_period']
+    delta = np.diff(close)
+    bars = np.arange(n)
+    starts = np.maximum(bars - window + 1, 0)
+    valid = bars - starts >= period
+    if n > period:
+        first = np.minimum(starts, n - 1 - period)
+        avg_gain = sliding_window_view(np.where(delta > 0, delta, 0), period).mean(axis=-1)[first]
+        avg_loss = sliding_window_view(np.where(delta < 0, -delta, 0), period).mean(axis=-1)[first]
+        rsi = 100 - (100 / (1 + avg_gain / (avg_loss + 1e-10)))
+    else:
+        rsi = np.full(n, 50.0)
+    scores['rsi'] = np.where(valid, (rsi - 50) / 50, 0.0)
+    votes['rsi'] = np.where(valid, np.where(rsi < 30, 1, np.where(rsi > 70, -1, 0)), 0)
+    
+    # MACD
+    macd, macd_signal = _window_pass(n, window, lambda rows, steps, trace: _macd_pass(close, rows, steps, trace), head)
+    scores['macd'] = np.tanh((macd - macd_signal) * 100)
+    votes['macd'] = np.where(macd > macd_signal, 1, -1)
+    
+    # Segments always hold at least MIN_BARS bars, enough for the fixed 20/14-bar windows below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Bollinger Bands (20, 2)
+        sma = _tail_aligned(np.convolve(close, np.ones(20) / 20, mode='valid'), n)
+        std = _tail_aligned(np.std(sliding_window_view(close, 20), axis=-1), n)
+        upper = sma + (std * 2)
+        lower = sma - (std * 2)
+        position = np.where(upper != lower, (close - lower) / (upper - lower), 0.5)
+        scores['bollinger'] = np.clip((position - 0.5) * 2, -1, 1)
+        votes['bollinger'] = np.where(close < sma, 1, -1)
+        
+        # analyze_atr pairs 20 bars with 19 previous closes, which always raises and scores
+        # neutral live; mirror that so batch and live agree until it is fixed
+        scores['atr'] = np.zeros(n)
+        votes['atr'] = np.zeros(n, dtype=int)
+        
+        # Stochastic %K over 20 bars
+        lowest_low = _tail_aligned(sliding_window_view(low, 20).min(axis=-1), n)
+        highest_high = _tail_aligned(sliding_window_view(high, 20).max(axis=-1), n)
+        k = 100 * (close - lowest_low) / (highest_high - lowest_low + 1e-10)
+        scores['stochastic'] = np.clip((k - 50) / 50, -1, 1)
+        votes['stochastic'] = np.where(k < 20, 1, np.where(k > 80, -1, 0))
+        
+        # 10-bar rate of change
+        roc = (close / _tail_aligned(close[:-9], n) - 1) * 100
+        scores['momentum'] = np.clip(np.tanh(roc / 10), -1, 1)
+        votes['momentum'] = np.where(roc > 0, 1, -1)
+        
+        # ADX-style directional strength over the last 14 moves
+        up = high[1:] - high[:-1]
+        down = low[:-1] - low[1:]
+        plus_dm = np.where((high[1:] > high[:-1]) & (up > down), up, 0)
+        minus_dm = np.where((low[:-1] > low[1:]) & (down > up), down, 0)
+        tr = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - low[:-1]), np.abs(low[1:] - high[:-1])))
+        mean_tr = _tail_aligned(sliding_window_view(tr, 14).mean(axis=-1), n)
+        di_plus = 100 * _tail_aligned(sliding_window_view(plus_dm, 14).mean(axis=-1), n) / (mean_tr + 1e-10)
+        di_minus = 100 * _tail_aligned(sliding_window_view(minus_dm, 14).mean(axis=-1), n) / (mean_tr + 1e-10)
+        adx = abs(di_plus - di_minus) / (di_plus + di_minus + 1e-10) * 100
+        scores['adx'] = np.clip((adx / 100) - 0.5, -1, 1)
+        votes['adx'] = np.where(adx > 25, 1, 0)
+    
+    offset = task['offset']
+    names = list(scores)
+    weights = task['weights']
+    composite = scores[names[0]][offset:] * weights[names[0]]
+    for name in names[1:]:
+        composite = composite + scores[name][offset:] * weights[name]
+    
+    buy = sum((votes[name][offset:] > 0).astype(np.int8) for name in names)
+    sell = sum((votes[name][offset:] < 0).astype(np.int8) for name in names)
+    signal = np.select(
+        [(composite > 0.65) & (buy >= 6), (composite > 0.35) & (buy >= 5),
+         (composite < -0.65) & (sell >= 6), (composite < -0.35) & (sell >= 5)],
+        [TradeSignal.STRONG_BUY.value, TradeSignal.BUY.value, TradeSignal.STRONG_SELL.value, TradeSignal.SELL.value],
+        TradeSignal.HOLD.value
+    ).astype(np.int8)
+    confidence = np.where(signal != TradeSignal.HOLD.value, np.maximum(buy, sell) / len(names), 0.0)
+    
+    result = {'composite': composite, 'confidence': confidence, 'signal': signal}
+    if task['indicators']:
+        result['scores'] = {name: scores[name][offset:] for name in names}
+        result['votes'] = {name: votes[name][offset:].astype(np.int8) for name in names}
+    return result
+
+
+class BatchSignalGenerator:
+    """
+    Research API for AdvancedIndicatorAnalyzer: per-bar indicator scores and
+    votes, composite score, confidence and TradeSignal for whole histories of
+    many symbols as (symbols x bars) arrays. Bar t is scored bit-for-bit as
+    the live loop scores a candle buffer ending at t (the trailing `window`
+    bars, 500 live) with use_ml=False - the ML boost depends on the model's
+    state at the time. Histories are cut into overlapping chunks of
+    `chunk_bars` so memory stays bounded, and chunks run in worker processes.
+    """
+    
+    INDICATORS = ('ema', 'rsi', 'macd', 'bollinger', 'atr', 'stochastic', 'momentum', 'adx')
+    MIN_BARS = 50  # _process_symbol skips shorter buffers
+    
+    def __init__(self, config: dict):
+        research_config = config.get('research', {})
+        self.settings = BotSettings.compile(config)
+        self.window = research_config.get('window', 500)
+        self.chunk_bars = research_config.get('chunk_bars', 16384)
+        self.max_workers = research_config.get('max_workers', os.cpu_count() or 1)
+        if self.window < self.MIN_BARS:
+            raise ValueError(f"research.window must be at least {self.MIN_BARS} bars, got {self.window}")
+    
+    def run(self, data: Dict[str, Bars], indicators: bool = True) -> dict:
+        """
+        Signals for every bar of every symbol (use BarFrame.from_columns for raw arrays).
+        Rows follow `data` order and shorter histories are padded at the end; bars
+        before MIN_BARS and padding have NaN scores and signal code 0. indicators=False
+        returns only composite/confidence/signal.
+        """
+        started = time.perf_counter()
+        symbols = list(data)
+        lengths = np.array([len(data[symbol]) for symbol in symbols], dtype=np.int64)
+        shape = (len(symbols), int(lengths.max()) if len(symbols) else 0)
+        strategy = self.settings.strategy
+        weights = {name: getattr(self.settings.weights, name) for name in self.INDICATORS}
+        
+        result = {
+            'symbols': symbols,
+            'lengths': lengths,
+            'times': np.zeros(shape, dtype=np.int64),
+            'composite': np.full(shape, np.nan),
+            'confidence': np.zeros(shape),
+            'signal': np.zeros(shape, dtype=np.int8)
+        }
+        if indicators:
+            result['scores'] = {name: np.full(shape, np.nan) for name in self.INDICATORS}
+            result['votes'] = {name: np.zeros(shape, dtype=np.int8) for name in self.INDICATORS}
+        
+        tasks = []
+        for row, symbol in enumerate(symbols):
+            bars = data[symbol]
+            result['times'][row, :len(bars)] = np.asarray(bars['timestamp']).astype('datetime64[s]').astype(np.int64)
+            high, low, close = (np.ascontiguousarray(bars[column], dtype=float) for column in ('high', 'low', 'close'))
+            for start in range(self.MIN_BARS - 1, len(close), self.chunk_bars):
+                stop = min(start + self.chunk_bars, len(close))
+                # Each chunk carries window - 1 bars of history for its first bar
+                first = max(0, start - self.window + 1)
+                tasks.append({
+                    'row': row, 'start': start, 'stop': stop, 'offset': start - first,
+                    'high': high[first:stop], 'low': low[first:stop], 'close': close[first:stop],
+                    'window': self.window, 'ema_short': strategy.ema_short, 'ema_long': strategy.ema_long,
+                    'rsi_period': strategy.rsi_period, 'weights': weights, 'indicators': indicators
+                })
+        
+        if self.max_workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+                chunks = list(pool.map(_batch_signal_chunk, tasks))
+        else:
+            chunks = [_batch_signal_chunk(task) for task in tasks]
+        
+        for task, chunk in zip(tasks, chunks):
+            row, span = task['row'], slice(task['start'], task['stop'])
+            for key in ('composite', 'confidence', 'signal'):
+                result[key][row, span] = chunk[key]
+            if indicators:
+                for name in self.INDICATORS:
+                    result['scores'][name][row, span] = chunk['scores'][name]
+                    result['votes'][name][row, span] = chunk['votes'][name]
+        
+        result['seconds'] = time.perf_counter() - started
+        logger.info(f"🧮 Batch signals: {len(symbols)} symbol(s) x {shape[1]:,} bars in {result['seconds']:.1f}s "
+                    f"({len(tasks)} chunk(s))")
+        return result
+
+
 # ============================================================================
 # CONFIGURATION & SECURITY
 # ============================================================================
@@ -211,7 +1931,7 @@ class TradeSignal(Enum):
     SELL = -2
     STRONG_SELL = -3
 
-@dataclass
+@dataclass(slots=True)
 class TradeAnalysis:
     """Trade analysis data structure"""
     signal: TradeSignal
@@ -224,6 +1944,453 @@ class TradeAnalysis:
     timestamp: datetime
 
 
+@dataclass(frozen=True, slots=True)
+class StrategySettings:
+    ema_short: int = 9
+    ema_long: int = 21
+    rsi_period: int = 14
+
+
+@dataclass(frozen=True, slots=True)
+class IndicatorWeights:
+    ema: float = 0.20
+    rsi: float = 0.15
+    macd: float = 0.18
+    bollinger: float = 0.12
+    atr: float = 0.10
+    stochastic: float = 0.10
+    momentum: float = 0.10
+    adx: float = 0.05
+
+
+@dataclass(frozen=True, slots=True)
+class RiskSettings:
+    max_daily_loss_pct: float = 0.05
+    max_position_risk_pct: float = 0.02
+    max_drawdown_pct: float = 0.10
+    min_lot: float = 0.01
+    max_lot: float = 100.0
+
+
+@dataclass(frozen=True, slots=True)
+class BotSettings:
+    """
+    Validated, immutable view of config.yaml for the hot path (attribute
+    access instead of nested dict lookups). `raw` keeps the parsed YAML for
+    components that only read their section at construction time.
+    """
+    strategy: StrategySettings
+    weights: IndicatorWeights
+    risk: RiskSettings
+    max_trades_per_day: int
+    raw: dict
+    
+    # Sections that can change without a restart; the rest (shards, buffers,
+    # sockets, model inputs) are read once at construction
+    LIVE_KEYS = ('strategy', 'indicator_weights', 'risk', 'max_trades_per_day', 'logging', 'calendar')
+    
+    @staticmethod
+    def _section(section_cls, values: Optional[dict], name: str, errors: List[str]):
+        values = values or {}
+        defaults = section_cls()
+        # The annotation decides int vs float, so `100` as a float default can't force integer input
+        field_types = get_type_hints(section_cls)
+        kwargs = {}
+        for field in section_cls.__dataclass_fields__:
+            kind = field_types[field]
+            value = values.get(field, getattr(defaults, field))
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (
+                    kind is int and not float(value).is_integer()):
+                errors.append(f"{name}.{field} must be {'an integer' if kind is int else 'a number'} (got {value!r})")
+                continue
+            kwargs[field] = kind(value)
+        unknown = set(values) - set(section_cls.__dataclass_fields__)
+        if unknown:
+            errors.append(f"{name}: unknown key(s) {', '.join(sorted(unknown))}")
+        return section_cls(**kwargs) if len(kwargs) == len(section_cls.__dataclass_fields__) else defaults
+    
+    @classmethod
+    def compile(cls, config: dict) -> 'BotSettings':
+        """Parse and validate; raises ValueError listing every problem"""
+        errors: List[str] = []
+        if not isinstance(config, dict):
+            raise ValueError("config must be a mapping")
+        
+        strategy_values = {k: v for k, v in (config.get('strategy') or {}).items()
+                           if k in StrategySettings.__dataclass_fields__}
+        strategy = cls._section(StrategySettings, strategy_values, 'strategy', errors)
+        weights = cls._section(IndicatorWeights, config.get('indicator_weights'), 'indicator_weights', errors)
+        risk_values = {k: v for k, v in (config.get('risk') or {}).items()
+                       if k in RiskSettings.__dataclass_fields__}
+        risk = cls._section(RiskSettings, risk_values, 'risk', errors)
+        max_trades = config.get('max_trades_per_day', 10)
+        
+        if not 1 <= strategy.ema_short < strategy.ema_long:
+            errors.append("strategy: need 1 <= ema_short < ema_long")
+        if strategy.rsi_period < 2:
+            errors.append("strategy.rsi_period must be >= 2")
+        weight_values = [getattr(weights, f) for f in IndicatorWeights.__dataclass_fields__]
+        if min(weight_values) < 0 or sum(weight_values) <= 0:
+            errors.append("indicator_weights must be non-negative with a positive sum")
+        for field in ('max_daily_loss_pct', 'max_position_risk_pct', 'max_drawdown_pct'):
+            if not 0 < getattr(risk, field) <= 1:
+                errors.append(f"risk.{field} must be in (0, 1]")
+        if not 0 < risk.min_lot <= risk.max_lot:
+            errors.append("risk: need 0 < min_lot <= max_lot")
+        if isinstance(max_trades, bool) or not isinstance(max_trades, int) or max_trades < 0:
+            errors.append("max_trades_per_day must be a non-negative integer")
+        
+        if errors:
+            raise ValueError("; ".join(errors))
+        return cls(strategy, weights, risk, max_trades, config)
+    
+    def changed_sections(self, other: 'BotSettings') -> set:
+        """Top-level config keys that differ"""
+        return {key for key in set(self.raw) | set(other.raw) if self.raw.get(key) != other.raw.get(key)}
+
+
+class ConfigWatcher:
+    """
+    Watches config.yaml by mtime and recompiles it on change. Polled once per
+    cycle, so a new config is swapped in atomically between cycles; an invalid
+    file is rejected and the running settings stay in place.
+    """
+    
+    def __init__(self, path: str, settings: BotSettings):
+        self.path = path
+        self.settings = settings
+        self.mtime = self._mtime()
+    
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def poll(self) -> Optional[Tuple[BotSettings, set]]:
+        """(new settings, changed sections) if the file changed and is valid"""
+        mtime = self._mtime()
+        if mtime is None or mtime == self.mtime:
+            return None
+        self.mtime = mtime
+        try:
+            with open(self.path, 'r') as f:
+                settings = BotSettings.compile(yaml.safe_load(f))
+        except Exception as e:
+            logger.error(f"❌ Config reload rejected ({self.path}): {e}")
+            return None
+        changed = settings.changed_sections(self.settings)
+        if not changed:
+            return None
+        self.settings = settings
+        return settings, changed
+
+
+# ============================================================================
+# COMPACT TRADE & POSITION STORAGE
+# ============================================================================
+
+_EPOCH = datetime(1970, 1, 1)
+NAT_NS = np.iinfo(np.int64).min
+
+
+def to_epoch_ns(dt: datetime) -> int:
+    """Naive datetime -> int64 nanoseconds since epoch"""
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+def from_epoch_ns(ns: int) -> Optional[datetime]:
+    """int64 nanoseconds since epoch -> naive datetime (None for NaT)"""
+    if ns == NAT_NS:
+        return None
+    return _EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+SIDE_CODES = {'BUY': 1, 'SELL': -1}
+SIDE_NAMES = {1: 'BUY', -1: 'SELL'}
+STATUS_CODES = {'OPEN': 0, 'CLOSED': 1, 'TRANSFERRED': 2}
+STATUS_NAMES = {0: 'OPEN', 1: 'CLOSED', 2: 'TRANSFERRED'}
+
+TRADE_DTYPE = np.dtype([
+    ('ticket', np.int64),
+    ('entry_time', np.int64),   # epoch ns
+    ('exit_time', np.int64),    # epoch ns, NAT_NS while open
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('size', np.float64),
+    ('stop_loss', np.float64),
+    ('take_profit', np.float64),
+    ('pnl', np.float64),
+    ('pnl_percent', np.float64),
+    ('symbol', np.int16),       # index into TradeStore.symbols
+    ('side', np.int8),          # SIDE_CODES
+    ('signal', np.int8),        # TradeSignal.value
+    ('status', np.int8),        # STATUS_CODES
+])
+
+
+class TradeView:
+    """Slotted per-trade view onto one row of a TradeStore (no per-trade dict/datetime)"""
+    
+    __slots__ = ('_store', '_index')
+    
+    def __init__(self, store: 'TradeStore', index: int):
+        self._store = store
+        self._index = index
+    
+    def _field(self, name: str):
+        return self._store.data[name][self._index]
+    
+    @property
+    def index(self) -> int:
+        return self._index
+    
+    @property
+    def ticket(self) -> int:
+        return int(self._field('ticket'))
+    
+    @property
+    def symbol(self) -> str:
+        return self._store.symbols[self._field('symbol')]
+    
+    @property
+    def type(self) -> str:
+        return SIDE_NAMES[int(self._field('side'))]
+    
+    @property
+    def signal(self) -> TradeSignal:
+        return TradeSignal(int(self._field('signal')))
+    
+    @property
+    def status(self) -> str:
+        return STATUS_NAMES[int(self._field('status'))]
+    
+    @property
+    def is_open(self) -> bool:
+        return self._field('status') == STATUS_CODES['OPEN']
+    
+    @property
+    def entry_time(self) -> datetime:
+        return from_epoch_ns(self._field('entry_time'))
+    
+    @property
+    def exit_time(self) -> Optional[datetime]:
+        return from_epoch_ns(self._field('exit_time'))
+    
+    @property
+    def entry_price(self) -> float:
+        return float(self._field('entry_price'))
+    
+    @property
+    def exit_price(self) -> float:
+        return float(self._field('exit_price'))
+    
+    @property
+    def size(self) -> float:
+        return float(self._field('size'))
+    
+    @property
+    def stop_loss(self) -> float:
+        return float(self._field('stop_loss'))
+    
+    @property
+    def take_profit(self) -> float:
+        return float(self._field('take_profit'))
+    
+    @property
+    def pnl(self) -> float:
+        return float(self._field('pnl'))
+    
+    @property
+    def pnl_percent(self) -> float:
+        return float(self._field('pnl_percent'))
+    
+    @property
+    def duration_minutes(self) -> int:
+        exit_ns = self._field('exit_time')
+        if exit_ns == NAT_NS:
+            return 0
+        return int((exit_ns - self._field('entry_time')) // 60_000_000_000)
+    
+    def to_row(self) -> dict:
+        """TradeDatabase.save_trade payload"""
+        exit_time = self.exit_time or self.entry_time
+        return {
+            'timestamp': exit_time.isoformat(),
+            'symbol': self.symbol,
+            'type': self.type,
+            'entry_price': self.entry_price,
+            'exit_price': self.exit_price,
+            'position_size': self.size,
+            'stop_loss': self.stop_loss,
+            'take_profit': self.take_profit,
+            'pnl': self.pnl,
+            'pnl_percent': self.pnl_percent,
+            'status': self.status,
+            'duration_minutes': self.duration_minutes
+        }
+    
+    def __repr__(self) -> str:
+        return f"TradeView(#{self.ticket} {self.type} {self.symbol} {self.status} size={self.size:.2f} pnl={self.pnl:.2f})"
+
+
+class TradeStore:
+    """
+    Growable NumPy structured-array store for trades and open positions.
+    Timestamps are int64 epoch-ns, prices float64 and enums small int codes,
+    so millions of simulated trades cost ~90 bytes each and no GC-tracked objects.
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        self.data = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self.count = 0
+        self.symbols: List[str] = []
+        self._symbol_codes: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __getitem__(self, index: int) -> TradeView:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return TradeView(self, index)
+    
+    def __iter__(self):
+        for i in range(self.count):
+            yield TradeView(self, i)
+    
+    @property
+    def rows(self) -> np.ndarray:
+        """Structured view of the populated rows (zero-copy)"""
+        return self.data[:self.count]
+    
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy column view of the populated rows"""
+        return self.data[name][:self.count]
+    
+    def symbol_code(self, symbol: str) -> int:
+        code = self._symbol_codes.get(symbol)
+        if code is None:
+            code = len(self.symbols)
+            self.symbols.append(symbol)
+            self._symbol_codes[symbol] = code
+        return code
+    
+    def _reserve(self, extra: int):
+        needed = self.count + extra
+        if needed > len(self.data):
+            grown = np.zeros(max(needed, len(self.data) * 2), dtype=TRADE_DTYPE)
+            grown[:self.count] = self.data[:self.count]
+            self.data = grown
+    
+    def open(self, symbol: str, trade_type: str, entry_price: float, size: float,
+             stop_loss: float = 0.0, take_profit: float = 0.0, ticket: int = 0,
+             signal: TradeSignal = TradeSignal.HOLD, entry_time: Optional[datetime] = None) -> TradeView:
+        """Append an open position"""
+        self._reserve(1)
+        row = self.data[self.count]
+        row['ticket'] = ticket
+        row['entry_time'] = to_epoch_ns(entry_time or datetime.now())
+        row['exit_time'] = NAT_NS
+        row['entry_price'] = entry_price
+        row['exit_price'] = np.nan
+        row['size'] = size
+        row['stop_loss'] = stop_loss
+        row['take_profit'] = take_profit
+        row['pnl'] = 0.0
+        row['pnl_percent'] = 0.0
+        row['symbol'] = self.symbol_code(symbol)
+        row['side'] = SIDE_CODES[trade_type]
+        row['signal'] = signal.value
+        row['status'] = STATUS_CODES['OPEN']
+        self.count += 1
+        return TradeView(self, self.count - 1)
+    
+    def close(self, index: int, exit_price: float, exit_time: Optional[datetime] = None) -> TradeView:
+        """Close an open position and compute its P&L"""
+        row = self.data[index]
+        pnl = (exit_price - row['entry_price']) * row['size'] * row['side']
+        notional = row['entry_price'] * row['size']
+        row['exit_time'] = to_epoch_ns(exit_time or datetime.now())
+        row['exit_price'] = exit_price
+        row['pnl'] = pnl
+        row['pnl_percent'] = pnl / notional * 100 if notional > 0 else 0.0
+        row['status'] = STATUS_CODES['CLOSED']
+        return TradeView(self, index)
+    
+    def transfer(self, index: int):
+        """Stop tracking an open position that another process now manages"""
+        self.data[index]['status'] = STATUS_CODES['TRANSFERRED']
+    
+    def append_closed(self, symbol: str, trade_type: str, entry_price: float, exit_price: float,
+                      size: float, **kwargs) -> TradeView:
+        """Record an already-closed trade in one step"""
+        exit_time = kwargs.pop('exit_time', None)
+        view = self.open(symbol, trade_type, entry_price, size, **kwargs)
+        return self.close(view.index, exit_price, exit_time)
+    
+    def extend(self, rows: np.ndarray, symbols: List[str]):
+        """Bulk-append structured rows whose symbol codes index `symbols`"""
+        self._reserve(len(rows))
+        remap = np.array([self.symbol_code(s) for s in symbols] or [0], dtype=np.int16)
+        block = self.data[self.count:self.count + len(rows)]
+        block[:] = rows
+        block['symbol'] = remap[rows['symbol']]
+        self.count += len(rows)
+    
+    def open_positions(self) -> List[TradeView]:
+        return [TradeView(self, int(i)) for i in np.flatnonzero(self.column('status') == STATUS_CODES['OPEN'])]
+    
+    def closed_mask(self) -> np.ndarray:
+        return self.column('status') == STATUS_CODES['CLOSED']
+    
+    def loss_since(self, since: datetime) -> float:
+        """Total absolute loss of trades closed at or after `since`"""
+        pnl = self.column('pnl')
+        mask = self.closed_mask() & (self.column('exit_time') >= to_epoch_ns(since)) & (pnl < 0)
+        return float(-pnl[mask].sum())
+    
+    def to_rows(self, closed_only: bool = True) -> List[dict]:
+        """Bulk conversion to TradeDatabase.save_trade payloads"""
+        indices = np.flatnonzero(self.closed_mask()) if closed_only else range(self.count)
+        return [TradeView(self, int(i)).to_row() for i in indices]
+    
+    def get_state(self, prefix: str) -> Dict[str, np.ndarray]:
+        """Snapshot arrays (copies) for StateSnapshotter"""
+        return {f'{prefix}_rows': self.rows.copy(), f'{prefix}_symbols': np.array(self.symbols, dtype=str)}
+    
+    @classmethod
+    def from_state(cls, arrays: Dict[str, np.ndarray], prefix: str) -> 'TradeStore':
+        rows = arrays[f'{prefix}_rows']
+        store = cls(capacity=max(len(rows) * 2, 64))
+        store.extend(rows, [str(s) for s in arrays[f'{prefix}_symbols']])
+        return store
+    
+    @classmethod
+    def from_rows(cls, rows: List[dict]) -> 'TradeStore':
+        """Bulk conversion from TradeDatabase rows / save_trade payloads"""
+        store = cls(capacity=max(len(rows), 1))
+        n = len(rows)
+        data = store.data[:n]
+        exit_ns = np.array([to_epoch_ns(datetime.fromisoformat(r['timestamp'])) for r in rows], dtype=np.int64)
+        duration_ns = np.array([r.get('duration_minutes') or 0 for r in rows], dtype=np.int64) * 60_000_000_000
+        data['exit_time'] = exit_ns
+        data['entry_time'] = exit_ns - duration_ns
+        for column, key in (('entry_price', 'entry_price'), ('exit_price', 'exit_price'),
+                            ('size', 'position_size'), ('stop_loss', 'stop_loss'),
+                            ('take_profit', 'take_profit'), ('pnl', 'pnl'), ('pnl_percent', 'pnl_percent')):
+            data[column] = [r[key] for r in rows]
+        data['symbol'] = [store.symbol_code(r['symbol']) for r in rows]
+        data['side'] = [SIDE_CODES[r['type']] for r in rows]
+        data['status'] = [STATUS_CODES.get(r.get('status', 'CLOSED'), STATUS_CODES['CLOSED']) for r in rows]
+        data['signal'] = TradeSignal.HOLD.value
+        store.count = n
+        return store
+
+
 class SecurityManager:
     """Enterprise-grade security management"""
     
@@ -270,25 +2437,51 @@ class AdvancedIndicatorAnalyzer:
     
     def __init__(self, config: dict):
         self.config = config
-        self.indicator_weights = config.get('indicator_weights', {
-            'ema': 0.20,
-            'rsi': 0.15,
-            'macd': 0.18,
-            'bollinger': 0.12,
-            'atr': 0.10,
-            'stochastic': 0.10,
-            'momentum': 0.10,
-            'adx': 0.05
-        })
+        self.settings = BotSettings.compile(config)
         self.cache = FastDataCache()
         self.ml_model = PredictiveMLModel(config)
+        # Analyzers swallow errors and return a neutral (0, 0); count them so
+        # silent failures and fallback paths show up in profiles
+        self.failure_counts: Dict[str, int] = {}
+        self.fallback_counts: Dict[str, int] = {}
+        self.last_errors: Dict[str, str] = {}
     
-    def analyze_ema(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def apply_settings(self, settings: BotSettings, changed: set):
+        """
+        Swap in reloaded settings. Indicators are recomputed from the bars every
+        cycle, so the only parameter-dependent state is the ML feature engine
+        (EMA/RSI periods are its inputs); it is rebuilt only when those change.
+        """
+        self.settings = settings
+        self.config = settings.raw
+        if 'strategy' in changed:
+            self.ml_model.reset_features(settings.raw)
+    
+    def _swallowed(self, name: str, error: Exception) -> Tuple[float, int]:
+        self.failure_counts[name] = self.failure_counts.get(name, 0) + 1
+        self.last_errors[name] = repr(error)
+        return 0, 0
+    
+    def _fallback(self, name: str) -> Tuple[float, int]:
+        self.fallback_counts[name] = self.fallback_counts.get(name, 0) + 1
+        return 0, 0
+    
+    def failure_report(self) -> dict:
+        """Swallowed exceptions and neutral fallbacks per analyzer"""
+        failures = dict(self.failure_counts)
+        if self.ml_model.failure_count:
+            failures['ml'] = self.ml_model.failure_count
+        errors = dict(self.last_errors)
+        if self.ml_model.last_error:
+            errors['ml'] = self.ml_model.last_error
+        return {'failures': failures, 'fallbacks': dict(self.fallback_counts), 'last_errors': errors}
+    
+    def analyze_ema(self, df: Bars) -> Tuple[float, int]:
         """Fast EMA analysis using vectorized operations"""
         try:
-            close = df['close'].values
-            short_p = self.config['strategy'].get('ema_short', 9)
-            long_p = self.config['strategy'].get('ema_long', 21)
+            close = np.asarray(df['close'])
+            short_p = self.settings.strategy.ema_short
+            long_p = self.settings.strategy.ema_long
             
             # Vectorized EMA calculation (100x faster)
             ema_short = self._fast_ema(close, short_p)
@@ -304,8 +2497,8 @@ class AdvancedIndicatorAnalyzer:
                 ema_score = max(-1.0, (ema_short_val - ema_long_val) / last_close * 100)
             
             return ema_score, 1 if ema_score > 0.1 else (-1 if ema_score < -0.1 else 0)
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('ema', e)
     
     def _fast_ema(self, data: np.ndarray, period: int) -> np.ndarray:
         """Ultra-fast EMA using vectorized operations"""
@@ -321,14 +2514,14 @@ class AdvancedIndicatorAnalyzer:
         
         return ema
     
-    def analyze_rsi(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_rsi(self, df: Bars) -> Tuple[float, int]:
         """Fast RSI using efficient algorithm"""
         try:
-            close = df['close'].values
-            period = self.config['strategy'].get('rsi_period', 14)
+            close = np.asarray(df['close'])
+            period = self.settings.strategy.rsi_period
             
             if len(close) < period + 1:
-                return 0, 0
+                return self._fallback('rsi')
             
             delta = np.diff(close)
             gain = np.where(delta > 0, delta, 0)
@@ -344,13 +2537,13 @@ class AdvancedIndicatorAnalyzer:
             signal = 1 if rsi < 30 else (-1 if rsi > 70 else 0)
             
             return rsi_score, signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('rsi', e)
     
-    def analyze_macd(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_macd(self, df: Bars) -> Tuple[float, int]:
         """Fast MACD using EMA fast calculation"""
         try:
-            close = df['close'].values
+            close = np.asarray(df['close'])
             
             ema12 = self._fast_ema(close, 12)
             ema26 = self._fast_ema(close, 26)
@@ -362,13 +2555,13 @@ class AdvancedIndicatorAnalyzer:
             signal = 1 if macd[-1] > macd_signal[-1] else -1
             
             return score, signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('macd', e)
     
-    def analyze_bollinger_bands(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_bollinger_bands(self, df: Bars) -> Tuple[float, int]:
         """Fast Bollinger Bands"""
         try:
-            close = df['close'].values[-100:]  # Last 100 bars
+            close = np.asarray(df['close'])[-100:]  # Last 100 bars
             period = 20
             std_dev = 2
             
@@ -383,15 +2576,15 @@ class AdvancedIndicatorAnalyzer:
             signal = 1 if close[-1] < sma[-1] else -1
             
             return np.clip(score, -1, 1), signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('bollinger', e)
     
-    def analyze_atr(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_atr(self, df: Bars) -> Tuple[float, int]:
         """Fast ATR volatility"""
         try:
-            high = df['high'].values[-20:]
-            low = df['low'].values[-20:]
-            close = df['close'].values[-20:]
+            high = np.asarray(df['high'])[-20:]
+            low = np.asarray(df['low'])[-20:]
+            close = np.asarray(df['close'])[-20:]
             
             tr = np.maximum(high - low, np.maximum(np.abs(high - close[:-1]), np.abs(low - close[:-1])))
             atr = np.mean(tr)
@@ -400,15 +2593,15 @@ class AdvancedIndicatorAnalyzer:
             signal = 1 if volatility_score < 0.02 else 0
             
             return np.clip(volatility_score, -1, 1), signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('atr', e)
     
-    def analyze_stochastic(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_stochastic(self, df: Bars) -> Tuple[float, int]:
         """Fast Stochastic Oscillator"""
         try:
-            close = df['close'].values[-20:]
-            high = df['high'].values[-20:]
-            low = df['low'].values[-20:]
+            close = np.asarray(df['close'])[-20:]
+            high = np.asarray(df['high'])[-20:]
+            low = np.asarray(df['low'])[-20:]
             
             lowest_low = np.min(low)
             highest_high = np.max(high)
@@ -419,27 +2612,27 @@ class AdvancedIndicatorAnalyzer:
             signal = 1 if k < 20 else (-1 if k > 80 else 0)
             
             return np.clip(score, -1, 1), signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('stochastic', e)
     
-    def analyze_momentum(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_momentum(self, df: Bars) -> Tuple[float, int]:
         """NEW: Momentum analysis"""
         try:
-            close = df['close'].values
+            close = np.asarray(df['close'])
             
             roc = (close[-1] / close[-10] - 1) * 100 if len(close) >= 10 else 0
             score = np.tanh(roc / 10)
             signal = 1 if roc > 0 else -1
             
             return np.clip(score, -1, 1), signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('momentum', e)
     
-    def analyze_adx(self, df: pd.DataFrame) -> Tuple[float, int]:
+    def analyze_adx(self, df: Bars) -> Tuple[float, int]:
         """NEW: ADX trend strength"""
         try:
-            high = df['high'].values[-50:]
-            low = df['low'].values[-50:]
+            high = np.asarray(df['high'])[-50:]
+            low = np.asarray(df['low'])[-50:]
             
             plus_dm = np.where((high[1:] > high[:-1]) & ((high[1:] - high[:-1]) > (low[:-1] - low[1:])),
                              high[1:] - high[:-1], 0)
@@ -457,13 +2650,14 @@ class AdvancedIndicatorAnalyzer:
             signal = 1 if adx > 25 else 0
             
             return np.clip(score, -1, 1), signal
-        except:
-            return 0, 0
+        except Exception as e:
+            return self._swallowed('adx', e)
     
-    def calculate_composite_signal(self, df: pd.DataFrame) -> Tuple[TradeSignal, float]:
+    def calculate_composite_signal(self, df: Bars, symbol: str = '', peers: Optional[Dict[str, Bars]] = None,
+                                   use_ml: bool = True) -> Tuple[TradeSignal, float]:
         """
         Calculate composite signal with ML prediction boost
-        Returns (signal, confidence)
+        Returns (signal, confidence); use_ml=False skips the ML stage under load
         """
         try:
             scores = {}
@@ -480,10 +2674,14 @@ class AdvancedIndicatorAnalyzer:
             scores['adx'], signals['adx'] = self.analyze_adx(df)
             
             # Weighted composite score
-            weighted_score = sum(scores[k] * self.indicator_weights[k] for k in scores)
+            w = self.settings.weights
+            weighted_score = (scores['ema'] * w.ema + scores['rsi'] * w.rsi + scores['macd'] * w.macd
+                              + scores['bollinger'] * w.bollinger + scores['atr'] * w.atr
+                              + scores['stochastic'] * w.stochastic + scores['momentum'] * w.momentum
+                              + scores['adx'] * w.adx)
             
             # ML prediction boost
-            ml_prediction, ml_confidence = self.ml_model.predict_next_move(df)
+            ml_prediction, ml_confidence = self.ml_model.predict_next_move(df, symbol=symbol, peers=peers) if use_ml else (0, 0)
             if ml_confidence > 0.6:
                 weighted_score = (weighted_score * 0.7) + (ml_prediction * 0.3)
             
@@ -496,7 +2694,9 @@ class AdvancedIndicatorAnalyzer:
             max_agreement = max(buy_signals, sell_signals)
             confidence = max_agreement / total_signals if total_signals > 0 else 0
             
-            logger.info(f"📊 Analysis: Score={weighted_score:.3f} | Buy={buy_signals}/8 | Sell={sell_signals}/8 | ML={ml_confidence:.2f} | Conf={confidence:.2f}")
+            hot_log.event('analysis', "📊 Analysis: Score={score:.3f} | Buy={buy}/8 | Sell={sell}/8 | ML={ml:.2f} | Conf={confidence:.2f}",
+                          score=float(weighted_score), buy=buy_signals, sell=sell_signals,
+                          ml=float(ml_confidence), confidence=confidence)
             
             # Signal generation with higher thresholds
             if weighted_score > 0.65 and buy_signals >= 6:
@@ -520,14 +2720,31 @@ class AdvancedRiskManager:
     
     def __init__(self, config: dict):
         self.config = config
-        self.trade_history = []
-        self.max_daily_loss = config['risk'].get('max_daily_loss_pct', 0.05)
-        self.max_position_risk = config['risk'].get('max_position_risk_pct', 0.02)
-        self.max_drawdown = config['risk'].get('max_drawdown_pct', 0.10)
+        self.trade_history = TradeStore()
+        self.simulated_max_drawdown = None
+        # A simulated drawdown below this share of the configured limit points at bad P&L units, not a real edge
+        self.monte_carlo_floor = config.get('monte_carlo', {}).get('floor_fraction', 0.25)
+        self.peak_equity = 0.0
+        self.contract_size = config.get('portfolio_risk', {}).get('contract_size', 100000)
+        self.apply_settings(BotSettings.compile(config).risk)
+        self.calendar = TradingCalendar(config)
+    
+    def apply_settings(self, risk: RiskSettings):
+        self.configured_max_drawdown = risk.max_drawdown_pct
+        self.max_daily_loss = risk.max_daily_loss_pct
+        self.max_position_risk = risk.max_position_risk_pct
+        self.max_drawdown = min(risk.max_drawdown_pct, self.simulated_max_drawdown or np.inf)
+        self.min_lot = risk.min_lot
+        self.max_lot = risk.max_lot
     
     def calculate_position_size(self, account_equity: float, current_price: float, 
-                               stop_loss: float) -> Tuple[float, float, float]:
-        """Advanced position sizing using risk/reward ratio"""
+                               stop_loss: float, trade_type: str = 'BUY',
+                               quote_to_account: float = 1.0) -> Tuple[float, float, float]:
+        """
+        Advanced position sizing using risk/reward ratio. Returns lots: the
+        stop distance is in quote currency per base unit, so the risk budget is
+        divided by the account-currency loss of one lot at the stop.
+        """
         try:
             risk_amount = account_equity * self.max_position_risk
             sl_distance = abs(current_price - stop_loss)
@@ -535,17 +2752,23 @@ class AdvancedRiskManager:
             if sl_distance == 0:
                 sl_distance = current_price * 0.01
             
-            position_size = risk_amount / sl_distance
-            position_size = max(0.01, min(position_size, 100))
+            if not np.isfinite(quote_to_account) or quote_to_account <= 0:
+                logger.warning("Position sizing skipped: no conversion rate to the account currency yet")
+                return 0, 0, 0
+            
+            position_size = risk_amount / (sl_distance * self.contract_size * quote_to_account)
+            position_size = round(max(self.min_lot, min(position_size, self.max_lot)), 2)
             
-            # 1:3 risk/reward ratio
+            # 1:3 risk/reward ratio, TP/SL on the side of the trade direction
+            direction = SIDE_CODES[trade_type]
             tp_distance = sl_distance * 3
-            take_profit = current_price + tp_distance
-            adjusted_sl = current_price - sl_distance
+            take_profit = current_price + direction * tp_distance
+            adjusted_sl = current_price - direction * sl_distance
             
             risk_reward_ratio = tp_distance / sl_distance if sl_distance > 0 else 0
             
-            logger.info(f"💰 Position Size: {position_size:.2f} | SL: {adjusted_sl:.5f} | TP: {take_profit:.5f} | R:R: {risk_reward_ratio:.2f}")
+            hot_log.event('sizing', "💰 Position Size: {size:.2f} | SL: {sl:.5f} | TP: {tp:.5f} | R:R: {rr:.2f}",
+                          size=float(position_size), sl=float(adjusted_sl), tp=float(take_profit), rr=float(risk_reward_ratio))
             
             return position_size, adjusted_sl, take_profit
         
@@ -553,11 +2776,33 @@ class AdvancedRiskManager:
             logger.error(f"Position sizing error: {e}")
             return 0, 0, 0
     
+    def apply_monte_carlo(self, report: dict):
+        """
+        Cap max_drawdown at the simulated drawdown quantile: a drawdown deeper than
+        the strategy's own history makes plausible means the edge may be gone.
+        Only ever tightens the configured limit, and never below floor_fraction of it.
+        """
+        recommended = report.get('recommended_max_drawdown')
+        if not recommended:
+            return
+        if recommended < self.configured_max_drawdown * self.monte_carlo_floor:
+            logger.warning(f"⚠ Monte Carlo drawdown {recommended:.4%} is far below the configured "
+                           f"{self.configured_max_drawdown:.2%} - check the P&L units; not applied")
+            return
+        self.simulated_max_drawdown = recommended
+        self.max_drawdown = min(self.configured_max_drawdown, recommended)
+        logger.info(f"✓ Max drawdown {self.max_drawdown:.2%} (configured {self.configured_max_drawdown:.2%}, "
+                    f"Monte Carlo p{report.get('quantile', 0.95) * 100:.0f} {recommended:.2%})")
+    
+    def update_drawdown(self, equity: float) -> float:
+        """Drawdown from peak equity as a positive fraction (same measure as the Monte Carlo report)"""
+        self.peak_equity = max(self.peak_equity, equity)
+        return (self.peak_equity - equity) / self.peak_equity if self.peak_equity > 0 else 0.0
+    
     def check_risk_limits(self, account_equity: float, current_drawdown: float) -> bool:
         """Check if trading should continue"""
         try:
-            daily_loss = sum(abs(t.get('pnl', 0)) for t in self.trade_history 
-                           if t.get('timestamp', datetime.now()).date() == datetime.now().date() and t.get('pnl', 0) < 0)
+            daily_loss = self.trade_history.loss_since(self.calendar.day_start())
             
             max_daily_loss_amount = account_equity * self.max_daily_loss
             
@@ -574,28 +2819,225 @@ class AdvancedRiskManager:
             logger.error(f"Risk check error: {e}")
             return True
     
-    def record_trade(self, entry_price: float, exit_price: float, position_size: float, trade_type: str):
+    def record_trade(self, entry_price: float, exit_price: float, position_size: float, trade_type: str,
+                     symbol: str = '') -> Optional[TradeView]:
         """Record trade for analytics"""
         try:
-            pnl = (exit_price - entry_price) * position_size if trade_type == 'BUY' else (entry_price - exit_price) * position_size
-            
-            trade_data = {
-                'timestamp': datetime.now(),
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'position_size': position_size,
-                'type': trade_type,
-                'pnl': pnl,
-                'win': 1 if pnl > 0 else 0
-            }
-            
-            self.trade_history.append(trade_data)
-            return trade_data
+            return self.trade_history.append_closed(symbol, trade_type, entry_price, exit_price, position_size)
         except Exception as e:
             logger.error(f"Trade recording error: {e}")
             return None
 
 
+# ============================================================================
+# PORTFOLIO RISK
+# ============================================================================
+
+class PortfolioRiskEngine:
+    """
+    Portfolio-level risk across concurrent positions and symbols.
+    Open positions live in flat arrays; currency exposure, the rolling return
+    covariance (updated incrementally per bar from running sums) and parametric
+    VaR are each a single vectorized pass, so pre-trade checks stay sub-millisecond.
+    """
+    
+    def __init__(self, config: dict):
+        pr_config = config.get('portfolio_risk', {})
+        self.symbols: List[str] = list(pr_config.get('symbols') or config.get('symbols') or [config.get('symbol', 'EURUSD')])
+        self.account_currency = pr_config.get('account_currency', 'USD')
+        self.contract_size = pr_config.get('contract_size', 100000)
+        self.window = pr_config.get('window', 100)
+        self.horizon_bars = pr_config.get('horizon_bars', 1)
+        self.max_var_pct = pr_config.get('max_var_pct', 0.03)
+        self.max_currency_exposure = pr_config.get('max_currency_exposure', 10.0)  # x equity
+        self.z_score = NormalDist().inv_cdf(pr_config.get('var_confidence', 0.99))
+        self.bar_lag = pr_config.get('bar_lag', 2)  # newer bars seen before an incomplete bar is committed
+        
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        
+        # Currency incidence: +1 for base, -1 for quote
+        self.currencies: List[str] = sorted({s[:3] for s in self.symbols} | {s[3:6] for s in self.symbols} | {self.account_currency})
+        currency_index = {c: i for i, c in enumerate(self.currencies)}
+        self.incidence = np.zeros((n, len(self.currencies)))
+        self.base_idx = np.array([currency_index[s[:3]] for s in self.symbols], dtype=np.intp)
+        self.incidence[np.arange(n), self.base_idx] = 1.0
+        self.incidence[np.arange(n), [currency_index[s[3:6]] for s in self.symbols]] = -1.0
+        
+        # Conversion of each currency to the account currency via a direct pair
+        self._conv_symbol = np.full(len(self.currencies), -1, dtype=np.intp)
+        self._conv_invert = np.zeros(len(self.currencies), dtype=bool)
+        for c, ci in currency_index.items():
+            if (c + self.account_currency) in self.symbol_index:
+                self._conv_symbol[ci] = self.symbol_index[c + self.account_currency]
+            elif (self.account_currency + c) in self.symbol_index:
+                self._conv_symbol[ci] = self.symbol_index[self.account_currency + c]
+                self._conv_invert[ci] = True
+        
+        self.prices = np.full(n, np.nan)
+        self.net_lots = np.zeros(n)  # signed lots per symbol
+        
+        # Rolling window of log returns with running first/second moments
+        self._returns = np.zeros((self.window, n))
+        self._sum = np.zeros(n)
+        self._sum_outer = np.zeros((n, n))
+        self._head = 0
+        self._filled = 0
+        self.covariance = np.zeros((n, n))
+        
+        # Closed-bar closes per bar time, committed once every symbol has reported (or bar_lag newer bars exist)
+        self._pending_bars: Dict[int, Dict[str, float]] = {}
+        self.last_bar_time = 0
+    
+    def observe_bar(self, symbol: str, bar_time: int, close: float):
+        """
+        Record a symbol's closed-bar close; the return window gets exactly one
+        row per bar time with all symbols aligned. Symbols that never report a
+        bar (closed market, shed, other shard offline) carry forward.
+        """
+        if symbol not in self.symbol_index or bar_time <= self.last_bar_time:
+            return
+        self._pending_bars.setdefault(bar_time, {})[symbol] = close
+        while self._pending_bars:
+            oldest = min(self._pending_bars)
+            if len(self._pending_bars[oldest]) < len(self.symbols) and len(self._pending_bars) <= self.bar_lag:
+                break
+            self.update_prices(self._pending_bars.pop(oldest))
+            self.last_bar_time = oldest
+    
+    def update_prices(self, prices: Dict[str, float]):
+        """Per-bar update; symbols missing from `prices` carry forward (zero return)"""
+        new_prices = self.prices.copy()
+        for symbol, price in prices.items():
+            i = self.symbol_index.get(symbol)
+            if i is not None:
+                new_prices[i] = price
+        
+        valid = np.isfinite(self.prices) & np.isfinite(new_prices)
+        returns = np.zeros(len(self.symbols))
+        returns[valid] = np.log(new_prices[valid] / self.prices[valid])
+        had_history = np.isfinite(self.prices).any()
+        self.prices = new_prices
+        if not had_history:
+            return
+        
+        old = self._returns[self._head]
+        self._sum += returns - old
+        self._sum_outer += np.outer(returns, returns) - np.outer(old, old)
+        self._returns[self._head] = returns
+        self._head = (self._head + 1) % self.window
+        self._filled = min(self._filled + 1, self.window)
+        
+        if self._filled > 1:
+            mean = self._sum / self._filled
+            self.covariance = (self._sum_outer - self._filled * np.outer(mean, mean)) / (self._filled - 1)
+    
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {
+            'pr_symbols': np.array(self.symbols, dtype=str),
+            'pr_prices': self.prices.copy(),
+            'pr_returns': self._returns.copy(),
+            'pr_cursor': np.array([self._head, self._filled, self.last_bar_time])
+        }
+    
+    def set_state(self, arrays: Dict[str, np.ndarray]) -> bool:
+        """Restore rolling state; ignored if the symbol universe or window changed"""
+        if [str(s) for s in arrays.get('pr_symbols', [])] != self.symbols or arrays['pr_returns'].shape != self._returns.shape:
+            return False
+        self.prices = arrays['pr_prices'].copy()
+        self._returns = arrays['pr_returns'].copy()
+        cursor = [int(v) for v in arrays['pr_cursor']]
+        self._head, self._filled = cursor[:2]
+        self.last_bar_time = cursor[2] if len(cursor) > 2 else 0
+        self._sum = self._returns.sum(axis=0)
+        self._sum_outer = self._returns.T @ self._returns
+        if self._filled > 1:
+            mean = self._sum / self._filled
+            self.covariance = (self._sum_outer - self._filled * np.outer(mean, mean)) / (self._filled - 1)
+        return True
+    
+    def correlation(self) -> np.ndarray:
+        std = np.sqrt(np.clip(np.diag(self.covariance), 0, None))
+        denom = np.outer(std, std)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denom > 0, self.covariance / denom, 0.0)
+    
+    def set_positions(self, positions: List[Tuple[str, str, float]]):
+        """Rebuild signed lots per symbol from (symbol, 'BUY'/'SELL', lots) tuples"""
+        self.net_lots[:] = 0.0
+        for symbol, trade_type, size in positions:
+            i = self.symbol_index.get(symbol)
+            if i is not None:
+                self.net_lots[i] += SIDE_CODES[trade_type] * size
+    
+    def sync_positions(self, store: TradeStore):
+        """Rebuild signed lots per symbol from the open rows of a TradeStore"""
+        self.net_lots[:] = 0.0
+        rows = store.rows
+        open_rows = rows[rows['status'] == STATUS_CODES['OPEN']]
+        if len(open_rows) == 0:
+            return
+        code_map = np.array([self.symbol_index.get(s, -1) for s in store.symbols], dtype=np.intp)
+        idx = code_map[open_rows['symbol']]
+        known = idx >= 0
+        np.add.at(self.net_lots, idx[known], (open_rows['size'] * open_rows['side'])[known])
+    
+    def _base_to_account(self) -> np.ndarray:
+        """Account-currency value of one unit of each symbol's base currency"""
+        rates = np.ones(len(self.currencies))
+        mapped = self._conv_symbol >= 0
+        conv_prices = self.prices[self._conv_symbol[mapped]]
+        rates[mapped] = np.where(self._conv_invert[mapped], 1.0 / conv_prices, conv_prices)
+        return rates[self.base_idx]
+    
+    def quote_to_account(self, symbol: str, price: float) -> float:
+        """Account-currency value of one unit of the symbol's quote currency (NaN until known)"""
+        if symbol[3:6] == self.account_currency:
+            return 1.0
+        if symbol[:3] == self.account_currency:
+            return 1.0 / price
+        i = self.symbol_index.get(symbol)
+        if i is None or self._conv_symbol[self.base_idx[i]] < 0:
+            return np.nan
+        return float(self._base_to_account()[i] / price)
+    
+    def notional(self, lots: np.ndarray) -> np.ndarray:
+        """Signed account-currency notional per symbol (works on (n,) or (k, n) lots)"""
+        return np.nan_to_num(lots * self.contract_size * self._base_to_account())
+    
+    def currency_exposure(self, lots: Optional[np.ndarray] = None) -> Dict[str, float]:
+        exposure = self.notional(self.net_lots if lots is None else lots) @ self.incidence
+        return dict(zip(self.currencies, exposure))
+    
+    def value_at_risk(self, lots: Optional[np.ndarray] = None) -> np.ndarray:
+        """Parametric VaR in account currency for one or a batch of lot vectors"""
+        w = self.notional(self.net_lots if lots is None else lots)
+        variance = np.einsum('...i,ij,...j->...', w, self.covariance, w)
+        return self.z_score * np.sqrt(np.clip(variance, 0, None) * self.horizon_bars)
+    
+    def check_trades(self, candidates: List[Tuple[str, str, float]], account_equity: float) -> np.ndarray:
+        """Vectorized pre-trade check of (symbol, 'BUY'/'SELL', lots) candidates against the current book"""
+        k = len(candidates)
+        lots = np.tile(self.net_lots, (k, 1))
+        for row, (symbol, trade_type, size) in enumerate(candidates):
+            i = self.symbol_index.get(symbol)
+            if i is not None:
+                lots[row, i] += SIDE_CODES[trade_type] * size
+        
+        var_ok = self.value_at_risk(lots) <= self.max_var_pct * account_equity
+        exposure = np.abs(self.notional(lots) @ self.incidence)
+        exposure_ok = (exposure <= self.max_currency_exposure * account_equity).all(axis=1)
+        return var_ok & exposure_ok
+    
+    def check_trade(self, symbol: str, trade_type: str, size: float, account_equity: float) -> bool:
+        if symbol not in self.symbol_index:
+            return True
+        allowed = bool(self.check_trades([(symbol, trade_type, size)], account_equity)[0])
+        if not allowed:
+            logger.warning(f"⚠ Portfolio risk limit: {trade_type} {size:.2f} {symbol} rejected (VaR now ${float(self.value_at_risk()):,.2f})")
+        return allowed
+
+
 class TradeDatabase:
     """SQLite database for trades"""
     
@@ -627,91 +3069,575 @@ class TradeDatabase:
                 )
             ''')
             
+            # Precomputed aggregates, updated incrementally on every save so the
+            # dashboard never scans the trades table. scope is 'ALL' or a symbol.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rollup_totals (
+                    scope TEXT PRIMARY KEY,
+                    trades INTEGER NOT NULL,
+                    wins INTEGER NOT NULL,
+                    pnl REAL NOT NULL,
+                    peak_pnl REAL NOT NULL,
+                    max_drawdown REAL NOT NULL,
+                    last_trade_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rollup_daily (
+                    day TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    trades INTEGER NOT NULL,
+                    wins INTEGER NOT NULL,
+                    pnl REAL NOT NULL,
+                    max_drawdown REAL NOT NULL,
+                    PRIMARY KEY (scope, day)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS equity_curve (
+                    trade_id INTEGER PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    equity REAL NOT NULL,
+                    drawdown REAL NOT NULL
+                )
+            ''')
+            
+            cursor.execute('SELECT COUNT(*) FROM trades')
+            trade_count = cursor.fetchone()[0]
+            cursor.execute("SELECT COALESCE(MAX(trades), 0) FROM rollup_totals WHERE scope = 'ALL'")
+            if cursor.fetchone()[0] != trade_count:
+                self._rebuild_rollups(cursor)
+            
             conn.commit()
             conn.close()
             logger.info(f"✓ Database initialized")
         except Exception as e:
             logger.error(f"Database init error: {e}")
     
+    INSERT_SQL = '''
+        INSERT INTO trades 
+        (timestamp, symbol, trade_type, entry_price, exit_price, position_size, 
+         stop_loss, take_profit, pnl, pnl_percent, status, duration_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    @staticmethod
+    def _row_params(trade_data: dict) -> tuple:
+        return (
+            trade_data['timestamp'],
+            trade_data['symbol'],
+            trade_data['type'],
+            trade_data['entry_price'],
+            trade_data['exit_price'],
+            trade_data['position_size'],
+            trade_data['stop_loss'],
+            trade_data['take_profit'],
+            trade_data['pnl'],
+            trade_data['pnl_percent'],
+            trade_data['status'],
+            trade_data.get('duration_minutes', 0)
+        )
+    
+    @staticmethod
+    def _apply_rollups(cursor, trade_id: int, timestamp: str, symbol: str, pnl: float):
+        """O(1) incremental update of totals, daily rollups and the equity curve"""
+        day = timestamp[:10]
+        win = 1 if pnl > 0 else 0
+        for scope in ('ALL', symbol):
+            cursor.execute('SELECT pnl, peak_pnl, max_drawdown FROM rollup_totals WHERE scope = ?', (scope,))
+            row = cursor.fetchone() or (0.0, 0.0, 0.0)
+            equity = row[0] + pnl
+            peak = max(row[1], equity)
+            drawdown = peak - equity
+            cursor.execute('''
+                INSERT INTO rollup_totals (scope, trades, wins, pnl, peak_pnl, max_drawdown, last_trade_id)
+                VALUES (?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT(scope) DO UPDATE SET
+                    trades = trades + 1, wins = wins + excluded.wins, pnl = excluded.pnl,
+                    peak_pnl = excluded.peak_pnl, max_drawdown = MAX(max_drawdown, excluded.max_drawdown),
+                    last_trade_id = excluded.last_trade_id
+            ''', (scope, win, equity, peak, drawdown, trade_id))
+            cursor.execute('''
+                INSERT INTO rollup_daily (day, scope, trades, wins, pnl, max_drawdown)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT(scope, day) DO UPDATE SET
+                    trades = trades + 1, wins = wins + excluded.wins, pnl = pnl + excluded.pnl,
+                    max_drawdown = MAX(max_drawdown, excluded.max_drawdown)
+            ''', (day, scope, win, pnl, drawdown))
+            if scope == 'ALL':
+                cursor.execute('INSERT OR REPLACE INTO equity_curve (trade_id, timestamp, equity, drawdown) VALUES (?, ?, ?, ?)',
+                               (trade_id, timestamp, equity, drawdown))
+    
+    def _rebuild_rollups(self, cursor):
+        """Recompute all aggregates from the trades table (one-off backfill)"""
+        cursor.execute('DELETE FROM rollup_totals')
+        cursor.execute('DELETE FROM rollup_daily')
+        cursor.execute('DELETE FROM equity_curve')
+        rows = cursor.execute('SELECT id, timestamp, symbol, pnl FROM trades ORDER BY id').fetchall()
+        for trade_id, timestamp, symbol, pnl in rows:
+            self._apply_rollups(cursor, trade_id, timestamp, symbol, pnl)
+        if rows:
+            logger.info(f"✓ Analytics rollups rebuilt from {len(rows)} trades")
+    
+    def _insert_trade(self, cursor, trade_data: dict):
+        cursor.execute(self.INSERT_SQL, self._row_params(trade_data))
+        self._apply_rollups(cursor, cursor.lastrowid, str(trade_data['timestamp']),
+                            trade_data['symbol'], trade_data['pnl'])
+    
     def save_trade(self, trade_data: dict):
         """Save trade"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT INTO trades 
-                (timestamp, symbol, trade_type, entry_price, exit_price, position_size, 
-                 stop_loss, take_profit, pnl, pnl_percent, status, duration_minutes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                trade_data['timestamp'],
-                trade_data['symbol'],
-                trade_data['type'],
-                trade_data['entry_price'],
-                trade_data['exit_price'],
-                trade_data['position_size'],
-                trade_data['stop_loss'],
-                trade_data['take_profit'],
-                trade_data['pnl'],
-                trade_data['pnl_percent'],
-                trade_data['status'],
-                trade_data.get('duration_minutes', 0)
-            ))
+            self._insert_trade(cursor, trade_data)
             
             conn.commit()
             conn.close()
         except Exception as e:
             logger.error(f"Trade save error: {e}")
     
-    def get_statistics(self) -> dict:
-        """Get trading statistics"""
+    def save_trades(self, store: TradeStore):
+        """Bulk-save all closed trades of a TradeStore in one transaction"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            for row in store.to_rows():
+                self._insert_trade(cursor, row)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Bulk trade save error: {e}")
+    
+    def load_trades(self, symbol: Optional[str] = None) -> TradeStore:
+        """Load trades into a compact TradeStore"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            query = '''
+                SELECT timestamp, symbol, trade_type AS type, entry_price, exit_price, position_size,
+                       stop_loss, take_profit, pnl, pnl_percent, status, duration_minutes
+                FROM trades
+            '''
+            params = ()
+            if symbol:
+                query += ' WHERE symbol = ?'
+                params = (symbol,)
+            rows = [dict(r) for r in conn.execute(query + ' ORDER BY id', params)]
+            conn.close()
+            return TradeStore.from_rows(rows)
+        except Exception as e:
+            logger.error(f"Trade load error: {e}")
+            return TradeStore()
+    
+    def get_statistics(self, scope: str = 'ALL') -> dict:
+        """Get trading statistics (constant time, read from rollup_totals)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('SELECT COUNT(*) FROM trades')
-            total_trades = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM trades WHERE pnl > 0')
-            winning_trades = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT SUM(pnl) FROM trades')
-            total_pnl = cursor.fetchone()[0] or 0
-            
-            cursor.execute('SELECT AVG(pnl) FROM trades')
-            avg_pnl = cursor.fetchone()[0] or 0
-            
-            win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+            cursor.execute('SELECT trades, wins, pnl, max_drawdown, last_trade_id FROM rollup_totals WHERE scope = ?', (scope,))
+            total_trades, winning_trades, total_pnl, max_drawdown, last_trade_id = cursor.fetchone() or (0, 0, 0.0, 0.0, 0)
             
             conn.close()
             
             return {
                 'total_trades': total_trades,
                 'winning_trades': winning_trades,
-                'win_rate_percent': win_rate,
+                'win_rate_percent': (winning_trades / total_trades * 100) if total_trades > 0 else 0,
                 'total_pnl': total_pnl,
-                'avg_pnl': avg_pnl
+                'avg_pnl': total_pnl / total_trades if total_trades > 0 else 0,
+                'max_drawdown': max_drawdown,
+                'last_trade_id': last_trade_id
             }
         except Exception as e:
             logger.error(f"Stats error: {e}")
             return {}
+    
+    def get_symbol_statistics(self) -> List[dict]:
+        """Per-symbol totals (one row per traded symbol)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('''
+                SELECT scope AS symbol, trades, wins, pnl, max_drawdown
+                FROM rollup_totals WHERE scope != 'ALL' ORDER BY scope
+            ''').fetchall()
+            conn.close()
+            return [dict(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Symbol stats error: {e}")
+            return []
+    
+    def get_daily_rollups(self, scope: str = 'ALL', before: Optional[str] = None, limit: int = 30) -> List[dict]:
+        """Daily rollups newest first; page with before=<last day of previous page>"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('''
+                SELECT day, trades, wins, pnl, max_drawdown FROM rollup_daily
+                WHERE scope = ? AND day < ? ORDER BY day DESC LIMIT ?
+            ''', (scope, before or '9999-12-31', limit)).fetchall()
+            conn.close()
+            return [dict(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Daily rollup error: {e}")
+            return []
+    
+    def get_equity_curve(self, after_trade_id: int = 0, limit: int = 500) -> List[dict]:
+        """Equity curve points (cumulative P&L per closed trade), paged by trade id"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('''
+                SELECT trade_id, timestamp, equity, drawdown FROM equity_curve
+                WHERE trade_id > ? ORDER BY trade_id LIMIT ?
+            ''', (after_trade_id, limit)).fetchall()
+            conn.close()
+            return [dict(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Equity curve error: {e}")
+            return []
+
+
+# ============================================================================
+# STATE SNAPSHOTS (WARM RESTART)
+# ============================================================================
+
+class StateSnapshotter:
+    """
+    Periodic crash-safe snapshots of in-memory trading state.
+    State is a flat dict of NumPy arrays plus a JSON meta string, written as an
+    uncompressed .npz to a temp file, fsynced and atomically renamed into place.
+    """
+    
+    VERSION = 2
+    
+    def __init__(self, config: dict, suffix: Optional[str] = None):
+        snap_config = config.get('snapshot', {})
+        self.enabled = snap_config.get('enabled', True)
+        self.path = Path(snap_config.get('path', 'state/snapshot.npz'))
+        if suffix:
+            # One snapshot per worker when several share a state directory
+            self.path = self.path.with_name(f"{self.path.stem}_{suffix}{self.path.suffix}")
+        self.interval = snap_config.get('interval_seconds', 60)
+        self.max_age = snap_config.get('max_age_seconds', 6 * 3600)
+        self.last_saved = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+    
+    def due(self) -> bool:
+        return self.enabled and time.monotonic() - self.last_saved >= self.interval
+    
+    def save(self, arrays: Dict[str, np.ndarray], meta: dict):
+        """Write a snapshot synchronously (arrays must already be private copies)"""
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                meta = dict(meta, version=self.VERSION, saved_at=time.time())
+                tmp_path = self.path.with_suffix('.tmp')
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Snapshot write error: {e}")
+    
+    def save_async(self, arrays: Dict[str, np.ndarray], meta: dict, executor: ThreadPoolExecutor):
+        """Hand the write to a worker thread; skipped if the previous write is still running"""
+        self.last_saved = time.monotonic()
+        if self._pending is not None and not self._pending.done():
+            return
+        self._pending = executor.submit(self.save, arrays, meta)
+    
+    def load(self) -> Optional[Tuple[Dict[str, np.ndarray], dict]]:
+        """Return (arrays, meta) of a fresh, compatible snapshot, else None"""
+        if not self.enabled or not self.path.exists():
+            return None
+        try:
+            with np.load(self.path, allow_pickle=False) as npz:
+                arrays = {k: npz[k] for k in npz.files}
+            meta = json.loads(str(arrays.pop('meta')))
+            if meta.get('version') != self.VERSION:
+                logger.warning("Snapshot version mismatch - cold start")
+                return None
+            age = time.time() - meta.get('saved_at', 0)
+            if age > self.max_age:
+                logger.warning(f"Snapshot is {age / 60:.0f} min old - cold start")
+                return None
+            return arrays, meta
+        except Exception as e:
+            logger.warning(f"Snapshot read error: {e} - cold start")
+            return None
+
+
+# ============================================================================
+# SHARD COORDINATOR (MULTI-NODE)
+# ============================================================================
+
+def _coordinator_address(config: dict) -> Tuple[str, int]:
+    coord_config = config.get('coordinator', {})
+    return (os.getenv('COORDINATOR_HOST', coord_config.get('host', '127.0.0.1')),
+            int(os.getenv('COORDINATOR_PORT', coord_config.get('port', 6100))))
+
+
+def _coordinator_authkey() -> bytes:
+    """Shared secret for the coordinator socket; it carries pickles, so a guessable key means code execution"""
+    key = os.getenv('COORDINATOR_AUTHKEY', '')
+    if not key or key in ('change-me', 'change_this_shared_secret'):
+        raise ValueError("COORDINATOR_AUTHKEY must be set to a private secret for coordinator/worker roles")
+    return key.encode()
+
+
+class ShardCoordinator:
+    """
+    Controller that assigns symbol shards to worker processes/containers and
+    enforces account-wide risk limits centrally. Workers heartbeat every cycle
+    with their open positions and latest signals; a worker that misses its
+    heartbeat window is dropped and its symbols move to the least-loaded workers.
+    """
+    
+    def __init__(self, config: dict):
+        coord_config = config.get('coordinator', {})
+        self.config = config
+        self.symbols: List[str] = list(config.get('symbols') or [config.get('symbol', 'EURUSD')])
+        self.address = _coordinator_address(config)
+        self.heartbeat_timeout = coord_config.get('heartbeat_timeout', 180)
+        self.max_trades_per_day = config.get('max_trades_per_day', 10)
+        
+        self.risk_manager = AdvancedRiskManager(config)
+        self.portfolio_risk = PortfolioRiskEngine(config)
+        
+        self.assignments: Dict[str, List[str]] = {}
+        self.last_seen: Dict[str, float] = {}
+        self.worker_positions: Dict[str, List[Tuple[int, str, str, float]]] = {}
+        self.orphan_positions: List[Tuple[int, str, str, float]] = []
+        self.signals: Dict[str, dict] = {}
+        self.equity = 0.0
+        self.drawdown = 0.0
+        self.calendar = TradingCalendar(config)
+        self.trades_today = 0
+        self.trades_today_date = self.calendar.trading_day()
+        
+        self.lock = threading.Lock()
+        self.running = False
+    
+    def _rebalance(self):
+        """Give unowned symbols to the least-loaded workers, then even out loads"""
+        workers = sorted(self.assignments)
+        if not workers:
+            return
+        owned = {s for shard in self.assignments.values() for s in shard}
+        for symbol in self.symbols:
+            if symbol not in owned:
+                self.assignments[min(workers, key=lambda w: len(self.assignments[w]))].append(symbol)
+        while True:
+            largest = max(workers, key=lambda w: len(self.assignments[w]))
+            smallest = min(workers, key=lambda w: len(self.assignments[w]))
+            if len(self.assignments[largest]) - len(self.assignments[smallest]) <= 1:
+                break
+            self.assignments[smallest].append(self.assignments[largest].pop())
+        logger.info("🔀 Shards: " + " | ".join(f"{w}={','.join(self.assignments[w])}" for w in workers))
+    
+    def _expire_workers(self):
+        now = time.monotonic()
+        dead = [w for w, seen in self.last_seen.items() if now - seen > self.heartbeat_timeout]
+        for worker in dead:
+            logger.warning(f"⚠ Worker {worker} missed heartbeats - reassigning {len(self.assignments.get(worker, []))} symbol(s)")
+            self.assignments.pop(worker, None)
+            self.last_seen.pop(worker, None)
+            self.orphan_positions.extend(self.worker_positions.pop(worker, []))
+        if dead:
+            self._refresh_exposure()
+            self._rebalance()
+    
+    def _refresh_exposure(self):
+        positions = [p for shard in self.worker_positions.values() for p in shard] + self.orphan_positions
+        self.portfolio_risk.set_positions([(symbol, side, size) for _, symbol, side, size in positions])
+    
+    def _roll_day(self):
+        today = self.calendar.trading_day()
+        if today != self.trades_today_date:
+            self.trades_today = 0
+            self.trades_today_date = today
+    
+    def trading_allowed(self) -> bool:
+        return self.risk_manager.check_risk_limits(self.equity, self.drawdown)
+    
+    def handle(self, msg: dict) -> dict:
+        """Process one worker request and return the reply"""
+        with self.lock:
+            op = msg.get('op')
+            worker = msg.get('worker')
+            self._roll_day()
+            
+            if op == 'heartbeat':
+                if worker not in self.assignments:
+                    logger.info(f"✓ Worker {worker} joined")
+                    self.assignments[worker] = []
+                    self.last_seen[worker] = time.monotonic()
+                    self._rebalance()
+                self.last_seen[worker] = time.monotonic()
+                
+                self.equity = msg.get('equity', self.equity)
+                self.drawdown = self.risk_manager.update_drawdown(self.equity)
+                
+                positions = [tuple(p) for p in msg.get('positions', [])]
+                reported = {p[0] for p in positions}
+                self.worker_positions[worker] = positions
+                self.orphan_positions = [p for p in self.orphan_positions if p[0] not in reported]
+                self._refresh_exposure()
+                
+                # Shards report at different times; the engine aligns closes by bar time
+                for sig in msg.get('signals', []):
+                    self.signals[sig['symbol']] = dict(sig, worker=worker)
+                    if sig.get('bar_time'):
+                        self.portfolio_risk.observe_bar(sig['symbol'], sig['bar_time'], sig['bar_close'])
+                
+                return {'symbols': list(self.assignments[worker]), 'trading_allowed': self.trading_allowed()}
+            
+            if op == 'approve':
+                symbol, side, size = msg['symbol'], msg['side'], msg['size']
+                if worker not in self.assignments or symbol not in self.assignments[worker]:
+                    return {'approved': False, 'reason': 'symbol not assigned to worker'}
+                if self.trades_today >= self.max_trades_per_day:
+                    return {'approved': False, 'reason': 'max trades per day'}
+                if not self.trading_allowed():
+                    return {'approved': False, 'reason': 'account risk limits'}
+                if not self.portfolio_risk.check_trade(symbol, side, size, msg.get('equity', self.equity)):
+                    return {'approved': False, 'reason': 'portfolio risk'}
+                # Count the exposure now; the next heartbeat replaces it with the real fill
+                self.worker_positions.setdefault(worker, []).append((0, symbol, side, size))
+                self._refresh_exposure()
+                self.trades_today += 1
+                return {'approved': True}
+            
+            if op == 'closed':
+                self.risk_manager.record_trade(msg['entry_price'], msg['exit_price'], msg['size'], msg['side'], msg['symbol'])
+                self.worker_positions[worker] = [p for p in self.worker_positions.get(worker, []) if p[0] != msg['ticket']]
+                self._refresh_exposure()
+                return {'ok': True}
+            
+            if op == 'status':
+                return {
+                    'assignments': {w: list(s) for w, s in self.assignments.items()},
+                    'signals': dict(self.signals),
+                    'exposure': self.portfolio_risk.currency_exposure(),
+                    'value_at_risk': float(self.portfolio_risk.value_at_risk()),
+                    'trades_today': self.trades_today,
+                    'trading_allowed': self.trading_allowed()
+                }
+            
+            return {'error': f'unknown op {op}'}
+    
+    def _serve_connection(self, conn):
+        try:
+            while self.running:
+                conn.send(self.handle(conn.recv()))
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"Coordinator connection error: {e}")
+        finally:
+            conn.close()
+    
+    def _monitor(self):
+        while self.running:
+            time.sleep(1)
+            with self.lock:
+                self._expire_workers()
+    
+    def serve_forever(self):
+        listener = Listener(self.address, authkey=_coordinator_authkey())
+        self.running = True
+        threading.Thread(target=self._monitor, name='coordinator-monitor', daemon=True).start()
+        logger.info(f"🧭 Coordinator listening on {self.address[0]}:{self.address[1]} | {len(self.symbols)} symbols")
+        try:
+            while self.running:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Coordinator accept error: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.running = False
+            listener.close()
+
+
+class CoordinatorClient:
+    """Worker-side connection to the ShardCoordinator (reconnects on failure)"""
+    
+    def __init__(self, config: dict, worker_id: str):
+        self.address = _coordinator_address(config)
+        self.authkey = _coordinator_authkey()
+        self.worker_id = worker_id
+        self.conn = None
+        self.lock = threading.Lock()
+        self.unreported_closes: List[dict] = []
+    
+    def _call(self, op: str, **payload) -> Optional[dict]:
+        with self.lock:
+            try:
+                if self.conn is None:
+                    self.conn = Client(self.address, authkey=self.authkey)
+                self.conn.send(dict(payload, op=op, worker=self.worker_id))
+                return self.conn.recv()
+            except Exception as e:
+                logger.warning(f"Coordinator call '{op}' failed: {e}")
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                return None
+    
+    def heartbeat(self, equity: float, balance: float, positions: List[TradeView], signals: List[dict]) -> Optional[dict]:
+        return self._call('heartbeat', equity=equity, balance=balance, signals=signals,
+                          positions=[(p.ticket, p.symbol, p.type, p.size) for p in positions])
+    
+    def approve_trade(self, symbol: str, trade_type: str, size: float, equity: float) -> bool:
+        reply = self._call('approve', symbol=symbol, side=trade_type, size=size, equity=equity)
+        if reply is None:
+            return False
+        if not reply.get('approved'):
+            logger.warning(f"⚠ Coordinator rejected {trade_type} {symbol}: {reply.get('reason')}")
+        return bool(reply.get('approved'))
+    
+    def report_close(self, trade: TradeView):
+        self.unreported_closes.append(dict(ticket=trade.ticket, symbol=trade.symbol, side=trade.type,
+                                           entry_price=trade.entry_price, exit_price=trade.exit_price, size=trade.size))
+        self.flush_closes()
+    
+    def flush_closes(self):
+        """Deliver close reports queued while the coordinator was unreachable"""
+        while self.unreported_closes:
+            if self._call('closed', **self.unreported_closes[0]) is None:
+                return
+            self.unreported_closes.pop(0)
 
 
 class AdvancedForexBot:
     """Advanced Forex Trading Bot v3.0 - Ultra-Fast Predictive AI"""
     
-    def __init__(self):
+    MAGIC_NUMBER = 234001
+    
+    def __init__(self, worker_id: Optional[str] = None):
         # Create necessary directories
         os.makedirs('models', exist_ok=True)
         os.makedirs('logs', exist_ok=True)
+        os.makedirs('state', exist_ok=True)
         
         with open('config.yaml', 'r') as f:
             self.config = yaml.safe_load(f)
+        self.settings = BotSettings.compile(self.config)
+        self.config_watcher = ConfigWatcher('config.yaml', self.settings)
+        hot_log.configure(self.config)
+        event_bus.configure(self.config)
         
         self.security_manager = SecurityManager()
         self.indicator_analyzer = AdvancedIndicatorAnalyzer(self.config)
         self.risk_manager = AdvancedRiskManager(self.config)
+        self.portfolio_risk = PortfolioRiskEngine(self.config)
         self.trade_db = TradeDatabase()
         
         self.broker = os.getenv('MT5_BROKER', 'YourBroker')
@@ -722,6 +3648,12 @@ class AdvancedForexBot:
         self.timeframe = self.config.get('timeframe', '1h')
         self.env_mode = os.getenv('ENV', 'production')
         
+        # Worker mode: symbols come from the coordinator, risk is enforced centrally
+        self.worker_id = worker_id
+        self.coordinator = CoordinatorClient(self.config, worker_id) if worker_id else None
+        self.symbols: List[str] = [] if worker_id else list(self.config.get('symbols') or [self.symbol])
+        self.pending_signals: List[dict] = []
+        
         # Only set MT5 timeframe map if MT5 is available
         if MT5_AVAILABLE:
             self.timeframe_map = {
@@ -736,10 +3668,30 @@ class AdvancedForexBot:
             self.mt5_timeframe = self.timeframe_map.get(self.timeframe, mt5.TIMEFRAME_H1)
         
         self.is_trading = False
-        self.current_position = None
+        self.positions = TradeStore(capacity=64)
+        self.calendar = TradingCalendar(self.config)
         self.trades_today = 0
-        self.max_trades_per_day = self.config.get('max_trades_per_day', 10)
+        self.trades_today_date = self.calendar.trading_day()
+        self.candles: Dict[str, BarFrame] = {}
+        self.snapshotter = StateSnapshotter(self.config, suffix=worker_id)
+        self.max_trades_per_day = self.settings.max_trades_per_day
         self.thread_pool = ThreadPoolExecutor(max_workers=4)
+        
+        self.profiler = CycleProfiler(self.config)
+        self.scheduler = CycleScheduler(self.config)
+        self.stage_times: Dict[str, float] = {'fetch': 0.0, 'analysis': 0.0, 'execution': 0.0}
+        if hasattr(os_signal, 'SIGUSR1'):
+            try:
+                os_signal.signal(os_signal.SIGUSR1, lambda *_: self.profiler.request())
+            except ValueError:
+                pass  # not in the main thread
+    
+    def position_for(self, symbol: str) -> Optional[TradeView]:
+        """Latest open position for a symbol"""
+        for position in reversed(self.positions.open_positions()):
+            if position.symbol == symbol:
+                return position
+        return None
     
     def initialize(self) -> bool:
         """Initialize bot"""
@@ -748,7 +3700,10 @@ class AdvancedForexBot:
             logger.info("🤖 ADVANCED FOREX TRADING BOT v3.0 - ULTRA-FAST PREDICTIVE AI")
             logger.info("=" * 80)
             logger.info(f"Broker: {self.broker}")
-            logger.info(f"Symbol: {self.symbol}")
+            if self.coordinator:
+                logger.info(f"Worker: {self.worker_id} (symbols assigned by coordinator {self.coordinator.address[0]}:{self.coordinator.address[1]})")
+            else:
+                logger.info(f"Symbols: {', '.join(self.symbols)}")
             logger.info(f"Timeframe: {self.timeframe}")
             logger.info(f"Mode: {self.env_mode}")
             logger.info(f"ML Available: {'✓ Yes' if ML_AVAILABLE else '✗ No'}")
@@ -777,6 +3732,11 @@ class AdvancedForexBot:
                 logger.info(f"✓ Equity: ${account_info.equity:,.2f}")
                 logger.info(f"✓ Free Margin: ${account_info.margin_free:,.2f}")
             
+            self._warm_start()
+            self._refresh_symbol_status(self.symbols)
+            if account_info and self.config.get('monte_carlo', {}).get('calibrate_on_start', False):
+                self._calibrate_drawdown(account_info.equity)
+            
             self.is_trading = True
             logger.info("\n✓ Bot initialized successfully - Ready for ultra-fast trading!\n")
             
@@ -796,92 +3756,407 @@ class AdvancedForexBot:
                     logger.error("Session validation failed")
                     break
                 
-                df = self._fetch_ohlcv(self.symbol, self.mt5_timeframe, limit=500)
-                if df is None or len(df) < 50:
-                    logger.warning("Insufficient data")
-                    await asyncio.sleep(60)
-                    continue
+                self._reload_config()
+                self._roll_day()
                 
+                # Markets closed everywhere: no broker calls until the next open
+                # (workers keep heartbeating so the coordinator keeps their shard)
+                if self.symbols and not self.coordinator and not any(self.calendar.is_open(s) for s in self.symbols):
+                    idle = min(min(self.calendar.seconds_until_open(s) for s in self.symbols), self.calendar.idle_sleep)
+                    logger.info(f"🌙 Markets closed - idle for {idle / 60:.0f} min")
+                    await asyncio.sleep(max(idle, 60))
+                    continue
+            except Exception as e:
+                logger.error(f"Loop error: {e}")
+                await asyncio.sleep(60)
+                continue
+            
+            # Idle time is never profiled; once a cycle starts, every way out of it closes it
+            self.profiler.start_cycle()
+            self.scheduler.begin_cycle()
+            retry_in = 60.0
+            try:
                 account_info = mt5.account_info()
                 if not account_info:
-                    logger.error("Cannot get account info")
-                    await asyncio.sleep(60)
-                    continue
+                    raise ConnectionError("Cannot get account info")
                 
                 equity = account_info.equity
-                current_price = df['close'].iloc[-1]
-                
-                signal, confidence = self.indicator_analyzer.calculate_composite_signal(df)
-                
-                logger.info(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {self.symbol} | Signal: {signal.name} | Confidence: {confidence:.2f} | Price: {current_price:.5f}")
+                current_drawdown = self.risk_manager.update_drawdown(equity)
+                event_bus.publish('equity', {'equity': float(equity), 'balance': float(account_info.balance),
+                                             'drawdown': float(current_drawdown),
+                                             'open_positions': len(self.positions.open_positions())}, key='account')
                 
-                current_drawdown = (account_info.equity - account_info.balance) / account_info.balance if account_info.balance > 0 else 0
-                if not self.risk_manager.check_risk_limits(equity, current_drawdown):
+                # Exits never need approval: without the coordinator only new entries stop
+                entries_allowed = True
+                if self.coordinator:
+                    reply = self.coordinator.heartbeat(equity, account_info.balance,
+                                                       self.positions.open_positions(), self.pending_signals)
+                    if reply is None:
+                        logger.warning("Coordinator unreachable - managing held positions only")
+                        entries_allowed = False
+                        # Keep the latest closed bar per symbol for when it comes back
+                        self.pending_signals = list({s['symbol']: s for s in self.pending_signals}.values())
+                    else:
+                        self.pending_signals = []
+                        self.coordinator.flush_closes()
+                        self._apply_assignment(reply['symbols'])
+                        if not reply['trading_allowed']:
+                            logger.warning("Account risk limits exceeded (coordinator) - managing held positions only")
+                            entries_allowed = False
+                elif not self.risk_manager.check_risk_limits(equity, current_drawdown):
                     logger.warning("Risk limits exceeded")
                     break
                 
-                # Only trade on high confidence signals
-                min_confidence = 0.65 if signal in [TradeSignal.STRONG_BUY, TradeSignal.STRONG_SELL] else 0.55
+                # Positions first so exits stay timely when the cycle runs long
+                held = {p.symbol for p in self.positions.open_positions()}
+                open_symbols = [s for s in self.symbols if self.calendar.is_open(s) and (entries_allowed or s in held)]
+                for symbol in self.scheduler.plan(open_symbols, held):
+                    if not self.scheduler.admit(symbol, symbol in held):
+                        continue
+                    started = time.perf_counter()
+                    self._process_symbol(symbol, equity, use_ml=self.scheduler.stage_enabled('ml'),
+                                         allow_entries=entries_allowed)
+                    self.scheduler.record(symbol, time.perf_counter() - started)
                 
-                if signal in [TradeSignal.STRONG_BUY, TradeSignal.BUY] and confidence >= min_confidence:
-                    if self.trades_today < self.max_trades_per_day:
-                        self._execute_buy(self.symbol, current_price, equity)
+                if self.scheduler.stage_enabled('stats'):
+                    stats = self.trade_db.get_statistics()
+                    if stats and stats['total_trades'] > 0:
+                        hot_log.event('stats', "📊 Statistics: Trades={trades} | Win Rate={win_rate:.2f}% | P&L=${pnl:,.2f}",
+                                      trades=stats['total_trades'], win_rate=stats['win_rate_percent'], pnl=stats['total_pnl'])
                 
-                elif signal in [TradeSignal.STRONG_SELL, TradeSignal.SELL] and confidence >= min_confidence:
-                    self._execute_sell(self.symbol, current_price, equity)
-                
-                stats = self.trade_db.get_statistics()
-                if stats and stats['total_trades'] > 0:
-                    logger.info(f"\n📊 Statistics: Trades={stats['total_trades']} | Win Rate={stats['win_rate_percent']:.2f}% | P&L=${stats['total_pnl']:,.2f}\n")
-                
-                # Reduced sleep time for faster response (10x faster cycles)
-                await asyncio.sleep(60)
+                if self.snapshotter.due():
+                    self._snapshot_async()
+                retry_in = None
             
             except Exception as e:
                 logger.error(f"Loop error: {e}")
-                await asyncio.sleep(60)
+            finally:
+                self._end_cycle()
+                remaining = self.scheduler.end_cycle()
+            
+            # Keep the cadence: sleep only what is left of the interval
+            await asyncio.sleep(remaining if retry_in is None else retry_in)
         
         self.shutdown()
     
-    def _fetch_ohlcv(self, symbol: str, timeframe, limit: int = 500) -> Optional[pd.DataFrame]:
-        """Fetch OHLCV from MT5"""
+    def _calibrate_drawdown(self, equity: float):
+        """Run the Monte Carlo simulator over the trade history and cap max_drawdown with it"""
+        history = self.trade_db.load_trades()
+        pnl = self._account_pnl(history)
+        report = MonteCarloSimulator(self.config).run(pnl, equity)
+        if report:
+            self.risk_manager.apply_monte_carlo(report)
+    
+    def _account_pnl(self, history: TradeStore) -> np.ndarray:
+        """
+        Closed-trade P&L in account currency. TradeStore keeps price x lots, so
+        each trade is revalued with the broker's order_calc_profit; without it,
+        contract_size converts pairs quoted in (or based on) the account currency
+        and other trades are left out.
+        """
+        rows = history.rows[history.closed_mask()]
+        account = self.portfolio_risk.account_currency
+        contract_size = self.portfolio_risk.contract_size
+        pnl = np.full(len(rows), np.nan)
+        for i, row in enumerate(rows):
+            symbol = history.symbols[row['symbol']]
+            try:
+                action = mt5.ORDER_TYPE_BUY if row['side'] > 0 else mt5.ORDER_TYPE_SELL
+                profit = mt5.order_calc_profit(action, symbol, float(row['size']),
+                                               float(row['entry_price']), float(row['exit_price']))
+            except Exception:
+                profit = None
+            if profit is not None:
+                pnl[i] = profit
+            elif symbol[3:6] == account:
+                pnl[i] = row['pnl'] * contract_size
+            elif symbol[:3] == account and row['exit_price'] > 0:
+                pnl[i] = row['pnl'] * contract_size / row['exit_price']
+        skipped = int(np.isnan(pnl).sum())
+        if skipped:
+            logger.warning(f"⚠ Monte Carlo: {skipped} trade(s) without an account-currency P&L left out")
+        return pnl[~np.isnan(pnl)]
+    
+    def _reload_config(self):
+        """Apply config.yaml edits between cycles (no restart, state kept)"""
+        reload = self.config_watcher.poll()
+        if reload is None:
+            return
+        settings, changed = reload
+        restart = changed - set(BotSettings.LIVE_KEYS)
+        if restart:
+            logger.warning(f"⚠ Config change to {', '.join(sorted(restart))} needs a restart - not applied")
+            raw = dict(settings.raw)
+            for key in restart:
+                if key in self.config:
+                    raw[key] = self.config[key]
+                else:
+                    raw.pop(key, None)
+            settings = replace(settings, raw=raw)
+        
+        self.settings = settings
+        self.config = settings.raw
+        self.indicator_analyzer.apply_settings(settings, changed)
+        if 'risk' in changed:
+            self.risk_manager.apply_settings(settings.risk)
+        self.max_trades_per_day = settings.max_trades_per_day
+        if 'logging' in changed:
+            hot_log.configure(settings.raw)
+        if 'calendar' in changed:
+            tradable = self.calendar.tradable
+            self.calendar = TradingCalendar(settings.raw)
+            self.calendar.tradable = tradable
+            self.risk_manager.calendar = self.calendar
+        logger.info(f"🔄 Config reloaded: {', '.join(sorted(changed - restart)) or 'no live changes'}")
+    
+    def _roll_day(self):
+        """Reset daily counters when the trading day changes"""
+        today = self.calendar.trading_day()
+        if today != self.trades_today_date:
+            logger.info(f"📅 New trading day {today.isoformat()} - {self.trades_today} trade(s) yesterday")
+            self.trades_today = 0
+            self.trades_today_date = today
+            self._refresh_symbol_status(self.symbols)
+    
+    def _refresh_symbol_status(self, symbols: List[str]):
+        """Mark symbols the broker has disabled for trading as closed in the calendar"""
+        for symbol in symbols:
+            try:
+                info = mt5.symbol_info(symbol)
+                tradable = info is not None and info.trade_mode != mt5.SYMBOL_TRADE_MODE_DISABLED
+            except Exception as e:
+                logger.warning(f"Symbol info error for {symbol}: {e}")
+                continue
+            if not tradable and self.calendar.tradable.get(symbol, True):
+                logger.warning(f"⚠ {symbol} is not tradable at the broker - skipping it")
+            self.calendar.tradable[symbol] = tradable
+    
+    def _end_cycle(self):
+        duration = self.profiler.end_cycle(self.indicator_analyzer.failure_report)
+        hot_log.event('cycle', "⏱ Cycle: {duration_ms:.1f}ms | {symbols} symbol(s)",
+                      duration_ms=duration * 1000, symbols=len(self.symbols))
+        event_bus.publish('latency', {'cycle_ms': duration * 1000, 'symbols': len(self.symbols),
+                                      'stages_ms': {stage: t * 1000 for stage, t in self.stage_times.items()},
+                                      'utilization': self.scheduler.utilization,
+                                      'degraded': self.scheduler.degraded}, key='cycle')
+        self.stage_times = dict.fromkeys(self.stage_times, 0.0)
+    
+    def _process_symbol(self, symbol: str, equity: float, use_ml: bool = True, allow_entries: bool = True):
+        """Fetch, analyze and act on one symbol"""
+        started = time.perf_counter()
+        df = self._fetch_candles(symbol, limit=500)
+        fetched = time.perf_counter()
+        self.stage_times['fetch'] += fetched - started
+        if df is None or len(df) < 50:
+            logger.warning(f"Insufficient data for {symbol}")
+            return
+        
+        current_price = float(df['close'][-1])
+        # The last bar is still forming; covariance is built from closed bars only
+        bar_time, bar_close = int(df.times[-2]), float(df['close'][-2])
+        self.portfolio_risk.observe_bar(symbol, bar_time, bar_close)
+        
+        signal, confidence = self.indicator_analyzer.calculate_composite_signal(df, symbol, self.candles, use_ml)
+        analyzed = time.perf_counter()
+        self.stage_times['analysis'] += analyzed - fetched
+        
+        hot_log.event('signal', "{symbol} | Signal: {signal} | Confidence: {confidence:.2f} | Price: {price:.5f}",
+                      symbol=symbol, signal=signal.name, confidence=confidence, price=float(current_price))
+        event_bus.publish('signal', {'symbol': symbol, 'signal': signal.name, 'confidence': float(confidence),
+                                     'price': current_price, 'bar_time': int(df.times[-1])}, key=symbol)
+        if self.coordinator:
+            self.pending_signals.append({'symbol': symbol, 'signal': signal.name, 'confidence': float(confidence),
+                                         'price': float(current_price), 'bar_time': bar_time, 'bar_close': bar_close})
+        
+        # Only trade on high confidence signals
+        min_confidence = 0.65 if signal in [TradeSignal.STRONG_BUY, TradeSignal.STRONG_SELL] else 0.55
+        
+        if signal in [TradeSignal.STRONG_BUY, TradeSignal.BUY] and confidence >= min_confidence:
+            # The coordinator enforces the account-wide daily trade cap
+            if allow_entries and (self.coordinator or self.trades_today < self.max_trades_per_day):
+                self._execute_buy(symbol, current_price, equity, signal)
+        
+        elif signal in [TradeSignal.STRONG_SELL, TradeSignal.SELL] and confidence >= min_confidence:
+            self._execute_sell(symbol, current_price, equity)
+        self.stage_times['execution'] += time.perf_counter() - analyzed
+    
+    def _apply_assignment(self, symbols: List[str]):
+        """Adopt a new shard from the coordinator"""
+        if symbols == self.symbols:
+            return
+        added = [s for s in symbols if s not in self.symbols]
+        removed = [s for s in self.symbols if s not in symbols]
+        self.symbols = list(symbols)
+        
+        for symbol in removed:
+            self.candles.pop(symbol, None)
+            self.indicator_analyzer.ml_model.engines.pop(symbol, None)
+            position = self.position_for(symbol)
+            while position is not None:
+                self.positions.transfer(position.index)
+                position = self.position_for(symbol)
+        if added:
+            self._reconcile_positions(added)
+            self._refresh_symbol_status(added)
+        self.portfolio_risk.sync_positions(self.positions)
+        logger.info(f"🔀 Shard updated: {', '.join(self.symbols) or '(none)'} (+{len(added)} / -{len(removed)})")
+    
+    def _capture_state(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        """Copy restartable state into arrays (cheap; runs on the trading thread)"""
+        arrays = {}
+        arrays.update(self.positions.get_state('positions'))
+        arrays.update(self.risk_manager.trade_history.get_state('history'))
+        arrays.update(self.portfolio_risk.get_state())
+        for symbol, candles in self.candles.items():
+            arrays[f'candle_{symbol}'] = candles.data.copy()
+        meta = {
+            'symbols': list(self.candles),
+            'timeframe': self.timeframe,
+            'trades_today': self.trades_today,
+            'trades_today_date': self.trades_today_date.isoformat()
+        }
+        return arrays, meta
+    
+    def _warm_start(self):
+        """Restore the last snapshot (if fresh) and reconcile positions with the broker"""
+        started = time.perf_counter()
+        snapshot = self.snapshotter.load()
+        if snapshot is not None:
+            arrays, meta = snapshot
+            if meta.get('timeframe') == self.timeframe:
+                self.positions = TradeStore.from_state(arrays, 'positions')
+                self.risk_manager.trade_history = TradeStore.from_state(arrays, 'history')
+                self.portfolio_risk.set_state(arrays)
+                for symbol in meta.get('symbols', []):
+                    if self.coordinator is None and symbol not in self.symbols:
+                        continue
+                    self.candles[symbol] = BarFrame(arrays[f'candle_{symbol}'])
+                if meta.get('trades_today_date') == self.trades_today_date.isoformat():
+                    self.trades_today = meta.get('trades_today', 0)
+                logger.info(f"✓ Warm start: {len(self.positions.open_positions())} open position(s), "
+                            f"{len(self.risk_manager.trade_history)} trade(s), "
+                            f"{sum(len(c) for c in self.candles.values())} cached bars")
+            else:
+                logger.warning("Snapshot is for a different timeframe - cold start")
+        
+        if self.coordinator:
+            # Until the coordinator assigns a shard, this worker owns nothing
+            for position in self.positions.open_positions():
+                self.positions.transfer(position.index)
+        else:
+            self._reconcile_positions(self.symbols)
+        logger.info(f"✓ State ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+    
+    def _reconcile_positions(self, symbols: List[str]):
+        """Align the position store with what the broker actually holds for this bot"""
+        try:
+            broker_positions = mt5.positions_get()
+            if broker_positions is None:
+                logger.warning(f"Cannot reconcile positions: {mt5.last_error()}")
+                return
+            ours = {p.ticket: p for p in broker_positions if p.magic == self.MAGIC_NUMBER and p.symbol in symbols}
+            
+            # Closed by SL/TP (or manually) while we were down
+            for position in self.positions.open_positions():
+                if position.symbol not in symbols or position.ticket in ours:
+                    continue
+                deals = mt5.history_deals_get(position=position.ticket) or ()
+                exits = [d for d in deals if d.entry == mt5.DEAL_ENTRY_OUT]
+                if exits:
+                    exit_price, exit_time = exits[-1].price, datetime.fromtimestamp(exits[-1].time)
+                else:
+                    candles = self.candles.get(position.symbol)
+                    exit_price = float(candles['close'][-1]) if candles is not None else position.entry_price
+                    exit_time = None
+                closed = self.positions.close(position.index, exit_price, exit_time)
+                self._book_closed(closed)
+                logger.warning(f"⚠ Position #{closed.ticket} closed while offline @ {exit_price:.5f} | P&L: ${closed.pnl:,.2f}")
+            
+            # Opened by this bot but missing from the snapshot (or handed over by another worker)
+            known = {p.ticket for p in self.positions.open_positions()}
+            for ticket, p in ours.items():
+                if ticket in known:
+                    continue
+                self.positions.open(
+                    p.symbol, 'BUY' if p.type == mt5.POSITION_TYPE_BUY else 'SELL', p.price_open, p.volume,
+                    stop_loss=p.sl, take_profit=p.tp, ticket=ticket, entry_time=datetime.fromtimestamp(p.time)
+                )
+                logger.warning(f"⚠ Adopted broker position #{ticket} ({p.symbol})")
+            
+            self.portfolio_risk.sync_positions(self.positions)
+        except Exception as e:
+            logger.error(f"Position reconcile error: {e}")
+    
+    def _book_closed(self, closed: TradeView):
+        """Record a closed position locally, in the database and with the coordinator"""
+        self.risk_manager.trade_history.extend(self.positions.rows[closed.index:closed.index + 1], self.positions.symbols)
+        self.trade_db.save_trade(closed.to_row())
+        if self.coordinator:
+            self.coordinator.report_close(closed)
+        event_bus.publish('fill', {'action': 'close', 'ticket': closed.ticket, 'symbol': closed.symbol,
+                                   'side': closed.type, 'size': closed.size, 'price': closed.exit_price,
+                                   'pnl': closed.pnl, 'pnl_percent': closed.pnl_percent})
+    
+    def _snapshot_async(self):
+        arrays, meta = self._capture_state()
+        self.snapshotter.save_async(arrays, meta, self.thread_pool)
+    
+    def _fetch_candles(self, symbol: str, limit: int = 500) -> Optional[BarFrame]:
+        """Keep a rolling bar buffer per symbol, fetching only the latest bars once warm"""
+        refresh = self.config.get('snapshot', {}).get('refresh_bars', 10)
+        candles = self.candles.get(symbol)
+        if candles is None or len(candles) < limit:
+            bars = self._fetch_ohlcv(symbol, self.mt5_timeframe, limit=limit)
+        else:
+            recent = self._fetch_ohlcv(symbol, self.mt5_timeframe, limit=refresh)
+            if recent is None or len(recent) == 0:
+                return None
+            if recent.times[0] > candles.times[-1]:
+                # Gap larger than the refresh window - rebuild the buffer
+                bars = self._fetch_ohlcv(symbol, self.mt5_timeframe, limit=limit)
+            else:
+                bars = candles.merge(recent, limit)
+        
+        if bars is not None:
+            self.candles[symbol] = bars
+        return bars
+
+    def _fetch_ohlcv(self, symbol: str, timeframe, limit: int = 500) -> Optional[BarFrame]:
+        """Fetch OHLCV from MT5 (wrapped as-is, no DataFrame conversion)"""
         try:
             rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, limit)
             if rates is None:
                 logger.error(f"Failed to fetch rates: {mt5.last_error()}")
                 return None
             
-            df = pd.DataFrame(rates)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            df = df.rename(columns={
-                'time': 'timestamp',
-                'open': 'open',
-                'high': 'high',
-                'low': 'low',
-                'close': 'close',
-                'tick_volume': 'volume'
-            })
-            
-            return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+            return BarFrame(rates)
         
         except Exception as e:
             logger.error(f"OHLCV fetch error: {e}")
             return None
     
-    def _execute_buy(self, symbol: str, current_price: float, equity: float):
+    def _execute_buy(self, symbol: str, current_price: float, equity: float,
+                     signal: TradeSignal = TradeSignal.BUY):
         """Execute buy order"""
         try:
             logger.info(f"🟢 BUY signal for {symbol}")
             
             stop_loss = current_price * 0.98
             position_size, adjusted_sl, adjusted_tp = self.risk_manager.calculate_position_size(
-                equity, current_price, stop_loss
+                equity, current_price, stop_loss,
+                quote_to_account=self.portfolio_risk.quote_to_account(symbol, current_price)
             )
             
             if position_size <= 0:
                 logger.warning("Invalid position size")
                 return
             
+            if self.coordinator:
+                if not self.coordinator.approve_trade(symbol, 'BUY', position_size, equity):
+                    return
+            elif not self.portfolio_risk.check_trade(symbol, 'BUY', position_size, equity):
+                return
+            
             request = {
                 "action": mt5.TRADE_ACTION_DEAL,
                 "symbol": symbol,
@@ -891,7 +4166,7 @@ class AdvancedForexBot:
                 "sl": adjusted_sl,
                 "tp": adjusted_tp,
                 "deviation": 20,
-                "magic": 234001,
+                "magic": self.MAGIC_NUMBER,
                 "comment": "Advanced Bot BUY",
                 "type_time": mt5.ORDER_TIME_GTC,
                 "type_filling": mt5.ORDER_FILLING_IOC,
@@ -901,16 +4176,16 @@ class AdvancedForexBot:
             
             if result.retcode == mt5.TRADE_RETCODE_DONE:
                 logger.info(f"✓ BUY executed: #{result.order} | Size: {position_size:.2f} | Price: {current_price:.5f}")
-                self.current_position = {
-                    'ticket': result.order,
-                    'type': 'BUY',
-                    'entry_price': current_price,
-                    'stop_loss': adjusted_sl,
-                    'take_profit': adjusted_tp,
-                    'size': position_size,
-                    'entry_time': datetime.now()
-                }
+                self.positions.open(
+                    symbol, 'BUY', current_price, position_size,
+                    stop_loss=adjusted_sl, take_profit=adjusted_tp,
+                    ticket=result.order, signal=signal
+                )
+                self.portfolio_risk.sync_positions(self.positions)
                 self.trades_today += 1
+                event_bus.publish('fill', {'action': 'open', 'ticket': result.order, 'symbol': symbol, 'side': 'BUY',
+                                           'size': position_size, 'price': current_price,
+                                           'stop_loss': adjusted_sl, 'take_profit': adjusted_tp})
             else:
                 logger.error(f"BUY failed: {result.comment}")
         
@@ -922,17 +4197,17 @@ class AdvancedForexBot:
         try:
             logger.info(f"🔴 SELL signal for {symbol}")
             
-            if self.current_position:
-                position = self.current_position
+            position = self.position_for(symbol)
+            if position:
                 
                 request = {
                     "action": mt5.TRADE_ACTION_DEAL,
                     "symbol": symbol,
-                    "volume": position['size'],
-                    "type": mt5.ORDER_TYPE_SELL if position['type'] == 'BUY' else mt5.ORDER_TYPE_BUY,
+                    "volume": position.size,
+                    "type": mt5.ORDER_TYPE_SELL if position.type == 'BUY' else mt5.ORDER_TYPE_BUY,
                     "price": current_price,
                     "deviation": 20,
-                    "magic": 234001,
+                    "magic": self.MAGIC_NUMBER,
                     "comment": "Advanced Bot SELL",
                     "type_time": mt5.ORDER_TIME_GTC,
                     "type_filling": mt5.ORDER_FILLING_IOC,
@@ -941,29 +4216,12 @@ class AdvancedForexBot:
                 result = mt5.order_send(request)
                 
                 if result.retcode == mt5.TRADE_RETCODE_DONE:
-                    pnl = (current_price - position['entry_price']) * position['size'] if position['type'] == 'BUY' else (position['entry_price'] - current_price) * position['size']
-                    pnl_percent = (pnl / (position['entry_price'] * position['size'])) * 100 if position['entry_price'] > 0 else 0
-                    
-                    duration = (datetime.now() - position['entry_time']).total_seconds() / 60
-                    
-                    logger.info(f"✓ SELL executed: #{result.order} | P&L: ${pnl:,.2f} ({pnl_percent:.2f}%)")
+                    closed = self.positions.close(position.index, current_price)
                     
-                    self.trade_db.save_trade({
-                        'timestamp': datetime.now().isoformat(),
-                        'symbol': symbol,
-                        'type': position['type'],
-                        'entry_price': position['entry_price'],
-                        'exit_price': current_price,
-                        'position_size': position['size'],
-                        'stop_loss': position['stop_loss'],
-                        'take_profit': position['take_profit'],
-                        'pnl': pnl,
-                        'pnl_percent': pnl_percent,
-                        'status': 'CLOSED',
-                        'duration_minutes': int(duration)
-                    })
+                    logger.info(f"✓ SELL executed: #{result.order} | P&L: ${closed.pnl:,.2f} ({closed.pnl_percent:.2f}%)")
                     
-                    self.current_position = None
+                    self._book_closed(closed)
+                    self.portfolio_risk.sync_positions(self.positions)
                 else:
                     logger.error(f"SELL failed: {result.comment}")
         
@@ -977,6 +4235,10 @@ class AdvancedForexBot:
             logger.info("SHUTTING DOWN BOT")
             logger.info("=" * 80)
             
+            if self.snapshotter.enabled:
+                self.snapshotter.save(*self._capture_state())
+                logger.info("✓ State snapshot saved")
+            
             stats = self.trade_db.get_statistics()
             if stats and stats['total_trades'] > 0:
                 logger.info(f"\n📊 FINAL STATISTICS:")
@@ -990,6 +4252,25 @@ class AdvancedForexBot:
                 mt5.shutdown()
                 logger.info("\n✓ MT5 disconnected")
             
+            timing = self.profiler.timing_summary()
+            if timing:
+                logger.info(f"✓ Cycle timing: {timing['cycles']} cycles | mean {timing['mean_ms']:.1f}ms | p95 {timing['p95_ms']:.1f}ms | max {timing['max_ms']:.1f}ms")
+            load = self.scheduler.report()
+            logger.info(f"✓ Scheduler: {load['overruns']} overrun(s) | {load['dropped_symbols']} symbol run(s) shed | "
+                        f"skipped stages {load['skipped_stages']}")
+            failures = self.indicator_analyzer.failure_report()
+            if failures['failures'] or failures['fallbacks']:
+                logger.warning(f"⚠ Analyzer failures: {failures['failures']} | fallbacks: {failures['fallbacks']} | last errors: {failures['last_errors']}")
+            
+            stream = event_bus.report()
+            if event_bus.enabled:
+                logger.info(f"✓ Live stream: {stream['published']} published | {stream['coalesced']} coalesced | "
+                            f"{stream['client_drops']} client batch(es) dropped")
+            
+            log_stats = hot_log.overhead_report()
+            logger.info(f"✓ Hot-path logging: {log_stats['emitted']} emitted | {log_stats['sampled_out'] + log_stats['rate_limited']} suppressed | {log_stats['dropped']} dropped | {log_stats['avg_overhead_us']:.1f}µs/event")
+            hot_log.close()
+            
             self.is_trading = False
             logger.info("\n✓ Bot shutdown complete\n")
         
@@ -997,14 +4278,16 @@ class AdvancedForexBot:
             logger.error(f"Shutdown error: {e}")
 
 
-async def main():
+async def main(worker_id: Optional[str] = None):
     """Main entry point"""
-    bot = AdvancedForexBot()
+    bot = AdvancedForexBot(worker_id=worker_id)
     
     if not bot.initialize():
         logger.error("Failed to initialize bot")
         return
     
+    start_stream_server(bot.config)
+    
     try:
         await bot.run()
     except KeyboardInterrupt:
@@ -1013,9 +4296,28 @@ async def main():
 
 
 if __name__ == '__main__':
-    logger.add("logs/bot_{time:YYYY-MM-DD}.log", rotation="00:00", retention="30 days", level="INFO")
+    import argparse
+    import socket
+    
+    parser = argparse.ArgumentParser(description='Advanced Forex Trading Bot')
+    parser.add_argument('--role', choices=['standalone', 'coordinator', 'worker'],
+                        default=os.getenv('BOT_ROLE', 'standalone'))
+    parser.add_argument('--worker-id', default=os.getenv('WORKER_ID'))
+    args = parser.parse_args()
+    
+    # app/healthcheck.py imports `bot`; alias this module so the stream server shares its event bus
+    sys.modules.setdefault('bot', sys.modules[__name__])
+    
+    with open('config.yaml', 'r') as f:
+        config = yaml.safe_load(f)
+    configure_logging(config)
     
     try:
-        asyncio.run(main())
+        if args.role == 'coordinator':
+            ShardCoordinator(config).serve_forever()
+        elif args.role == 'worker':
+            asyncio.run(main(worker_id=args.worker_id or f"{socket.gethostname()}-{os.getpid()}"))
+        else:
+            asyncio.run(main())
     except Exception as e:
         logger.error(f"Fatal error: {e}")
@@ -0,0 +1,9 @@
+/*
+  # Dashboard query indexes
+
+  The dashboard lists a user's most recent trades ordered by `opened_at`;
+  without a composite index this sorts every trade the user has ever made.
+*/
+
+CREATE INDEX IF NOT EXISTS idx_trades_user_opened_at ON trades(user_id, opened_at DESC);
+CREATE INDEX IF NOT EXISTS idx_trades_user_closed_at ON trades(user_id, closed_at DESC) WHERE status = 'closed';
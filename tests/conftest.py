@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bot import BarFrame  # noqa: E402
+
+
+@pytest.fixture
+def config() -> dict:
+    """The shipped config.yaml, as the bot loads it"""
+    with open(os.path.join(ROOT, 'config.yaml'), 'r') as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture
+def make_bars():
+    """Factory for random-walk hourly BarFrames with a plausible high/low envelope"""
+    def make(n: int = 400, seed: int = 0, start: str = '2024-01-01T00:00', price: float = 1.10,
+             drift: float = 0.0) -> BarFrame:
+        rng = np.random.default_rng(seed)
+        times = np.datetime64(start) + np.arange(n) * np.timedelta64(1, 'h')
+        close = price * np.exp(np.cumsum(rng.normal(drift, 0.002, n)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.001, n)) * price
+        return BarFrame.from_columns(times, open_, np.maximum(open_, close) + spread,
+                                     np.minimum(open_, close) - spread, close, rng.integers(50, 500, n))
+    return make
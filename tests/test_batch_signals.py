@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from bot import AdvancedIndicatorAnalyzer, BatchSignalGenerator, TradeSignal
+
+ANALYZERS = {'ema': 'analyze_ema', 'rsi': 'analyze_rsi', 'macd': 'analyze_macd',
+             'bollinger': 'analyze_bollinger_bands', 'atr': 'analyze_atr', 'stochastic': 'analyze_stochastic',
+             'momentum': 'analyze_momentum', 'adx': 'analyze_adx'}
+
+
+@pytest.fixture
+def research_config(config):
+    # A short window and odd chunk size put chunk seams and window starts inside the checked range
+    return dict(config, research={'window': 120, 'chunk_bars': 97, 'max_workers': 1})
+
+
+@pytest.fixture
+def histories(make_bars):
+    # Steady rises with sharp pullbacks, so BUY votes line up and the signal thresholds are crossed
+    pullbacks = np.resize(np.concatenate((np.full(60, 0.003), np.full(10, -0.008))), 400)
+    return {'EURUSD': make_bars(520, seed=1), 'USDJPY': make_bars(300, seed=2, price=150.0, drift=pullbacks[:300]),
+            'GBPUSD': make_bars(400, seed=3, price=1.27, drift=-pullbacks)}
+
+
+def test_batch_matches_live_analyzer_bit_for_bit(research_config, histories):
+    result = BatchSignalGenerator(research_config).run(histories)
+    analyzer = AdvancedIndicatorAnalyzer(research_config)
+    assert (result['signal'] == TradeSignal.BUY.value).any()
+
+    for row, (symbol, bars) in enumerate(histories.items()):
+        for t in range(49, len(bars)):
+            # The live loop scores the trailing candle buffer ending at bar t
+            buffer = bars[max(0, t - 119):t + 1]
+            for name, method in ANALYZERS.items():
+                score, vote = getattr(analyzer, method)(buffer)
+                assert result['scores'][name][row, t] == score, f"{symbol} {name} score at bar {t}"
+                assert result['votes'][name][row, t] == vote, f"{symbol} {name} vote at bar {t}"
+            signal, confidence = analyzer.calculate_composite_signal(buffer, symbol, use_ml=False)
+            assert result['signal'][row, t] == signal.value, f"{symbol} signal at bar {t}"
+            assert result['confidence'][row, t] == confidence, f"{symbol} confidence at bar {t}"
+
+
+def test_warmup_and_padding_are_empty(research_config, histories):
+    result = BatchSignalGenerator(research_config).run(histories, indicators=False)
+    short = list(histories).index('USDJPY')
+
+    assert np.isnan(result['composite'][:, :49]).all()
+    assert (result['signal'][:, :49] == 0).all()
+    assert np.isnan(result['composite'][short, 300:]).all()
+    assert (result['signal'][short, 300:] == 0).all()
+    assert np.isfinite(result['composite'][short, 49:300]).all()
+
+
+def test_chunking_and_workers_do_not_change_results(research_config, histories):
+    reference = BatchSignalGenerator(dict(research_config, research={'window': 120, 'chunk_bars': 10 ** 6,
+                                                                     'max_workers': 1})).run(histories)
+    chunked = BatchSignalGenerator(dict(research_config, research={'window': 120, 'chunk_bars': 64,
+                                                                   'max_workers': 2})).run(histories)
+
+    for key in ('times', 'composite', 'confidence', 'signal'):
+        np.testing.assert_array_equal(chunked[key], reference[key], err_msg=key)
+    for name in ANALYZERS:
+        np.testing.assert_array_equal(chunked['scores'][name], reference['scores'][name], err_msg=name)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from bot import MARKET_OPEN, ROLLOVER, SESSION_LONDON, TradingCalendar
+
+CALENDAR = {
+    'server_utc_offset': 2,
+    'holidays': ['2024-12-25', '2025-01-01'],
+    'symbols': {'XAUUSD': {'hours': ['01:00-23:55']}}
+}
+
+
+def brute_force_wait(calendar: TradingCalendar, symbol, now: float) -> float:
+    """Seconds to the next open minute, scanning minute by minute"""
+    if calendar.is_open(symbol, now):
+        return 0.0
+    minute = int(now // 60) + 1
+    while not calendar.is_open(symbol, minute * 60):
+        minute += 1
+    return minute * 60 - now
+
+
+@pytest.mark.parametrize('symbol', [None, 'XAUUSD'])
+def test_bar_flags_match_scalar_lookup(symbol):
+    calendar = TradingCalendar({'calendar': CALENDAR})
+    rng = np.random.default_rng(0)
+    # Server-time bar stamps across two weekends and both holidays
+    start = np.datetime64('2024-12-20T00:00', 's').astype(np.int64)
+    server_times = np.sort(start + rng.integers(0, 16 * 86400, 3000) // 60 * 60)
+
+    flags = calendar.bar_flags(server_times.astype('datetime64[s]'), symbol)
+    utc = server_times - CALENDAR['server_utc_offset'] * 3600
+    expected = [calendar.flags(symbol, now=float(t)) for t in utc]
+
+    np.testing.assert_array_equal(flags, expected)
+    assert (flags & MARKET_OPEN).any() and not (flags & MARKET_OPEN).all()
+
+
+def test_known_times():
+    calendar = TradingCalendar({'calendar': CALENDAR})
+    at = lambda stamp: float(np.datetime64(stamp, 's').astype(np.int64))
+
+    assert calendar.is_open(now=at('2024-12-18T10:00'))                 # Wednesday
+    assert not calendar.is_open(now=at('2024-12-21T10:00'))             # Saturday
+    assert not calendar.is_open(now=at('2024-12-25T10:00'))             # holiday
+    assert calendar.flags(now=at('2024-12-18T21:00')) & ROLLOVER
+    assert calendar.flags(now=at('2024-12-18T10:00')) & SESSION_LONDON
+    assert not calendar.is_open('XAUUSD', now=at('2024-12-18T00:30'))   # outside symbol hours
+
+
+@pytest.mark.parametrize('symbol', [None, 'XAUUSD'])
+def test_seconds_until_open_matches_minute_scan(symbol):
+    calendar = TradingCalendar({'calendar': CALENDAR})
+    rng = np.random.default_rng(1)
+    start = float(np.datetime64('2024-12-19T00:00', 's').astype(np.int64))
+    for now in start + rng.uniform(0, 16 * 86400, 40):
+        assert calendar.seconds_until_open(symbol, now) == pytest.approx(brute_force_wait(calendar, symbol, now))
@@ -0,0 +1,37 @@
+import numpy as np
+
+from bot import FeatureEngine, WalkForwardValidator
+
+
+def test_feature_cache_key_covers_timestamps_and_calendar(tmp_path, make_bars):
+    config = {'features': {'sessions': True}}
+    bars = make_bars()
+    shifted = make_bars(start='2024-01-01T05:00')
+    validator = WalkForwardValidator(config, cache_dir=str(tmp_path))
+
+    assert validator.data_hash(bars) == validator.data_hash(bars.to_pandas())
+    assert validator.data_hash(bars) != validator.data_hash(shifted)
+    np.testing.assert_array_equal(validator.load_features(shifted), validator.features.matrix(shifted))
+
+    moved = WalkForwardValidator(dict(config, calendar={'server_utc_offset': 3}), cache_dir=str(tmp_path))
+    assert moved.features.signature != validator.features.signature
+    validator.load_features(bars)
+    np.testing.assert_array_equal(moved.load_features(bars), moved.features.matrix(bars))
+
+
+def test_signature_ignores_calendar_without_session_features():
+    assert FeatureEngine({}).signature == FeatureEngine({'calendar': {'server_utc_offset': 3}}).signature
+
+
+def test_incremental_rows_match_full_matrix(make_bars):
+    config = {'features': {'sessions': True, 'cross_symbols': ['GBPUSD']}}
+    bars = make_bars(600, seed=3)
+    peers = {'GBPUSD': make_bars(600, seed=4, start='2023-12-31T22:00', price=1.27)}
+    full = FeatureEngine(config).matrix(bars, peers)
+
+    engine = FeatureEngine(config)
+    # Live-sized buffers that advance by one bar, by several (missed cycles) or restart after a gap
+    ends = list(range(60, 200)) + list(range(203, 420, 7)) + list(range(460, 600))
+    for end in ends:
+        row = engine.latest(bars[max(0, end - 199):end + 1], peers)
+        np.testing.assert_allclose(row[0], full[end], rtol=1e-7, atol=1e-9, err_msg=f"bar {end}")
@@ -0,0 +1,78 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from bot import MonteCarloSimulator, _monte_carlo_chunk
+
+INITIAL = 10_000.0
+
+
+@pytest.fixture
+def pnl():
+    return np.random.default_rng(7).normal(15.0, 120.0, 80)
+
+
+def reference_paths(method: str, pnl: np.ndarray, rows: int, seed) -> np.ndarray:
+    """The P&L paths a chunk draws, rebuilt with the same generator calls"""
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        return pnl[rng.integers(0, len(pnl), size=(rows, len(pnl)))]
+    return rng.permuted(np.broadcast_to(pnl, (rows, len(pnl))), axis=1)
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'reshuffle'])
+def test_chunk_matches_per_path_reference(pnl, method):
+    seed = np.random.SeedSequence(3).spawn(1)[0]
+    task = {'pnl': pnl, 'rows': 200, 'seed': seed, 'method': method, 'slippage_mean': 0.0, 'slippage_std': 0.0,
+            'initial_equity': INITIAL, 'ruin_fraction': 0.02}
+    result = _monte_carlo_chunk(task)
+    paths = reference_paths(method, pnl, 200, seed)
+
+    expected_drawdown = [MonteCarloSimulator.path_drawdown(path, INITIAL) for path in paths]
+    np.testing.assert_allclose(result['max_drawdown'], expected_drawdown, rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(result['final_pnl'], paths.sum(axis=1), rtol=1e-9)
+    equity = INITIAL + np.cumsum(paths, axis=1)
+    assert result['ruined'] == int((equity.min(axis=1) <= INITIAL * 0.98).sum())
+
+
+def test_slippage_only_costs(pnl):
+    task = {'pnl': pnl, 'rows': 100, 'seed': np.random.SeedSequence(1), 'method': 'slippage',
+            'slippage_mean': 2.0, 'slippage_std': 5.0, 'initial_equity': INITIAL, 'ruin_fraction': 0.5}
+    result = _monte_carlo_chunk(task)
+
+    # Costs are never gains: every path ends lower and draws down at least as far as the realised one
+    assert (result['final_pnl'] < pnl.sum()).all()
+    assert (result['max_drawdown'] >= MonteCarloSimulator.path_drawdown(pnl, INITIAL) - 1e-12).all()
+
+    exact = _monte_carlo_chunk(dict(task, slippage_mean=0.0, slippage_std=0.0))
+    np.testing.assert_allclose(exact['final_pnl'], pnl.sum())
+    np.testing.assert_allclose(exact['max_drawdown'], MonteCarloSimulator.path_drawdown(pnl, INITIAL))
+
+
+def test_report_does_not_depend_on_workers(pnl):
+    config = {'monte_carlo': {'simulations': 5_000, 'max_chunk_mb': 1, 'seed': 11, 'min_trades': 30}}
+    serial = MonteCarloSimulator({'monte_carlo': dict(config['monte_carlo'], max_workers=1)}).run(pnl, INITIAL)
+    parallel = MonteCarloSimulator({'monte_carlo': dict(config['monte_carlo'], max_workers=2)}).run(pnl, INITIAL)
+
+    serial.pop('seconds'), parallel.pop('seconds')
+    assert serial == parallel
+    assert serial['simulations'] == 5_000
+    assert 0.0 <= serial['recommended_max_drawdown'] <= 1.0
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'reshuffle', 'slippage'])
+def test_peak_memory_stays_within_the_chunk_budget(method):
+    pnl = np.random.default_rng(5).normal(10.0, 100.0, 400)
+    simulator = MonteCarloSimulator({'monte_carlo': {'simulations': 6_000, 'max_chunk_mb': 4, 'max_workers': 1,
+                                                     'slippage_std': 3.0}})
+
+    tracemalloc.start()
+    try:
+        report = simulator.run(pnl, INITIAL, method=method)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert report['simulations'] == 6_000
+    assert peak <= 1.1 * simulator.max_chunk_mb * 2 ** 20
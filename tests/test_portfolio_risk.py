@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from bot import AdvancedRiskManager, PortfolioRiskEngine
+
+
+def feed_bars(engine: PortfolioRiskEngine, prices: dict, bars: int = 120, seed: int = 0):
+    """Random-walk closed bars around `prices`, one aligned row per bar time"""
+    rng = np.random.default_rng(seed)
+    walk = np.exp(np.cumsum(rng.normal(0, 0.002, (bars, len(prices))), axis=0))
+    for t, row in enumerate(walk):
+        for (symbol, price), factor in zip(prices.items(), row):
+            engine.observe_bar(symbol, 1_700_000_000 + 3600 * t, price * factor)
+    return walk
+
+
+@pytest.mark.parametrize('equity', [1_000.0, 10_000.0, 100_000.0])
+def test_default_sized_buy_passes_portfolio_gate(config, equity):
+    risk = AdvancedRiskManager(config)
+    engine = PortfolioRiskEngine(config)
+    feed_bars(engine, {'EURUSD': 1.10})
+    price = float(engine.prices[0])
+
+    size, _, _ = risk.calculate_position_size(equity, price, price * 0.98,
+                                              quote_to_account=engine.quote_to_account('EURUSD', price))
+
+    assert risk.min_lot <= size < risk.max_lot
+    assert engine.check_trade('EURUSD', 'BUY', size, equity)
+
+
+def test_position_size_risks_the_configured_share_of_equity(config):
+    config = dict(config, symbols=['EURUSD', 'USDJPY', 'EURGBP', 'GBPUSD'])
+    risk = AdvancedRiskManager(config)
+    engine = PortfolioRiskEngine(config)
+    feed_bars(engine, {'EURUSD': 1.10, 'USDJPY': 150.0, 'EURGBP': 0.85, 'GBPUSD': 1.29})
+    equity = 100_000.0
+
+    for symbol in engine.symbols:
+        price = float(engine.prices[engine.symbol_index[symbol]])
+        stop = price * 0.98
+        rate = engine.quote_to_account(symbol, price)
+        size, _, _ = risk.calculate_position_size(equity, price, stop, quote_to_account=rate)
+        loss_at_stop = size * risk.contract_size * (price - stop) * rate
+        assert loss_at_stop == pytest.approx(equity * risk.max_position_risk, rel=0.05)
+        assert engine.check_trade(symbol, 'BUY', size, equity)
+
+
+def test_unknown_conversion_refuses_to_size(config):
+    risk = AdvancedRiskManager(config)
+    engine = PortfolioRiskEngine(dict(config, symbols=['EURGBP']))
+    rate = engine.quote_to_account('EURGBP', 0.85)
+
+    assert np.isnan(rate)
+    assert risk.calculate_position_size(10_000.0, 0.85, 0.83, quote_to_account=rate) == (0, 0, 0)
+
+
+def aligned_returns(walk: np.ndarray) -> np.ndarray:
+    prices = np.asarray(walk)
+    return np.log(prices[1:] / prices[:-1])
+
+
+def test_rolling_covariance_matches_np_cov(config):
+    config = dict(config, symbols=['EURUSD', 'GBPUSD', 'USDJPY'], portfolio_risk={'window': 50})
+    engine = PortfolioRiskEngine(config)
+    walk = feed_bars(engine, {'EURUSD': 1.10, 'GBPUSD': 1.27, 'USDJPY': 150.0}, bars=130, seed=2)
+
+    # Every symbol reports each bar time, so every bar is committed; the window keeps the last 50 returns
+    returns = aligned_returns(walk)[-50:]
+    np.testing.assert_allclose(engine.covariance, np.cov(returns, rowvar=False), rtol=1e-8, atol=1e-14)
+
+
+def test_shards_reporting_out_of_order_give_aligned_covariance(config):
+    config = dict(config, symbols=['EURUSD', 'GBPUSD'], portfolio_risk={'window': 40, 'bar_lag': 3})
+    rng = np.random.default_rng(4)
+    common = rng.normal(0, 0.002, 80)
+    closes = {'EURUSD': 1.10 * np.exp(np.cumsum(common)),
+              'GBPUSD': 1.27 * np.exp(np.cumsum(common + rng.normal(0, 0.0005, 80)))}
+
+    engine = PortfolioRiskEngine(config)
+    for t in range(80):
+        # GBPUSD's shard runs two bars behind EURUSD's
+        engine.observe_bar('EURUSD', 1_700_000_000 + 3600 * t, closes['EURUSD'][t])
+        if t >= 2:
+            engine.observe_bar('GBPUSD', 1_700_000_000 + 3600 * (t - 2), closes['GBPUSD'][t - 2])
+
+    committed = int((engine.last_bar_time - 1_700_000_000) // 3600) + 1
+    walk = np.column_stack([closes['EURUSD'][:committed], closes['GBPUSD'][:committed]])
+    np.testing.assert_allclose(engine.covariance, np.cov(aligned_returns(walk)[-40:], rowvar=False), rtol=1e-8)
+    assert engine.correlation()[0, 1] > 0.9
+
+
+def test_state_round_trip_and_var(config):
+    config = dict(config, symbols=['EURUSD', 'GBPUSD', 'USDJPY'], portfolio_risk={'window': 30})
+    engine = PortfolioRiskEngine(config)
+    feed_bars(engine, {'EURUSD': 1.10, 'GBPUSD': 1.27, 'USDJPY': 150.0}, bars=60, seed=6)
+    engine.set_positions([('EURUSD', 'BUY', 0.5), ('USDJPY', 'SELL', 0.3)])
+
+    restored = PortfolioRiskEngine(config)
+    assert restored.set_state(engine.get_state())
+    np.testing.assert_allclose(restored.covariance, engine.covariance, rtol=1e-10, atol=1e-16)
+    assert restored.last_bar_time == engine.last_bar_time
+
+    w = engine.notional(engine.net_lots)
+    expected = engine.z_score * np.sqrt(w @ engine.covariance @ w * engine.horizon_bars)
+    assert float(engine.value_at_risk()) == pytest.approx(expected)
+    # The batch check agrees with one-at-a-time checks
+    candidates = [('EURUSD', 'BUY', 0.2), ('GBPUSD', 'SELL', 50.0), ('USDJPY', 'BUY', 0.1)]
+    batch = engine.check_trades(candidates, 10_000.0)
+    assert batch.tolist() == [engine.check_trade(*c, 10_000.0) for c in candidates]
+    assert not batch[1]
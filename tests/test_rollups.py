@@ -0,0 +1,113 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from bot import TradeDatabase, TradeStore
+
+
+def trade(timestamp: datetime, symbol: str, pnl: float) -> dict:
+    return {'timestamp': timestamp.isoformat(), 'symbol': symbol, 'type': 'BUY', 'entry_price': 1.0,
+            'exit_price': 1.0 + pnl / 1000, 'position_size': 0.1, 'stop_loss': 0.98, 'take_profit': 1.06,
+            'pnl': pnl, 'pnl_percent': pnl / 10, 'status': 'CLOSED', 'duration_minutes': 30}
+
+
+def expected_rollups(db_path: str) -> dict:
+    """Totals, daily rollups and equity curve recomputed from the raw trades table"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT id, timestamp, symbol, pnl FROM trades ORDER BY id').fetchall()
+    conn.close()
+
+    totals, daily, curve = {}, {}, []
+    for trade_id, timestamp, symbol, pnl in rows:
+        for scope in ('ALL', symbol):
+            t = totals.setdefault(scope, {'trades': 0, 'wins': 0, 'pnl': 0.0, 'peak': 0.0, 'max_drawdown': 0.0})
+            t['trades'] += 1
+            t['wins'] += pnl > 0
+            t['pnl'] += pnl
+            t['peak'] = max(t['peak'], t['pnl'])
+            drawdown = t['peak'] - t['pnl']
+            t['max_drawdown'] = max(t['max_drawdown'], drawdown)
+            t['last_trade_id'] = trade_id
+            d = daily.setdefault((scope, timestamp[:10]), {'trades': 0, 'wins': 0, 'pnl': 0.0, 'max_drawdown': 0.0})
+            d['trades'] += 1
+            d['wins'] += pnl > 0
+            d['pnl'] += pnl
+            d['max_drawdown'] = max(d['max_drawdown'], drawdown)
+            if scope == 'ALL':
+                curve.append({'trade_id': trade_id, 'timestamp': timestamp, 'equity': t['pnl'], 'drawdown': drawdown})
+    return {'totals': totals, 'daily': daily, 'curve': curve}
+
+
+@pytest.fixture
+def trade_db(tmp_path):
+    db = TradeDatabase(str(tmp_path / 'trades.db'))
+    rng = np.random.default_rng(9)
+    start = datetime(2024, 3, 1, 8)
+    trades = [trade(start + timedelta(hours=int(h)), str(rng.choice(['EURUSD', 'GBPUSD', 'USDJPY'])),
+                    float(np.round(rng.normal(5, 40), 2)))
+              for h in np.sort(rng.integers(0, 24 * 40, 300))]
+    for row in trades[:100]:
+        db.save_trade(row)
+    db.save_trades(TradeStore.from_rows(trades[100:]))
+    return db
+
+
+def assert_matches_raw(db: TradeDatabase):
+    expected = expected_rollups(db.db_path)
+
+    for scope, t in expected['totals'].items():
+        stats = db.get_statistics(scope)
+        assert stats['total_trades'] == t['trades']
+        assert stats['winning_trades'] == t['wins']
+        assert stats['total_pnl'] == pytest.approx(t['pnl'])
+        assert stats['max_drawdown'] == pytest.approx(t['max_drawdown'])
+        assert stats['last_trade_id'] == t['last_trade_id']
+
+    symbols = {row['symbol']: row for row in db.get_symbol_statistics()}
+    assert set(symbols) == set(expected['totals']) - {'ALL'}
+    for symbol, row in symbols.items():
+        assert row['trades'] == expected['totals'][symbol]['trades']
+        assert row['pnl'] == pytest.approx(expected['totals'][symbol]['pnl'])
+
+    for scope in expected['totals']:
+        days, before = [], None
+        while True:
+            page = db.get_daily_rollups(scope, before, limit=7)
+            days += page
+            if len(page) < 7:
+                break
+            before = page[-1]['day']
+        want = sorted(((day, d) for (s, day), d in expected['daily'].items() if s == scope), reverse=True)
+        assert [d['day'] for d in days] == [day for day, _ in want]
+        for got, (_, d) in zip(days, want):
+            assert (got['trades'], got['wins']) == (d['trades'], d['wins'])
+            assert got['pnl'] == pytest.approx(d['pnl'])
+            assert got['max_drawdown'] == pytest.approx(d['max_drawdown'])
+
+    points, after = [], 0
+    while True:
+        page = db.get_equity_curve(after, limit=64)
+        points += page
+        if len(page) < 64:
+            break
+        after = page[-1]['trade_id']
+    assert [p['trade_id'] for p in points] == [p['trade_id'] for p in expected['curve']]
+    np.testing.assert_allclose([p['equity'] for p in points], [p['equity'] for p in expected['curve']])
+    np.testing.assert_allclose([p['drawdown'] for p in points], [p['drawdown'] for p in expected['curve']],
+                               atol=1e-9)
+
+
+def test_incremental_rollups_match_raw_queries(trade_db):
+    assert_matches_raw(trade_db)
+
+
+def test_rebuilt_rollups_match_raw_queries(trade_db):
+    with sqlite3.connect(trade_db.db_path) as conn:
+        conn.execute('DELETE FROM rollup_totals')
+        conn.execute('DELETE FROM rollup_daily')
+        conn.execute('DELETE FROM equity_curve')
+
+    # A database whose rollups are out of step with the trades table is backfilled on open
+    assert_matches_raw(TradeDatabase(trade_db.db_path))
@@ -1,13 +1,129 @@
 import { useState, useEffect } from 'react'
 import { supabase } from '../lib/supabase'
 import { useNavigate } from 'react-router-dom'
-import { TrendingUp, TrendingDown, Activity, DollarSign, Target, Award } from 'lucide-react'
+import { TrendingUp, TrendingDown, Activity, DollarSign, Target, Award, Radio } from 'lucide-react'
+
+// e.g. wss://bot.example.com/stream/ws (stream.enabled in the bot's config.yaml); each connection
+// authenticates with the signed-in user's short-lived Supabase access token, never a build-time secret
+const STREAM_URL = import.meta.env.VITE_BOT_STREAM_URL
+// e.g. https://bot.example.com; when set, the stat cards read the bot's trade rollups (/analytics/*)
+const BOT_API_URL = import.meta.env.VITE_BOT_API_URL
+
+async function fetchAnalytics(path) {
+  const { data: { session } } = await supabase.auth.getSession()
+  if (!session) return null
+  // Rollup endpoints send ETags, so unchanged totals come back as 304s from the browser cache
+  const response = await fetch(new URL(path, BOT_API_URL), {
+    headers: { Authorization: `Bearer ${session.access_token}` }
+  })
+  if (!response.ok) throw new Error(`${path}: ${response.status}`)
+  return response.json()
+}
+
+async function loadAnalytics() {
+  const [summary, symbols, daily] = await Promise.all([
+    fetchAnalytics('/analytics/summary'),
+    fetchAnalytics('/analytics/symbols'),
+    fetchAnalytics('/analytics/daily?limit=7')
+  ])
+  if (!summary) return null
+
+  const equity = []
+  for (let after = 0; after !== null;) {
+    const page = await fetchAnalytics(`/analytics/equity?after=${after}&limit=5000`)
+    equity.push(...page.points)
+    after = page.next
+  }
+
+  return {
+    stats: { total_profit: summary.total_pnl, total_trades: summary.total_trades, win_rate: summary.win_rate_percent },
+    symbols: symbols.symbols,
+    days: daily.days,
+    equity
+  }
+}
+
+function Sparkline({ points }) {
+  if (points.length < 2) {
+    return <div style={{ color: 'var(--text-secondary)' }}>Not enough closed trades yet</div>
+  }
+  const values = points.map((point) => point.equity)
+  const min = values.reduce((a, b) => Math.min(a, b))
+  const max = values.reduce((a, b) => Math.max(a, b))
+  const span = max - min || 1
+  const line = values.map((value, i) => `${(i / (values.length - 1)) * 100},${40 - ((value - min) / span) * 40}`).join(' ')
+  return (
+    <svg viewBox="0 0 100 40" preserveAspectRatio="none" style={{ width: '100%', height: '120px' }}>
+      <polyline points={line} fill="none" stroke="var(--primary)" strokeWidth="2" vectorEffect="non-scaling-stroke" />
+    </svg>
+  )
+}
+
+function useLiveStream() {
+  const [live, setLive] = useState({ connected: false, signals: {}, equity: null, latency: null, fills: [] })
+
+  useEffect(() => {
+    if (!STREAM_URL) return
+    let socket
+    let retry
+    let stopped = false
+    let delay = 1000
+
+    const connect = async () => {
+      const { data: { session } } = await supabase.auth.getSession()
+      if (stopped) return
+      if (!session) {
+        retry = setTimeout(connect, 30000)
+        return
+      }
+      const url = new URL(STREAM_URL)
+      url.searchParams.set('token', session.access_token)
+      socket = new WebSocket(url)
+      socket.onopen = () => {
+        delay = 1000
+        setLive((state) => ({ ...state, connected: true }))
+      }
+      socket.onmessage = (event) => {
+        const batch = JSON.parse(event.data)
+        if (batch.length === 0) return
+        setLive((state) => {
+          const next = { ...state, signals: { ...state.signals } }
+          for (const message of batch) {
+            if (message.topic === 'signal') next.signals[message.key] = message.data
+            else if (message.topic === 'equity') next.equity = message.data
+            else if (message.topic === 'latency') next.latency = message.data
+            else if (message.topic === 'fill') next.fills = [message.data, ...next.fills].slice(0, 10)
+          }
+          return next
+        })
+      }
+      socket.onclose = () => {
+        setLive((state) => ({ ...state, connected: false }))
+        if (!stopped) {
+          retry = setTimeout(connect, delay)
+          delay = Math.min(delay * 2, 30000)
+        }
+      }
+    }
+
+    connect()
+    return () => {
+      stopped = true
+      clearTimeout(retry)
+      socket?.close()
+    }
+  }, [])
+
+  return live
+}
 
 export default function Dashboard() {
   const [loading, setLoading] = useState(true)
   const [stats, setStats] = useState(null)
   const [accounts, setAccounts] = useState([])
   const [recentTrades, setRecentTrades] = useState([])
+  const [analytics, setAnalytics] = useState(null)
+  const live = useLiveStream()
   const navigate = useNavigate()
 
   useEffect(() => {
@@ -27,13 +143,20 @@ export default function Dashboard() {
       const { data: { user } } = await supabase.auth.getUser()
       if (!user) return
 
-      const [userProfile, mt5Accounts, trades] = await Promise.all([
+      const [userProfile, mt5Accounts, trades, rollups] = await Promise.all([
         supabase.from('users').select('*').eq('id', user.id).maybeSingle(),
         supabase.from('mt5_accounts').select('*').eq('user_id', user.id),
-        supabase.from('trades').select('*').eq('user_id', user.id).order('opened_at', { ascending: false }).limit(10)
+        supabase.from('trades').select('*').eq('user_id', user.id).order('opened_at', { ascending: false }).limit(10),
+        BOT_API_URL
+          ? loadAnalytics().catch((error) => {
+              console.error('Error loading bot analytics:', error)
+              return null
+            })
+          : null
       ])
 
-      setStats(userProfile.data)
+      setStats(rollups ? rollups.stats : userProfile.data)
+      setAnalytics(rollups)
       setAccounts(mt5Accounts.data || [])
       setRecentTrades(trades.data || [])
     } catch (error) {
@@ -98,6 +221,93 @@ export default function Dashboard() {
           </div>
         </div>
 
+        {analytics && (
+          <div className="grid grid-3" style={{ marginBottom: '3rem' }}>
+            <div className="card">
+              <h3 style={{ fontSize: '1.5rem', marginBottom: '1.5rem' }}>Cumulative P&L</h3>
+              <Sparkline points={analytics.equity} />
+            </div>
+
+            <div className="card">
+              <h3 style={{ fontSize: '1.5rem', marginBottom: '1.5rem' }}>By Symbol</h3>
+              <div style={{ display: 'flex', flexDirection: 'column', gap: '0.5rem' }}>
+                {analytics.symbols.map((row) => (
+                  <div key={row.symbol} style={{ display: 'flex', justifyContent: 'space-between' }}>
+                    <span style={{ fontWeight: '600' }}>{row.symbol}</span>
+                    <span>{row.trades} trades · {((row.wins / row.trades) * 100).toFixed(1)}%</span>
+                    <span style={{ color: row.pnl >= 0 ? 'var(--success)' : 'var(--danger)' }}>${row.pnl.toFixed(2)}</span>
+                  </div>
+                ))}
+              </div>
+            </div>
+
+            <div className="card">
+              <h3 style={{ fontSize: '1.5rem', marginBottom: '1.5rem' }}>Last 7 Days</h3>
+              <div style={{ display: 'flex', flexDirection: 'column', gap: '0.5rem' }}>
+                {analytics.days.map((day) => (
+                  <div key={day.day} style={{ display: 'flex', justifyContent: 'space-between' }}>
+                    <span style={{ fontWeight: '600' }}>{day.day}</span>
+                    <span>{day.trades} trades</span>
+                    <span style={{ color: day.pnl >= 0 ? 'var(--success)' : 'var(--danger)' }}>${day.pnl.toFixed(2)}</span>
+                  </div>
+                ))}
+              </div>
+            </div>
+          </div>
+        )}
+
+        {STREAM_URL && (
+          <div className="card" style={{ marginBottom: '3rem' }}>
+            <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '1.5rem' }}>
+              <h3 style={{ fontSize: '1.5rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
+                <Radio size={24} style={{ color: live.connected ? 'var(--success)' : 'var(--text-secondary)' }} />
+                Live
+              </h3>
+              <span className={`badge ${live.connected ? 'badge-success' : 'badge-danger'}`}>
+                {live.connected ? 'Connected' : 'Reconnecting'}
+              </span>
+            </div>
+
+            <div className="grid grid-3" style={{ marginBottom: '1.5rem' }}>
+              <div>
+                <div className="stat-label">Equity</div>
+                <div className="stat-value">${live.equity?.equity?.toFixed(2) ?? '-'}</div>
+              </div>
+              <div>
+                <div className="stat-label">Drawdown</div>
+                <div className="stat-value">{live.equity ? `${(live.equity.drawdown * 100).toFixed(2)}%` : '-'}</div>
+              </div>
+              <div>
+                <div className="stat-label">Cycle</div>
+                <div className="stat-value">{live.latency ? `${live.latency.cycle_ms.toFixed(0)}ms` : '-'}</div>
+              </div>
+            </div>
+
+            <div className="grid grid-2">
+              <div style={{ display: 'flex', flexDirection: 'column', gap: '0.5rem' }}>
+                {Object.values(live.signals).map((signal) => (
+                  <div key={signal.symbol} style={{ display: 'flex', justifyContent: 'space-between' }}>
+                    <span style={{ fontWeight: '600' }}>{signal.symbol}</span>
+                    <span>{signal.signal} ({(signal.confidence * 100).toFixed(0)}%)</span>
+                    <span style={{ color: 'var(--text-secondary)' }}>{signal.price.toFixed(5)}</span>
+                  </div>
+                ))}
+              </div>
+              <div style={{ display: 'flex', flexDirection: 'column', gap: '0.5rem' }}>
+                {live.fills.map((fill) => (
+                  <div key={`${fill.ticket}-${fill.action}`} style={{ display: 'flex', justifyContent: 'space-between' }}>
+                    <span style={{ fontWeight: '600' }}>{fill.symbol}</span>
+                    <span>{fill.action === 'open' ? fill.side : 'CLOSE'} {fill.size.toFixed(2)} @ {fill.price.toFixed(5)}</span>
+                    {fill.pnl !== undefined && (
+                      <span style={{ color: fill.pnl >= 0 ? 'var(--success)' : 'var(--danger)' }}>${fill.pnl.toFixed(2)}</span>
+                    )}
+                  </div>
+                ))}
+              </div>
+            </div>
+          </div>
+        )}
+
         <div className="grid grid-2" style={{ marginBottom: '3rem' }}>
           <div className="card">
             <h3 style={{ fontSize: '1.5rem', marginBottom: '1.5rem' }}>MT5 Accounts</h3>